@@ -10,7 +10,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from app.core.database import Base
 from app.core.config import settings
-from app.models import User, Clone, Diary, CloneMemory
+from app.models import User, Clone, Diary, CloneMemory, EmbeddingCache, CloneQuestion, CloneCandidate, CloneConversation, Need, Match, MoodRollup, ResultCache
 
 config = context.config
 
@@ -0,0 +1,24 @@
+"""Clone profile aggregates
+
+Revision ID: 0d7e2b9c4f16
+Revises: c5b82e0f7a31
+Create Date: 2026-10-18 16:42:08.193517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0d7e2b9c4f16'
+down_revision = 'c5b82e0f7a31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('clones', sa.Column('profile_aggregates', sa.JSON(), server_default='{}', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('clones', 'profile_aggregates')
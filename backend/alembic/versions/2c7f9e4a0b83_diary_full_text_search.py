@@ -0,0 +1,36 @@
+"""Full-text search over diaries: generated tsvector and btree_gin index
+
+Revision ID: 2c7f9e4a0b83
+Revises: f83c2a6d1e47
+Create Date: 2026-10-18 20:41:09.827153
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '2c7f9e4a0b83'
+down_revision = 'f83c2a6d1e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # user_id (btree-тип) и tsvector в одном GIN-индексе
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+    # Генерируемая колонка: заполняется для существующих строк (перезапись таблицы)
+    op.add_column('diaries', sa.Column(
+        'search_vector', postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('russian', coalesce(content_text, ''))", persisted=True)
+    ))
+    op.create_index(
+        'ix_diaries_user_search_gin', 'diaries', ['user_id', 'search_vector'],
+        unique=False, postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_diaries_user_search_gin', table_name='diaries')
+    op.drop_column('diaries', 'search_vector')
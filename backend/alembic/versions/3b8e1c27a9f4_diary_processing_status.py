@@ -0,0 +1,31 @@
+"""Diary processing status
+
+Revision ID: 3b8e1c27a9f4
+Revises: df5a6411b31e
+Create Date: 2026-10-18 10:12:05.114203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8e1c27a9f4'
+down_revision = 'df5a6411b31e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('diaries', sa.Column('status', sa.String(length=50), server_default='pending', nullable=False))
+    op.add_column('diaries', sa.Column('error_message', sa.Text(), nullable=True))
+    op.alter_column('diaries', 'content_text', existing_type=sa.Text(), nullable=True)
+    # Старые дневники обрабатывались синхронно в запросе
+    op.execute("UPDATE diaries SET status = CASE WHEN analyzed_at IS NOT NULL THEN 'completed' ELSE 'failed' END")
+
+
+def downgrade() -> None:
+    op.execute("UPDATE diaries SET content_text = '' WHERE content_text IS NULL")
+    op.alter_column('diaries', 'content_text', existing_type=sa.Text(), nullable=False)
+    op.drop_column('diaries', 'error_message')
+    op.drop_column('diaries', 'status')
@@ -0,0 +1,24 @@
+"""Consecutive transient error count for clone conversations
+
+Revision ID: 3e8b5c1f7a29
+Revises: 9a4d6b2e8f15
+Create Date: 2026-10-18 22:03:41.552918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e8b5c1f7a29'
+down_revision = '9a4d6b2e8f15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('clone_conversations', sa.Column('error_count', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('clone_conversations', 'error_count')
@@ -0,0 +1,54 @@
+"""Clone conversations
+
+Revision ID: 4e9a1d7c3b25
+Revises: 7b1f4c8e2a63
+Create Date: 2026-10-18 18:10:36.472915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e9a1d7c3b25'
+down_revision = '7b1f4c8e2a63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('clone_conversations',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('clone1_id', sa.BigInteger(), nullable=False),
+    sa.Column('clone2_id', sa.BigInteger(), nullable=False),
+    sa.Column('messages', sa.JSON(), nullable=False),
+    sa.Column('expected_score', sa.Float(), nullable=True),
+    sa.Column('compatibility_analysis', sa.JSON(), nullable=True),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('conversation_length', sa.Integer(), nullable=True),
+    sa.Column('tokens_used', sa.Integer(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('last_message_at', sa.DateTime(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['clone1_id'], ['clones.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['clone2_id'], ['clones.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_clone_conversations_id'), 'clone_conversations', ['id'], unique=False)
+    op.create_index(op.f('ix_clone_conversations_clone1_id'), 'clone_conversations', ['clone1_id'], unique=False)
+    op.create_index(op.f('ix_clone_conversations_clone2_id'), 'clone_conversations', ['clone2_id'], unique=False)
+    op.create_index(
+        'ix_clone_conversations_pair_started', 'clone_conversations',
+        ['clone1_id', 'clone2_id', sa.text('started_at DESC')], unique=False
+    )
+    op.create_index('ix_clone_conversations_status', 'clone_conversations', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_clone_conversations_status', table_name='clone_conversations')
+    op.drop_index('ix_clone_conversations_pair_started', table_name='clone_conversations')
+    op.drop_index(op.f('ix_clone_conversations_clone2_id'), table_name='clone_conversations')
+    op.drop_index(op.f('ix_clone_conversations_clone1_id'), table_name='clone_conversations')
+    op.drop_index(op.f('ix_clone_conversations_id'), table_name='clone_conversations')
+    op.drop_table('clone_conversations')
@@ -0,0 +1,40 @@
+"""Clone questions
+
+Revision ID: 5f0a7b3d91c2
+Revises: e27d9a5c4b10
+Create Date: 2026-10-18 12:31:55.208714
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f0a7b3d91c2'
+down_revision = 'e27d9a5c4b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('clone_questions',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('clone_id', sa.BigInteger(), nullable=False),
+    sa.Column('question', sa.Text(), nullable=False),
+    sa.Column('answer', sa.Text(), nullable=False),
+    sa.Column('model', sa.String(length=100), nullable=True),
+    sa.Column('streamed', sa.Boolean(), nullable=True),
+    sa.Column('time_to_first_token_ms', sa.Integer(), nullable=True),
+    sa.Column('latency_ms', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['clone_id'], ['clones.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_clone_questions_clone_id'), 'clone_questions', ['clone_id'], unique=False)
+    op.create_index(op.f('ix_clone_questions_id'), 'clone_questions', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_clone_questions_id'), table_name='clone_questions')
+    op.drop_index(op.f('ix_clone_questions_clone_id'), table_name='clone_questions')
+    op.drop_table('clone_questions')
@@ -0,0 +1,60 @@
+"""Clone personality embedding, match preferences and candidates
+
+Revision ID: 7b1f4c8e2a63
+Revises: 0d7e2b9c4f16
+Create Date: 2026-10-18 17:26:51.804392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = '7b1f4c8e2a63'
+down_revision = '0d7e2b9c4f16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('clones', sa.Column('personality_embedding', Vector(1536), nullable=True))
+    op.add_column('clones', sa.Column('personality_embedding_version', sa.Integer(), nullable=True))
+    op.create_index(
+        'ix_clones_personality_embedding_hnsw', 'clones', ['personality_embedding'],
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'personality_embedding': 'vector_cosine_ops'}
+    )
+    
+    op.add_column('users', sa.Column('looking_for_gender', sa.String(length=50), nullable=True))
+    op.add_column('users', sa.Column('preferred_age_min', sa.Integer(), nullable=True))
+    op.add_column('users', sa.Column('preferred_age_max', sa.Integer(), nullable=True))
+    # Жесткие фильтры кандидатов
+    op.create_index('ix_users_city_gender_age', 'users', ['city', 'gender', 'age'], unique=False)
+    
+    op.create_table('clone_candidates',
+    sa.Column('clone_id', sa.BigInteger(), nullable=False),
+    sa.Column('candidate_clone_id', sa.BigInteger(), nullable=False),
+    sa.Column('similarity', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['clone_id'], ['clones.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['candidate_clone_id'], ['clones.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('clone_id', 'candidate_clone_id')
+    )
+    op.create_index(
+        'ix_clone_candidates_clone_similarity', 'clone_candidates',
+        ['clone_id', sa.text('similarity DESC')], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_clone_candidates_clone_similarity', table_name='clone_candidates')
+    op.drop_table('clone_candidates')
+    op.drop_index('ix_users_city_gender_age', table_name='users')
+    op.drop_column('users', 'preferred_age_max')
+    op.drop_column('users', 'preferred_age_min')
+    op.drop_column('users', 'looking_for_gender')
+    op.drop_index('ix_clones_personality_embedding_hnsw', table_name='clones')
+    op.drop_column('clones', 'personality_embedding_version')
+    op.drop_column('clones', 'personality_embedding')
@@ -0,0 +1,42 @@
+"""pgvector embeddings for memories and diaries
+
+Revision ID: 8c41f0d2e6b7
+Revises: 3b8e1c27a9f4
+Create Date: 2026-10-18 11:02:47.530118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41f0d2e6b7'
+down_revision = '3b8e1c27a9f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    op.add_column('clone_memories', sa.Column('memory_embedding', Vector(1536), nullable=True))
+    op.add_column('diaries', sa.Column('content_embedding', Vector(1536), nullable=True))
+    op.create_index(
+        'ix_clone_memories_memory_embedding_hnsw', 'clone_memories', ['memory_embedding'],
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'memory_embedding': 'vector_cosine_ops'}
+    )
+    op.create_index(
+        'ix_diaries_content_embedding_hnsw', 'diaries', ['content_embedding'],
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'content_embedding': 'vector_cosine_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_diaries_content_embedding_hnsw', table_name='diaries')
+    op.drop_index('ix_clone_memories_memory_embedding_hnsw', table_name='clone_memories')
+    op.drop_column('diaries', 'content_embedding')
+    op.drop_column('clone_memories', 'memory_embedding')
@@ -0,0 +1,42 @@
+"""Idempotency keys for diaries and result cache for transcription and analysis
+
+Revision ID: 9a4d6b2e8f15
+Revises: 2c7f9e4a0b83
+Create Date: 2026-10-18 21:07:52.184630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4d6b2e8f15'
+down_revision = '2c7f9e4a0b83'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('diaries', sa.Column('audio_sha256', sa.String(length=64), nullable=True))
+    op.add_column('diaries', sa.Column('idempotency_key', sa.String(length=100), nullable=True))
+    op.create_index(
+        'ix_diaries_user_idempotency_key', 'diaries', ['user_id', 'idempotency_key'],
+        unique=True, postgresql_where=sa.text('idempotency_key IS NOT NULL')
+    )
+    
+    op.create_table('result_cache',
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('version', sa.String(length=100), nullable=False),
+    sa.Column('result', postgresql.JSONB(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('content_hash')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('result_cache')
+    op.drop_index('ix_diaries_user_idempotency_key', table_name='diaries')
+    op.drop_column('diaries', 'idempotency_key')
+    op.drop_column('diaries', 'audio_sha256')
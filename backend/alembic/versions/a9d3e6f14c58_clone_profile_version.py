@@ -0,0 +1,24 @@
+"""Clone profile version
+
+Revision ID: a9d3e6f14c58
+Revises: 5f0a7b3d91c2
+Create Date: 2026-10-18 13:05:12.671430
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3e6f14c58'
+down_revision = '5f0a7b3d91c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('clones', sa.Column('profile_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('clones', 'profile_version')
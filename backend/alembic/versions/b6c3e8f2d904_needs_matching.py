@@ -0,0 +1,90 @@
+"""Needs and offers with lexical and vector indexes, matches
+
+Revision ID: b6c3e8f2d904
+Revises: 4e9a1d7c3b25
+Create Date: 2026-10-18 18:55:14.029376
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6c3e8f2d904'
+down_revision = '4e9a1d7c3b25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('needs',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('clone_id', sa.BigInteger(), nullable=False),
+    sa.Column('source_diary_id', sa.BigInteger(), nullable=True),
+    sa.Column('need_type', sa.String(length=50), nullable=False),
+    sa.Column('direction', sa.String(length=50), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('details', sa.JSON(), nullable=True),
+    sa.Column('city', sa.String(length=255), nullable=True),
+    sa.Column('district', sa.String(length=255), nullable=True),
+    sa.Column('terms', postgresql.ARRAY(sa.Text()), nullable=False),
+    sa.Column('need_embedding', Vector(1536), nullable=True),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['clone_id'], ['clones.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['source_diary_id'], ['diaries.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_needs_id'), 'needs', ['id'], unique=False)
+    op.create_index(op.f('ix_needs_user_id'), 'needs', ['user_id'], unique=False)
+    op.create_index(op.f('ix_needs_source_diary_id'), 'needs', ['source_diary_id'], unique=False)
+    op.create_index('ix_needs_terms_gin', 'needs', ['terms'], unique=False, postgresql_using='gin')
+    op.create_index(
+        'ix_needs_need_embedding_hnsw', 'needs', ['need_embedding'],
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'need_embedding': 'vector_cosine_ops'}
+    )
+    
+    op.create_table('matches',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('user1_id', sa.BigInteger(), nullable=False),
+    sa.Column('user2_id', sa.BigInteger(), nullable=False),
+    sa.Column('need1_id', sa.BigInteger(), nullable=False),
+    sa.Column('need2_id', sa.BigInteger(), nullable=False),
+    sa.Column('match_type', sa.String(length=50), nullable=False),
+    sa.Column('match_score', sa.Numeric(precision=5, scale=2), nullable=True),
+    sa.Column('details', sa.JSON(), nullable=True),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user1_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user2_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['need1_id'], ['needs.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['need2_id'], ['needs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('need1_id', 'need2_id', name='uq_matches_need_pair')
+    )
+    op.create_index(op.f('ix_matches_id'), 'matches', ['id'], unique=False)
+    op.create_index('ix_matches_users', 'matches', ['user1_id', 'user2_id'], unique=False)
+    op.create_index('ix_matches_status', 'matches', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_matches_status', table_name='matches')
+    op.drop_index('ix_matches_users', table_name='matches')
+    op.drop_index(op.f('ix_matches_id'), table_name='matches')
+    op.drop_table('matches')
+    op.drop_index('ix_needs_need_embedding_hnsw', table_name='needs')
+    op.drop_index('ix_needs_terms_gin', table_name='needs')
+    op.drop_index(op.f('ix_needs_source_diary_id'), table_name='needs')
+    op.drop_index(op.f('ix_needs_user_id'), table_name='needs')
+    op.drop_index(op.f('ix_needs_id'), table_name='needs')
+    op.drop_table('needs')
@@ -0,0 +1,28 @@
+"""Diaries keyset pagination index
+
+Revision ID: c5b82e0f7a31
+Revises: a9d3e6f14c58
+Create Date: 2026-10-18 13:40:27.315902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5b82e0f7a31'
+down_revision = 'a9d3e6f14c58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_diaries_user_created_id', 'diaries',
+        ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_diaries_user_created_id', table_name='diaries')
@@ -0,0 +1,98 @@
+"""JSONB with GIN and generated columns for analysis_result and personality_profile
+
+Revision ID: d1a5f7e3c862
+Revises: b6c3e8f2d904
+Create Date: 2026-10-18 19:34:22.615081
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1a5f7e3c862'
+down_revision = 'b6c3e8f2d904'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # diaries.analysis_result
+    op.alter_column(
+        'diaries', 'analysis_result',
+        type_=postgresql.JSONB(), existing_type=sa.JSON(), existing_nullable=True,
+        postgresql_using='analysis_result::jsonb'
+    )
+    op.add_column('diaries', sa.Column(
+        'mood', sa.String(length=50),
+        sa.Computed("analysis_result #>> '{emotions,mood}'", persisted=True)
+    ))
+    op.add_column('diaries', sa.Column(
+        'emotion_intensity', sa.Numeric(),
+        sa.Computed(
+            "CASE WHEN jsonb_typeof(analysis_result #> '{emotions,intensity}') = 'number' "
+            "THEN (analysis_result #>> '{emotions,intensity}')::numeric END",
+            persisted=True
+        )
+    ))
+    op.create_index(
+        'ix_diaries_analysis_result_gin', 'diaries', ['analysis_result'],
+        postgresql_using='gin', postgresql_ops={'analysis_result': 'jsonb_path_ops'}
+    )
+    op.create_index('ix_diaries_user_mood', 'diaries', ['user_id', 'mood'], unique=False)
+    
+    # clones.personality_profile
+    op.alter_column(
+        'clones', 'personality_profile',
+        type_=postgresql.JSONB(), existing_type=sa.JSON(), existing_nullable=False,
+        postgresql_using='personality_profile::jsonb'
+    )
+    op.add_column('clones', sa.Column(
+        'overall_mood', sa.String(length=50),
+        sa.Computed("personality_profile #>> '{emotions,mood}'", persisted=True)
+    ))
+    op.add_column('clones', sa.Column(
+        'emotion_intensity', sa.Numeric(),
+        sa.Computed(
+            "CASE WHEN jsonb_typeof(personality_profile #> '{emotions,intensity}') = 'number' "
+            "THEN (personality_profile #>> '{emotions,intensity}')::numeric END",
+            persisted=True
+        )
+    ))
+    op.add_column('clones', sa.Column('top_values', postgresql.ARRAY(sa.Text()), server_default='{}', nullable=False))
+    # Массив из JSON нельзя сделать генерируемой колонкой - заполняем существующие профили
+    op.execute(
+        "UPDATE clones SET top_values = ARRAY(SELECT jsonb_array_elements_text(personality_profile -> 'values')) "
+        "WHERE jsonb_typeof(personality_profile -> 'values') = 'array'"
+    )
+    op.create_index(
+        'ix_clones_personality_profile_gin', 'clones', ['personality_profile'],
+        postgresql_using='gin', postgresql_ops={'personality_profile': 'jsonb_path_ops'}
+    )
+    op.create_index('ix_clones_top_values_gin', 'clones', ['top_values'], unique=False, postgresql_using='gin')
+    op.create_index('ix_clones_overall_mood', 'clones', ['overall_mood'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_clones_overall_mood', table_name='clones')
+    op.drop_index('ix_clones_top_values_gin', table_name='clones')
+    op.drop_index('ix_clones_personality_profile_gin', table_name='clones')
+    op.drop_column('clones', 'top_values')
+    op.drop_column('clones', 'emotion_intensity')
+    op.drop_column('clones', 'overall_mood')
+    op.alter_column(
+        'clones', 'personality_profile',
+        type_=sa.JSON(), existing_type=postgresql.JSONB(), existing_nullable=False,
+        postgresql_using='personality_profile::json'
+    )
+    
+    op.drop_index('ix_diaries_user_mood', table_name='diaries')
+    op.drop_index('ix_diaries_analysis_result_gin', table_name='diaries')
+    op.drop_column('diaries', 'emotion_intensity')
+    op.drop_column('diaries', 'mood')
+    op.alter_column(
+        'diaries', 'analysis_result',
+        type_=sa.JSON(), existing_type=postgresql.JSONB(), existing_nullable=True,
+        postgresql_using='analysis_result::json'
+    )
@@ -0,0 +1,31 @@
+"""Embedding cache
+
+Revision ID: e27d9a5c4b10
+Revises: 8c41f0d2e6b7
+Create Date: 2026-10-18 11:48:19.902341
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = 'e27d9a5c4b10'
+down_revision = '8c41f0d2e6b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('embedding_cache',
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('model', sa.String(length=100), nullable=False),
+    sa.Column('embedding', Vector(1536), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('content_hash')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('embedding_cache')
@@ -0,0 +1,39 @@
+"""Mood and emotion rollups per user, day, week and month
+
+Revision ID: f83c2a6d1e47
+Revises: d1a5f7e3c862
+Create Date: 2026-10-18 20:12:47.390514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f83c2a6d1e47'
+down_revision = 'd1a5f7e3c862'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('mood_rollups',
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('period', sa.String(length=10), nullable=False),
+    sa.Column('period_start', sa.Date(), nullable=False),
+    sa.Column('diaries_count', sa.Integer(), nullable=False),
+    sa.Column('words_count', sa.Integer(), nullable=False),
+    sa.Column('intensity_sum', sa.Float(), nullable=False),
+    sa.Column('intensity_count', sa.Integer(), nullable=False),
+    sa.Column('moods', postgresql.JSONB(), nullable=False),
+    sa.Column('emotions', postgresql.JSONB(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'period', 'period_start')
+    )
+    # Агрегаты по уже проанализированным дневникам: python -m app.commands.rebuild_mood_timeline
+
+
+def downgrade() -> None:
+    op.drop_table('mood_rollups')
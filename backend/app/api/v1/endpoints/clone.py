@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import get_db
-from app.core.security import validate_telegram_init_data, extract_telegram_user_id
+from app.core.database import get_db, get_read_db
+from app.core.security import get_telegram_id
 from app.services.user_service import UserService
 from app.services.clone_service import CloneService
 from pydantic import BaseModel
 from typing import Optional
+import asyncio
+import json
 
 router = APIRouter()
 
@@ -24,17 +27,10 @@ class CloneAskResponse(BaseModel):
 
 @router.get("", response_model=CloneResponse)
 async def get_clone(
-    init_data: str = Header(..., alias="X-Telegram-Init-Data"),
-    db: AsyncSession = Depends(get_db)
+    telegram_id: int = Depends(get_telegram_id),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Получение данных клона пользователя"""
-    if not validate_telegram_init_data(init_data):
-        raise HTTPException(status_code=401, detail="Invalid Telegram init data")
-    
-    telegram_id = extract_telegram_user_id(init_data)
-    if not telegram_id:
-        raise HTTPException(status_code=401, detail="Could not extract user ID")
-    
     user_service = UserService(db)
     user = await user_service.get_by_telegram_id(telegram_id)
     if not user:
@@ -57,17 +53,10 @@ async def get_clone(
 @router.post("/ask", response_model=CloneAskResponse)
 async def ask_clone(
     request: CloneAskRequest,
-    init_data: str = Header(..., alias="X-Telegram-Init-Data"),
+    telegram_id: int = Depends(get_telegram_id),
     db: AsyncSession = Depends(get_db)
 ):
     """Задать вопрос клону"""
-    if not validate_telegram_init_data(init_data):
-        raise HTTPException(status_code=401, detail="Invalid Telegram init data")
-    
-    telegram_id = extract_telegram_user_id(init_data)
-    if not telegram_id:
-        raise HTTPException(status_code=401, detail="Could not extract user ID")
-    
     user_service = UserService(db)
     user = await user_service.get_by_telegram_id(telegram_id)
     if not user:
@@ -82,3 +71,41 @@ async def ask_clone(
     answer = await clone_service.ask_clone(clone.id, request.question)
     
     return CloneAskResponse(answer=answer)
+
+@router.post("/ask/stream")
+async def ask_clone_stream(
+    request: CloneAskRequest,
+    telegram_id: int = Depends(get_telegram_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """Задать вопрос клону с потоковым ответом (Server-Sent Events)"""
+    user_service = UserService(db)
+    user = await user_service.get_by_telegram_id(telegram_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    clone_service = CloneService(db)
+    clone = await clone_service.get_user_clone(user.id)
+    
+    if not clone:
+        raise HTTPException(status_code=404, detail="Clone not found")
+    
+    async def event_stream():
+        # При отключении клиента Starlette отменяет генератор,
+        # а ask_clone_stream закрывает соединение с OpenAI
+        try:
+            async for token in clone_service.ask_clone_stream(clone.id, request.question):
+                yield f"data: {json.dumps({'token': token}, ensure_ascii=False)}\n\n"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error streaming clone answer: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': 'Clone answer failed'})}\n\n"
+            return
+        yield "event: done\ndata: {}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Header, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Header, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import get_db
-from app.core.security import validate_telegram_init_data, extract_telegram_user_id
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
+from app.core.security import get_telegram_id
 from app.services.user_service import UserService
-from app.services.diary_service import DiaryService
-from app.services.openai_service import OpenAIService
+from app.core.metrics import metrics
+from app.services.diary_service import DiaryService, DuplicateDiaryError
+from app.services.mood_timeline_service import MoodTimelineService
+from app.services.upload_service import UploadService, UploadTooLargeError
+from app.tasks.diary_tasks import enqueue_diary_processing
 from pydantic import BaseModel
-from typing import Optional
-import os
-from app.core.config import settings
+from typing import Optional, Literal
+from datetime import date
 
 router = APIRouter()
 
@@ -17,101 +20,293 @@ class DiaryCreateText(BaseModel):
 
 class DiaryResponse(BaseModel):
     id: int
-    content_text: str
+    content_text: Optional[str] = None
+    status: str
+    created_at: str
+    analyzed_at: Optional[str] = None
+
+class DiarySummaryResponse(BaseModel):
+    id: int
+    preview: Optional[str] = None
+    status: str
+    word_count: Optional[int] = None
+    created_at: str
+    analyzed_at: Optional[str] = None
+
+class DiaryPageResponse(BaseModel):
+    items: list[DiarySummaryResponse]
+    next_cursor: Optional[str] = None
+
+class DiaryDetailResponse(BaseModel):
+    id: int
+    content_text: Optional[str] = None
+    status: str
+    word_count: Optional[int] = None
+    analysis_result: Optional[dict] = None
     created_at: str
     analyzed_at: Optional[str] = None
 
+class DiarySearchHitResponse(BaseModel):
+    id: int
+    created_at: str
+    rank: float
+    snippet: str
+
+class DiarySearchResponse(BaseModel):
+    items: list[DiarySearchHitResponse]
+    next_cursor: Optional[str] = None
+
+class MoodTimelinePointResponse(BaseModel):
+    period_start: str
+    diaries_count: int
+    words_count: int
+    avg_intensity: Optional[float] = None
+    dominant_mood: Optional[str] = None
+    moods: dict[str, int]
+    emotions: dict[str, int]
+
+class MoodTimelineResponse(BaseModel):
+    period: str
+    items: list[MoodTimelinePointResponse]
+
+class DiaryStatusResponse(BaseModel):
+    id: int
+    status: str
+    error_message: Optional[str] = None
+    analyzed_at: Optional[str] = None
+
+def _diary_response(diary) -> DiaryResponse:
+    return DiaryResponse(
+        id=diary.id,
+        content_text=diary.content_text,
+        status=diary.status,
+        created_at=diary.created_at.isoformat(),
+        analyzed_at=diary.analyzed_at.isoformat() if diary.analyzed_at else None
+    )
+
+QUEUE_UNAVAILABLE = "Processing queue is unavailable"
+
+async def _enqueue(diary_service: DiaryService, diary):
+    # Транскрипция и анализ выполняются в фоне через Celery
+    try:
+        enqueue_diary_processing(diary.id, has_audio=diary.audio_file_path is not None)
+    except Exception as e:
+        print(f"Error enqueuing diary {diary.id}: {e}")
+        await diary_service.set_status(diary.id, "failed", QUEUE_UNAVAILABLE)
+        raise HTTPException(status_code=503, detail="Diary processing is temporarily unavailable")
+
+async def _replay(response: Response, diary_service: DiaryService, diary) -> DiaryResponse:
+    """Повтор запроса: тот же дневник, без новой обработки"""
+    metrics.incr("diaries.idempotent_replays")
+    response.headers["Idempotent-Replayed"] = "true"
+    # Исходный запрос получил 503 - обработка так и не была поставлена
+    if diary.status == "failed" and diary.error_message == QUEUE_UNAVAILABLE:
+        await diary_service.set_status(diary.id, "pending")
+        await _enqueue(diary_service, diary)
+    return _diary_response(diary)
+
 @router.post("", response_model=DiaryResponse)
 async def create_diary(
-    init_data: str = Header(..., alias="X-Telegram-Init-Data"),
+    response: Response,
+    telegram_id: int = Depends(get_telegram_id),
     text: Optional[str] = None,
     audio: Optional[UploadFile] = File(None),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=100),
     db: AsyncSession = Depends(get_db)
 ):
-    """Создание дневника (текст или аудио)"""
-    if not validate_telegram_init_data(init_data):
-        raise HTTPException(status_code=401, detail="Invalid Telegram init data")
-    
-    telegram_id = extract_telegram_user_id(init_data)
-    if not telegram_id:
-        raise HTTPException(status_code=401, detail="Could not extract user ID")
-    
+    """Создание дневника (текст или аудио); повтор с тем же Idempotency-Key возвращает исходный дневник"""
     user_service = UserService(db)
     user = await user_service.get_by_telegram_id(telegram_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     diary_service = DiaryService(db)
-    openai_service = OpenAIService()
+    
+    # Ретрай клиента: не сохраняем аудио и не ставим обработку повторно
+    if idempotency_key:
+        existing = await diary_service.get_by_idempotency_key(user.id, idempotency_key)
+        if existing:
+            return await _replay(response, diary_service, existing)
     
     # Обработка текста или аудио
     diary_text = None
     audio_path = None
+    audio_sha256 = None
     
     if audio:
-        # Сохраняем аудио файл
-        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-        audio_path = os.path.join(settings.UPLOAD_DIR, f"{user.id}_{audio.filename}")
-        with open(audio_path, "wb") as f:
-            content = await audio.read()
-            f.write(content)
-        
-        # Транскрипция
-        diary_text = await openai_service.transcribe_audio(audio_path)
+        # Сохраняем аудио файл потоково, расшифровка - в воркере
+        try:
+            upload = await UploadService().save(audio, prefix=str(user.id))
+        except UploadTooLargeError:
+            raise HTTPException(status_code=413, detail="Audio file is too large")
+        audio_path = upload.path
+        audio_sha256 = upload.sha256
     elif text:
         diary_text = text
     else:
         raise HTTPException(status_code=400, detail="Either text or audio must be provided")
     
-    # Создание дневника
-    diary = await diary_service.create_diary(
-        user_id=user.id,
-        content_text=diary_text,
-        audio_file_path=audio_path
+    # Создание дневника в статусе pending
+    try:
+        diary = await diary_service.create_diary(
+            user_id=user.id,
+            content_text=diary_text,
+            audio_file_path=audio_path,
+            audio_sha256=audio_sha256,
+            idempotency_key=idempotency_key
+        )
+    except DuplicateDiaryError as e:
+        # Параллельный повтор успел создать дневник первым
+        if audio_path:
+            await UploadService().discard(audio_path)
+        return await _replay(response, diary_service, e.diary)
+    
+    await _enqueue(diary_service, diary)
+    return _diary_response(diary)
+
+@router.get("", response_model=DiaryPageResponse)
+async def get_diaries(
+    limit: int = Query(20, ge=1, le=settings.DIARY_PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    telegram_id: int = Depends(get_telegram_id),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Получение списка дневников пользователя (превью, постранично)"""
+    user_service = UserService(db)
+    user = await user_service.get_by_telegram_id(telegram_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    diary_service = DiaryService(db)
+    try:
+        diaries, next_cursor = await diary_service.list_user_diaries(user.id, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    return DiaryPageResponse(
+        items=[
+            DiarySummaryResponse(
+                id=d.id,
+                preview=d.preview,
+                status=d.status,
+                word_count=d.word_count,
+                created_at=d.created_at.isoformat(),
+                analyzed_at=d.analyzed_at.isoformat() if d.analyzed_at else None
+            )
+            for d in diaries
+        ],
+        next_cursor=next_cursor
     )
+
+@router.get("/search", response_model=DiarySearchResponse)
+async def search_diaries(
+    q: str = Query(..., min_length=1, max_length=settings.DIARY_SEARCH_MAX_QUERY_CHARS),
+    limit: int = Query(20, ge=1, le=settings.DIARY_PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    telegram_id: int = Depends(get_telegram_id),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Полнотекстовый поиск по дневникам: по релевантности, с подсветкой (<b>) во фрагментах"""
+    user_service = UserService(db)
+    user = await user_service.get_by_telegram_id(telegram_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
     
-    # Анализ дневника (в фоне через Celery в будущем)
     try:
-        analysis_result = await openai_service.analyze_diary(diary_text)
-        await diary_service.update_analysis(diary.id, analysis_result)
-    except Exception as e:
-        # Логируем ошибку, но не прерываем создание дневника
-        print(f"Error analyzing diary: {e}")
+        hits, next_cursor = await DiaryService(db).search_user_diaries(user.id, q, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     
-    return DiaryResponse(
+    return DiarySearchResponse(
+        items=[
+            DiarySearchHitResponse(
+                id=h.id,
+                created_at=h.created_at.isoformat(),
+                rank=h.rank,
+                snippet=h.snippet
+            )
+            for h in hits
+        ],
+        next_cursor=next_cursor
+    )
+
+@router.get("/timeline", response_model=MoodTimelineResponse)
+async def get_mood_timeline(
+    period: Literal["day", "week", "month"] = "week",
+    limit: int = Query(12, ge=1, le=settings.MOOD_TIMELINE_MAX_PERIODS),
+    until: Optional[date] = None,
+    telegram_id: int = Depends(get_telegram_id),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Динамика настроения по периодам (только из агрегатов mood_rollups)"""
+    user_service = UserService(db)
+    user = await user_service.get_by_telegram_id(telegram_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    points = await MoodTimelineService(db).timeline(user.id, period, limit, until)
+    
+    return MoodTimelineResponse(
+        period=period,
+        items=[
+            MoodTimelinePointResponse(
+                period_start=p.period_start.isoformat(),
+                diaries_count=p.diaries_count,
+                words_count=p.words_count,
+                avg_intensity=p.avg_intensity,
+                dominant_mood=p.dominant_mood,
+                moods=p.moods,
+                emotions=p.emotions
+            )
+            for p in points
+        ]
+    )
+
+@router.get("/{diary_id}", response_model=DiaryDetailResponse)
+async def get_diary(
+    diary_id: int,
+    telegram_id: int = Depends(get_telegram_id),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Полный дневник с результатом анализа"""
+    user_service = UserService(db)
+    user = await user_service.get_by_telegram_id(telegram_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    diary = await DiaryService(db).get_user_diary(user.id, diary_id)
+    if not diary:
+        raise HTTPException(status_code=404, detail="Diary not found")
+    
+    return DiaryDetailResponse(
         id=diary.id,
         content_text=diary.content_text,
+        status=diary.status,
+        word_count=diary.word_count,
+        analysis_result=diary.analysis_result,
         created_at=diary.created_at.isoformat(),
         analyzed_at=diary.analyzed_at.isoformat() if diary.analyzed_at else None
     )
 
-@router.get("")
-async def get_diaries(
-    init_data: str = Header(..., alias="X-Telegram-Init-Data"),
+@router.get("/{diary_id}/status", response_model=DiaryStatusResponse)
+async def get_diary_status(
+    diary_id: int,
+    telegram_id: int = Depends(get_telegram_id),
     db: AsyncSession = Depends(get_db)
 ):
-    """Получение списка дневников пользователя"""
-    if not validate_telegram_init_data(init_data):
-        raise HTTPException(status_code=401, detail="Invalid Telegram init data")
-    
-    telegram_id = extract_telegram_user_id(init_data)
-    if not telegram_id:
-        raise HTTPException(status_code=401, detail="Could not extract user ID")
-    
+    """Статус фоновой обработки дневника"""
     user_service = UserService(db)
     user = await user_service.get_by_telegram_id(telegram_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    diary_service = DiaryService(db)
-    diaries = await diary_service.get_user_diaries(user.id)
-    
-    return [
-        DiaryResponse(
-            id=d.id,
-            content_text=d.content_text,
-            created_at=d.created_at.isoformat(),
-            analyzed_at=d.analyzed_at.isoformat() if d.analyzed_at else None
-        )
-        for d in diaries
-    ]
+    diary = await DiaryService(db).get_user_diary(user.id, diary_id)
+    if not diary:
+        raise HTTPException(status_code=404, detail="Diary not found")
+    
+    return DiaryStatusResponse(
+        id=diary.id,
+        status=diary.status,
+        error_message=diary.error_message,
+        analyzed_at=diary.analyzed_at.isoformat() if diary.analyzed_at else None
+    )
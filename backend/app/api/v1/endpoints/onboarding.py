@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
-from app.core.security import validate_telegram_init_data, extract_telegram_user_id
+from app.core.security import get_telegram_id
 from app.services.user_service import UserService
 from app.services.openai_service import OpenAIService
 from pydantic import BaseModel
@@ -19,17 +19,10 @@ class OnboardingStatusResponse(BaseModel):
 
 @router.get("/status")
 async def get_onboarding_status(
-    init_data: str = Header(..., alias="X-Telegram-Init-Data"),
+    telegram_id: int = Depends(get_telegram_id),
     db: AsyncSession = Depends(get_db)
 ):
     """Проверка статуса анкеты"""
-    if not validate_telegram_init_data(init_data):
-        raise HTTPException(status_code=401, detail="Invalid Telegram init data")
-    
-    telegram_id = extract_telegram_user_id(init_data)
-    if not telegram_id:
-        raise HTTPException(status_code=401, detail="Could not extract user ID")
-    
     user_service = UserService(db)
     user = await user_service.get_by_telegram_id(telegram_id)
     
@@ -44,17 +37,10 @@ async def get_onboarding_status(
 @router.post("/answer")
 async def save_onboarding_answer(
     answer: OnboardingAnswer,
-    init_data: str = Header(..., alias="X-Telegram-Init-Data"),
+    telegram_id: int = Depends(get_telegram_id),
     db: AsyncSession = Depends(get_db)
 ):
     """Сохранение ответа на вопрос анкеты"""
-    if not validate_telegram_init_data(init_data):
-        raise HTTPException(status_code=401, detail="Invalid Telegram init data")
-    
-    telegram_id = extract_telegram_user_id(init_data)
-    if not telegram_id:
-        raise HTTPException(status_code=401, detail="Could not extract user ID")
-    
     user_service = UserService(db)
     user = await user_service.get_or_create(telegram_id)
     
@@ -70,9 +56,22 @@ async def save_onboarding_answer(
         user.city = answer.value
     elif answer.field == "gender":
         user.gender = answer.value
+    elif answer.field == "looking_for_gender":
+        # Необязательные предпочтения для подбора пары
+        if answer.value not in ("male", "female", "any"):
+            raise HTTPException(status_code=400, detail="Invalid gender preference")
+        user.looking_for_gender = None if answer.value == "any" else answer.value
+    elif answer.field == "preferred_age":
+        # Формат "25-35"
+        try:
+            age_min, age_max = (int(part) for part in answer.value.split("-"))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid age range")
+        if age_min > age_max:
+            raise HTTPException(status_code=400, detail="Invalid age range")
+        user.preferred_age_min, user.preferred_age_max = age_min, age_max
     
-    await db.commit()
-    await db.refresh(user)
+    await user_service.save(user)
     
     # Определяем следующий шаг
     next_field = None
@@ -86,20 +85,19 @@ async def save_onboarding_answer(
         next_field = "gender"
     else:
         user.onboarding_completed = True
-        await db.commit()
+        await user_service.save(user)
     
     return {"status": "saved", "next_field": next_field, "completed": user.onboarding_completed}
 
 @router.get("/guess-gender")
 async def guess_gender(
     name: str,
-    init_data: str = Header(..., alias="X-Telegram-Init-Data")
+    telegram_id: int = Depends(get_telegram_id)
 ):
     """Предположение пола по имени"""
-    if not validate_telegram_init_data(init_data):
-        raise HTTPException(status_code=401, detail="Invalid Telegram init data")
-    
     openai_service = OpenAIService()
     guess = await openai_service.guess_gender(name)
     
-    return {"gender": guess}
+    # Неоднозначное имя (Саша, Женя): пол не подставляем, но клиент может сразу спросить
+    ambiguous = guess == "ambiguous"
+    return {"gender": "unknown" if ambiguous else guess, "ambiguous": ambiguous}
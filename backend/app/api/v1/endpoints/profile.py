@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import get_db
-from app.core.security import validate_telegram_init_data, extract_telegram_user_id
+from app.core.database import get_read_db
+from app.core.security import get_telegram_id
 from app.services.user_service import UserService
 from pydantic import BaseModel
 from typing import Optional
@@ -14,20 +14,16 @@ class ProfileResponse(BaseModel):
     age: Optional[int] = None
     city: Optional[str] = None
     gender: Optional[str] = None
+    looking_for_gender: Optional[str] = None
+    preferred_age_min: Optional[int] = None
+    preferred_age_max: Optional[int] = None
 
 @router.get("", response_model=ProfileResponse)
 async def get_profile(
-    init_data: str = Header(..., alias="X-Telegram-Init-Data"),
-    db: AsyncSession = Depends(get_db)
+    telegram_id: int = Depends(get_telegram_id),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Получение профиля пользователя"""
-    if not validate_telegram_init_data(init_data):
-        raise HTTPException(status_code=401, detail="Invalid Telegram init data")
-    
-    telegram_id = extract_telegram_user_id(init_data)
-    if not telegram_id:
-        raise HTTPException(status_code=401, detail="Could not extract user ID")
-    
     user_service = UserService(db)
     user = await user_service.get_by_telegram_id(telegram_id)
     
@@ -39,5 +35,8 @@ async def get_profile(
         first_name=user.first_name,
         age=user.age,
         city=user.city,
-        gender=user.gender
+        gender=user.gender,
+        looking_for_gender=user.looking_for_gender,
+        preferred_age_min=user.preferred_age_min,
+        preferred_age_max=user.preferred_age_max
     )
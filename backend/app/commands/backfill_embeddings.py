@@ -0,0 +1,79 @@
+"""
+Бэкфилл эмбеддингов для существующих clone_memories и diaries.
+
+    python -m app.commands.backfill_embeddings --table memories --rows-per-minute 3000
+
+Обрабатывает только строки без вектора, по возрастанию id, поэтому
+прерванный запуск можно просто перезапустить (или продолжить с --start-id).
+"""
+import argparse
+import asyncio
+import time
+from sqlalchemy import select
+from app.core.database import AsyncSessionLocal
+from app.models.diary import Diary
+from app.models.memory import CloneMemory
+from app.services.embedding_service import EmbeddingService, get_embedding_backend
+
+TABLES = {
+    "memories": (CloneMemory, CloneMemory.memory_embedding, (CloneMemory.id, CloneMemory.memory_content)),
+    "diaries": (Diary, Diary.content_embedding, (Diary.id, Diary.content_text)),
+}
+
+
+async def backfill(table: str, batch_size: int, rows_per_minute: int, start_id: int, backend: str | None):
+    model, embedding_column, columns = TABLES[table]
+    embedding_backend = get_embedding_backend(backend)
+    min_batch_seconds = 60.0 * batch_size / rows_per_minute if rows_per_minute else 0.0
+    
+    last_id = start_id
+    total = 0
+    started = time.perf_counter()
+    
+    while True:
+        batch_started = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            query = (
+                select(*columns)
+                .where(model.id > last_id, embedding_column.is_(None))
+                .order_by(model.id)
+                .limit(batch_size)
+            )
+            if model is Diary:
+                query = query.where(Diary.content_text.is_not(None))
+            rows = (await db.execute(query)).all()
+            if not rows:
+                break
+            
+            service = EmbeddingService(db, backend=embedding_backend, batch_size=batch_size)
+            if model is Diary:
+                await service.embed_diaries(rows)
+            else:
+                await service.embed_memories(rows)
+        
+        last_id = rows[-1].id
+        total += len(rows)
+        elapsed = time.perf_counter() - started
+        print(f"[{table}] embedded {total} rows, last_id={last_id}, {total / elapsed:.1f} rows/s")
+        
+        # Ограничение пропускной способности
+        pause = min_batch_seconds - (time.perf_counter() - batch_started)
+        if pause > 0:
+            await asyncio.sleep(pause)
+    
+    print(f"[{table}] done: {total} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill embeddings for memories and diaries")
+    parser.add_argument("--table", choices=sorted(TABLES), required=True)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--rows-per-minute", type=int, default=3000, help="0 - без ограничения")
+    parser.add_argument("--start-id", type=int, default=0)
+    parser.add_argument("--backend", choices=["openai", "local"], default=None)
+    args = parser.parse_args()
+    asyncio.run(backfill(args.table, args.batch_size, args.rows_per_minute, args.start_id, args.backend))
+
+
+if __name__ == "__main__":
+    main()
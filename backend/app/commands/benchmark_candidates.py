@@ -0,0 +1,118 @@
+"""
+Бенчмарк подбора кандидатов: recall@N и латентность HNSW против точного перебора.
+
+    python -m app.commands.benchmark_candidates --sample 200 --ef-search 40,100,200
+    python -m app.commands.benchmark_candidates --synthetic 20000
+
+С --synthetic во временной транзакции создаются пользователи и клоны
+со случайными (кластеризованными) векторами; в конце транзакция откатывается.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import numpy as np
+from sqlalchemy import select, insert, func
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.clone import Clone
+from app.models.user import User
+from app.services.matching_service import MatchingService
+
+CITIES = ["Москва", "Санкт-Петербург", "Казань", "Новосибирск", "Екатеринбург"]
+
+
+async def seed_synthetic(db, count: int, clusters: int = 50):
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(clusters, settings.EMBEDDING_DIMENSIONS)).astype(np.float32)
+    users = []
+    for _ in range(count):
+        gender = random.choice(["male", "female"])
+        age = random.randint(18, 60)
+        users.append({
+            # Отрицательные telegram_id не пересекаются с настоящими
+            "telegram_id": -random.randint(1, 2 ** 62),
+            "city": random.choice(CITIES),
+            "gender": gender,
+            "age": age,
+            "looking_for_gender": random.choice(["male", "female", None]),
+            "preferred_age_min": max(18, age - 8),
+            "preferred_age_max": age + 8,
+            "onboarding_completed": True,
+        })
+    user_ids = list((await db.execute(insert(User).returning(User.id), users)).scalars())
+    
+    vectors = centers[rng.integers(0, clusters, size=count)] + 0.5 * rng.normal(size=(count, settings.EMBEDDING_DIMENSIONS))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    await db.execute(
+        insert(Clone),
+        [
+            {"user_id": user_id, "status": "active", "personality_profile": {}, "personality_embedding": vector.tolist()}
+            for user_id, vector in zip(user_ids, vectors)
+        ]
+    )
+    print(f"seeded {count} synthetic clones")
+
+
+def _percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run(sample: int, ef_values: list[int], limit: int, synthetic: int):
+    async with AsyncSessionLocal() as db:
+        if synthetic:
+            await seed_synthetic(db, synthetic)
+        
+        clone_ids = list((await db.execute(
+            select(Clone.id)
+            .where(Clone.status == "active", Clone.personality_embedding.is_not(None))
+            .order_by(func.random())
+            .limit(sample)
+        )).scalars())
+        if not clone_ids:
+            print("no clones with personality_embedding; run with --synthetic N")
+            return
+        
+        service = MatchingService(db)
+        exact_results, exact_ms = {}, []
+        for clone_id in clone_ids:
+            started = time.perf_counter()
+            candidates = await service.find_candidates(clone_id, limit, exact=True)
+            exact_ms.append((time.perf_counter() - started) * 1000)
+            exact_results[clone_id] = {c.clone_id for c in candidates}
+        print(f"exact      p50={statistics.median(exact_ms):7.1f}ms p95={_percentile(exact_ms, 0.95):7.1f}ms")
+        
+        for ef_search in ef_values:
+            latencies, recalls = [], []
+            for clone_id in clone_ids:
+                started = time.perf_counter()
+                candidates = await service.find_candidates(clone_id, limit, ef_search=ef_search)
+                latencies.append((time.perf_counter() - started) * 1000)
+                expected = exact_results[clone_id]
+                if expected:
+                    recalls.append(len(expected & {c.clone_id for c in candidates}) / len(expected))
+            recall = statistics.mean(recalls) if recalls else 1.0
+            print(
+                f"ef={ef_search:<6} p50={statistics.median(latencies):7.1f}ms "
+                f"p95={_percentile(latencies, 0.95):7.1f}ms recall@{limit}={recall:.3f}"
+            )
+        
+        # Бенчмарк ничего не сохраняет
+        await db.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark clone candidate generation (recall and latency)")
+    parser.add_argument("--sample", type=int, default=100, help="число клонов-запросов")
+    parser.add_argument("--ef-search", default="40,100,200")
+    parser.add_argument("--limit", type=int, default=settings.MATCHING_CANDIDATES_PER_CLONE)
+    parser.add_argument("--synthetic", type=int, default=0, help="создать N временных клонов")
+    args = parser.parse_args()
+    ef_values = [int(v) for v in args.ef_search.split(",") if v]
+    asyncio.run(run(args.sample, ef_values, args.limit, args.synthetic))
+
+
+if __name__ == "__main__":
+    main()
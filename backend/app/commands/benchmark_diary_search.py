@@ -0,0 +1,146 @@
+"""
+Бенчмарк полнотекстового поиска по дневникам: латентность первой
+и последующих страниц для пользователя с большим числом дневников.
+
+    python -m app.commands.benchmark_diary_search --diaries 10000 --other-diaries 200000 --queries 100
+
+Синтетические дневники (русские слова в разных формах с распределением
+Ципфа) вставляются во временной транзакции, которая в конце откатывается
+(--keep - оставить данные). --other-diaries - дневники других пользователей,
+чтобы проверить, что индекс отсекает чужие строки.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import numpy as np
+from sqlalchemy import insert, text
+from app.core.database import AsyncSessionLocal
+from app.models.clone import Clone
+from app.models.diary import Diary
+from app.models.user import User
+from app.services.diary_service import DiaryService
+
+# Формы слов - проверяют стемминг конфигурации russian
+VOCABULARY = (
+    "переезд переезде переезжать переехали квартира квартиру квартире работа работу работе работаю "
+    "друзья друзьями подруга встреча встретились семья семьей мама маме папа брат сестра дети "
+    "отпуск отпуске море горы поездка поездку город городе дом доме деньги зарплата начальник "
+    "проект проекте команда команде учеба экзамен книга книгу фильм музыка концерт спорт бег "
+    "зал тренировка здоровье врач болезнь сон устал устала радость счастье тревога страх злость "
+    "грусть скучаю люблю любовь отношения свидание ссора разговор решение планы мечта цель"
+).split()
+FILLER = [f"слово{i}" for i in range(5000)]
+QUERIES = [
+    "переезд", "квартира", "работа начальник", "\"поездка на море\"", "друзья -работа",
+    "тревога", "семья", "проект команда", "отпуск", "здоровье врач",
+]
+INSERT_BATCH = 5000
+
+
+def _random_text(rng: np.random.Generator) -> str:
+    words = []
+    for rank in rng.zipf(1.2, size=int(rng.integers(80, 400))):
+        # Частые ранги - осмысленные слова, хвост - редкие
+        words.append(VOCABULARY[rank - 1] if rank <= len(VOCABULARY) else FILLER[rank % len(FILLER)])
+    return " ".join(words)
+
+
+async def _seed_user(db, rng: np.random.Generator, diaries: int) -> int:
+    user_id = (await db.execute(
+        insert(User).values(telegram_id=-random.randint(1, 2 ** 62), onboarding_completed=True).returning(User.id)
+    )).scalar_one()
+    clone_id = (await db.execute(
+        insert(Clone).values(user_id=user_id, status="active", personality_profile={}).returning(Clone.id)
+    )).scalar_one()
+    for start in range(0, diaries, INSERT_BATCH):
+        rows = []
+        for _ in range(start, min(diaries, start + INSERT_BATCH)):
+            content = _random_text(rng)
+            rows.append({
+                "user_id": user_id,
+                "clone_id": clone_id,
+                "content_text": content,
+                "word_count": len(content.split()),
+                "status": "completed",
+            })
+        await db.execute(insert(Diary), rows)
+    return user_id
+
+
+async def seed(db, diaries: int, other_diaries: int, other_users: int) -> int:
+    rng = np.random.default_rng(5)
+    started = time.perf_counter()
+    user_id = await _seed_user(db, rng, diaries)
+    for index in range(other_users):
+        await _seed_user(db, rng, other_diaries // other_users)
+        print(f"seeded {index + 1}/{other_users} other users, {time.perf_counter() - started:.0f}s", end="\r")
+    print()
+    await db.execute(text("ANALYZE diaries"))
+    return user_id
+
+
+def _report(name: str, latencies: list[float]):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    print(f"{name:<10} p50={statistics.median(latencies):7.1f}ms p95={p95:7.1f}ms")
+
+
+async def run(user_id: int | None, diaries: int, other_diaries: int, other_users: int, queries: int, pages: int, keep: bool):
+    async with AsyncSessionLocal() as db:
+        if user_id is None:
+            user_id = await seed(db, diaries, other_diaries, other_users)
+        
+        # План: должен идти через ix_diaries_user_search_gin (Bitmap Index Scan)
+        plan = await db.execute(
+            text(
+                "EXPLAIN ANALYZE SELECT id, ts_rank(search_vector, q) AS rank "
+                "FROM diaries, websearch_to_tsquery('russian', :query) AS q "
+                "WHERE user_id = :user_id AND search_vector @@ q "
+                "ORDER BY rank DESC, id DESC LIMIT 21"
+            ),
+            {"query": QUERIES[0], "user_id": user_id}
+        )
+        for (line,) in plan:
+            print(line)
+        
+        service = DiaryService(db)
+        first_ms, next_ms = [], []
+        for index in range(queries):
+            query = QUERIES[index % len(QUERIES)]
+            started = time.perf_counter()
+            _, cursor = await service.search_user_diaries(user_id, query, 20)
+            first_ms.append((time.perf_counter() - started) * 1000)
+            for _ in range(pages - 1):
+                if not cursor:
+                    break
+                started = time.perf_counter()
+                _, cursor = await service.search_user_diaries(user_id, query, 20, cursor)
+                next_ms.append((time.perf_counter() - started) * 1000)
+        
+        _report("first", first_ms)
+        if next_ms:
+            _report("next", next_ms)
+        
+        if keep:
+            await db.commit()
+        else:
+            await db.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark diary full-text search")
+    parser.add_argument("--user-id", type=int, default=None, help="искать по существующему пользователю без генерации")
+    parser.add_argument("--diaries", type=int, default=10_000, help="дневников у пользователя, по которому ищем")
+    parser.add_argument("--other-diaries", type=int, default=100_000)
+    parser.add_argument("--other-users", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=3, help="страниц на запрос (keyset)")
+    parser.add_argument("--keep", action="store_true", help="не откатывать синтетические данные")
+    args = parser.parse_args()
+    asyncio.run(run(args.user_id, args.diaries, args.other_diaries, args.other_users, args.queries, args.pages, args.keep))
+
+
+if __name__ == "__main__":
+    main()
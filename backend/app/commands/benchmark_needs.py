@@ -0,0 +1,144 @@
+"""
+Бенчмарк биржи потребностей: латентность подбора встречных предложений
+на большом числе offers (по умолчанию 1M).
+
+    python -m app.commands.benchmark_needs --offers 1000000 --embedded 50000 --queries 200
+
+Синтетические предложения (словарь с распределением Ципфа, 50 городов)
+вставляются во временной транзакции, которая в конце откатывается
+(--keep - оставить данные). Векторы получают только --embedded предложений,
+чтобы не строить HNSW на миллионе строк при каждом запуске.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import numpy as np
+from sqlalchemy import insert, text
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.clone import Clone
+from app.models.need import Need
+from app.models.user import User
+from app.services.need_service import NeedService, filter_terms, content_terms
+
+CITIES = [f"город{i}" for i in range(50)]
+VOCABULARY = [f"терм{i}" for i in range(20000)]
+INSERT_BATCH = 10000
+
+
+def _random_terms(rng: np.random.Generator) -> list[str]:
+    # Ципф: несколько очень частых термов и длинный хвост редких
+    ranks = np.minimum(rng.zipf(1.3, size=rng.integers(3, 7)), len(VOCABULARY)) - 1
+    return list(dict.fromkeys(VOCABULARY[r] for r in ranks))
+
+
+async def seed(db, offers: int, embedded: int):
+    rng = np.random.default_rng(7)
+    user_id = (await db.execute(
+        insert(User).values(telegram_id=-random.randint(1, 2 ** 62), onboarding_completed=True).returning(User.id)
+    )).scalar_one()
+    clone_id = (await db.execute(
+        insert(Clone).values(user_id=user_id, status="active", personality_profile={}).returning(Clone.id)
+    )).scalar_one()
+    
+    started = time.perf_counter()
+    for start in range(0, offers, INSERT_BATCH):
+        rows = []
+        for index in range(start, min(offers, start + INSERT_BATCH)):
+            terms = _random_terms(rng)
+            city = CITIES[index % len(CITIES)]
+            row = {
+                "user_id": user_id,
+                "clone_id": clone_id,
+                "need_type": "thing",
+                "direction": "offer",
+                "title": " ".join(terms)[:255],
+                "city": city,
+                "terms": terms + filter_terms("offer", city),
+                "status": "active",
+            }
+            if index < embedded:
+                vector = rng.normal(size=settings.EMBEDDING_DIMENSIONS)
+                row["need_embedding"] = (vector / np.linalg.norm(vector)).tolist()
+            rows.append(row)
+        await db.execute(insert(Need), rows)
+        print(f"seeded {start + len(rows)} offers, {time.perf_counter() - started:.0f}s", end="\r")
+    print()
+    await db.execute(text("ANALYZE needs"))
+
+
+def _report(name: str, latencies: list[float]):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    print(f"{name:<10} p50={statistics.median(latencies):7.1f}ms p95={p95:7.1f}ms")
+
+
+async def run(offers: int, embedded: int, queries: int, keep: bool):
+    async with AsyncSessionLocal() as db:
+        if offers:
+            await seed(db, offers, embedded)
+        
+        rng = np.random.default_rng(11)
+        service = NeedService(db)
+        probe = [
+            Need(
+                user_id=0,
+                direction="need",
+                need_type="thing",
+                city=random.choice(CITIES),
+                terms=_random_terms(rng)
+            )
+            for _ in range(queries)
+        ]
+        
+        # План лексического запроса: должен идти через GIN (Bitmap Index Scan)
+        need = probe[0]
+        plan = await db.execute(
+            text(
+                "EXPLAIN SELECT id FROM needs WHERE terms @> :filters AND terms && :terms "
+                "ORDER BY id DESC LIMIT :limit"
+            ),
+            {
+                "filters": filter_terms("offer", need.city),
+                "terms": content_terms(need.terms),
+                "limit": settings.NEEDS_LEXICAL_SCAN_LIMIT
+            }
+        )
+        for (line,) in plan:
+            print(line)
+        
+        lexical_ms, full_ms = [], []
+        for need in probe:
+            filters = filter_terms("offer", need.city)
+            started = time.perf_counter()
+            await service._lexical(need, filters, content_terms(need.terms))
+            lexical_ms.append((time.perf_counter() - started) * 1000)
+            
+            vector = rng.normal(size=settings.EMBEDDING_DIMENSIONS)
+            started = time.perf_counter()
+            await service.find_matches(need, (vector / np.linalg.norm(vector)).tolist() if embedded else None)
+            full_ms.append((time.perf_counter() - started) * 1000)
+        
+        _report("lexical", lexical_ms)
+        _report("match", full_ms)
+        
+        if keep:
+            await db.commit()
+        else:
+            await db.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark needs/offers matching")
+    parser.add_argument("--offers", type=int, default=1_000_000, help="0 - на существующих данных")
+    parser.add_argument("--embedded", type=int, default=50_000, help="сколько предложений получают векторы")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--keep", action="store_true", help="не откатывать синтетические данные")
+    args = parser.parse_args()
+    asyncio.run(run(args.offers, args.embedded, args.queries, args.keep))
+
+
+if __name__ == "__main__":
+    main()
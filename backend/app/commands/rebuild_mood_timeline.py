@@ -0,0 +1,46 @@
+"""
+Пересчет агрегатов динамики настроения (mood_rollups) из дневников.
+
+    python -m app.commands.rebuild_mood_timeline --user-id 42
+    python -m app.commands.rebuild_mood_timeline
+
+Обычно агрегаты обновляются инкрементально при анализе дневника;
+команда нужна для заполнения после миграции и после смены формулы.
+"""
+import argparse
+import asyncio
+from sqlalchemy import select
+from app.core.database import AsyncSessionLocal
+from app.models.diary import Diary
+from app.services.mood_timeline_service import MoodTimelineService
+
+
+async def run(user_id: int | None):
+    async with AsyncSessionLocal() as db:
+        if user_id is not None:
+            user_ids = [user_id]
+        else:
+            user_ids = list((await db.execute(
+                select(Diary.user_id).where(Diary.analysis_result.is_not(None)).distinct().order_by(Diary.user_id)
+            )).scalars())
+    
+    total = 0
+    for current_id in user_ids:
+        # Отдельная сессия на пользователя: блокировка клона держится недолго
+        async with AsyncSessionLocal() as db:
+            rows = await MoodTimelineService(db).rebuild(current_id)
+        total += rows
+        print(f"[user {current_id}] {rows} rollups")
+    
+    print(f"done: {len(user_ids)} users, {total} rollups")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild mood timeline rollups from diary analyses")
+    parser.add_argument("--user-id", type=int, default=None)
+    args = parser.parse_args()
+    asyncio.run(run(args.user_id))
+
+
+if __name__ == "__main__":
+    main()
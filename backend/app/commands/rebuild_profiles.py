@@ -0,0 +1,55 @@
+"""
+Полный пересчет профилей клонов из analysis_result их дневников.
+
+    python -m app.commands.rebuild_profiles --clone-id 42
+    python -m app.commands.rebuild_profiles --verify
+
+Обычно профиль обновляется инкрементально при анализе дневника;
+команда нужна после смены формулы слияния и для сверки (--verify
+только сравнивает, ничего не сохраняя).
+"""
+import argparse
+import asyncio
+from sqlalchemy import select
+from app.core.database import AsyncSessionLocal
+from app.models.clone import Clone
+from app.services.profile_service import ProfileService
+
+
+async def run(clone_id: int | None, verify: bool):
+    async with AsyncSessionLocal() as db:
+        if clone_id is not None:
+            clone_ids = [clone_id]
+        else:
+            clone_ids = list((await db.execute(select(Clone.id).order_by(Clone.id))).scalars())
+    
+    mismatched = 0
+    for current_id in clone_ids:
+        # Отдельная сессия на клон: блокировка строки держится недолго
+        async with AsyncSessionLocal() as db:
+            service = ProfileService(db)
+            if verify:
+                diffs = await service.verify(current_id)
+                if diffs:
+                    mismatched += 1
+                    print(f"[clone {current_id}] differs: {', '.join(diffs)}")
+            else:
+                await service.rebuild(current_id)
+                print(f"[clone {current_id}] rebuilt")
+    
+    if verify:
+        print(f"done: {len(clone_ids)} clones checked, {mismatched} differ")
+    else:
+        print(f"done: {len(clone_ids)} clones rebuilt")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild clone personality profiles from diary analyses")
+    parser.add_argument("--clone-id", type=int, default=None)
+    parser.add_argument("--verify", action="store_true", help="только сравнить с сохраненным профилем")
+    args = parser.parse_args()
+    asyncio.run(run(args.clone_id, args.verify))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import logging
+import time
+import weakref
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Optional
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+from sqlalchemy import Date, DateTime, Numeric
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Клиент привязан к event loop: воркеры Celery запускают свой loop на задачу
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, redis.Redis]" = weakref.WeakKeyDictionary()
+
+# Маркер негативного кэша (объекта нет в БД)
+_MISSING = "__missing__"
+
+
+class TTLCache:
+    """In-process LRU-кэш с TTL на каждую запись"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Any, tuple[Any, float]] = OrderedDict()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Any, value: Any, expires_at: float | None = None):
+        """Срок жизни - не дольше ttl, даже если expires_at дальше"""
+        deadline = time.time() + self.ttl
+        self._data[key] = (value, min(expires_at, deadline) if expires_at else deadline)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Any, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return entry[0] if entry else default
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def get_redis() -> redis.Redis:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+        _clients[loop] = client
+    return client
+
+
+def model_to_dict(obj) -> dict:
+    """
+    Сериализует загруженные колонки ORM-объекта в JSON-совместимый dict.
+    Незагруженные (deferred, например векторы) пропускаются - чтение
+    не должно вызывать lazy load.
+    """
+    data = {}
+    unloaded = inspect(obj).unloaded
+    for column in obj.__table__.columns:
+        if column.key in unloaded:
+            continue
+        value = getattr(obj, column.key)
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+        elif hasattr(value, "tolist"):
+            # Вектор pgvector (numpy.ndarray)
+            value = value.tolist()
+        data[column.key] = value
+    return data
+
+
+def model_from_dict(model, data: dict):
+    """
+    Восстанавливает detached ORM-объект, как будто он только что загружен.
+    Колонки, которых нет в data, остаются незагруженными, как deferred.
+    """
+    values = {}
+    for column in model.__table__.columns:
+        if column.key not in data:
+            continue
+        value = data[column.key]
+        if value is not None:
+            if isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(column.type, Date):
+                value = date.fromisoformat(value)
+            elif isinstance(column.type, Numeric):
+                value = Decimal(value)
+        values[column.key] = value
+    obj = model(**values)
+    make_transient_to_detached(obj)
+    return obj
+
+
+class ModelCache:
+    """
+    Read-through кэш ORM-объектов в Redis.
+
+    Хранит только колонки; при попадании объект присоединяется к сессии
+    через merge(load=False) без запроса к БД, поэтому дальнейшие изменения
+    сохраняются обычным commit. Ошибки Redis не ломают запрос - идем в БД.
+    Промахи на сессии реплики (info["replica"]) кэш не заполняют: отставшая
+    строка или ее отсутствие спрятали бы от всех уже сделанные на primary записи.
+    """
+
+    def __init__(self, model, namespace: str, ttl: int | None = None, negative_ttl: int | None = None):
+        self.model = model
+        self.namespace = namespace
+        self.ttl = ttl or settings.CACHE_TTL_SECONDS
+        self.negative_ttl = negative_ttl or settings.CACHE_NEGATIVE_TTL_SECONDS
+
+    def key(self, lookup: Any) -> str:
+        return f"cache:{self.namespace}:{lookup}"
+
+    async def get(self, db: AsyncSession, lookup: Any, loader, cache_write: bool | None = None) -> Optional[Any]:
+        if not settings.CACHE_ENABLED:
+            return await loader()
+
+        key = self.key(lookup)
+        raw = None
+        try:
+            raw = await get_redis().get(key)
+        except RedisError as e:
+            logger.warning("Cache get failed for %s: %s", key, e)
+            metrics.incr(f"cache.{self.namespace}.errors")
+
+        if raw is not None:
+            metrics.incr(f"cache.{self.namespace}.hits")
+            if raw == _MISSING:
+                return None
+            return await db.merge(model_from_dict(self.model, json.loads(raw)), load=False)
+
+        metrics.incr(f"cache.{self.namespace}.misses")
+        obj = await loader()
+        if cache_write is None:
+            cache_write = not db.info.get("replica", False)
+        if cache_write:
+            await self.set(lookup, obj)
+        else:
+            metrics.incr(f"cache.{self.namespace}.replica_misses")
+        return obj
+
+    async def set(self, lookup: Any, obj):
+        if not settings.CACHE_ENABLED:
+            return
+        try:
+            if obj is None:
+                await get_redis().set(self.key(lookup), _MISSING, ex=self.negative_ttl)
+            else:
+                await get_redis().set(self.key(lookup), json.dumps(model_to_dict(obj), ensure_ascii=False), ex=self.ttl)
+        except RedisError as e:
+            logger.warning("Cache set failed for %s: %s", self.key(lookup), e)
+            metrics.incr(f"cache.{self.namespace}.errors")
+
+    async def invalidate(self, lookup: Any):
+        if not settings.CACHE_ENABLED:
+            return
+        try:
+            await get_redis().delete(self.key(lookup))
+            metrics.incr(f"cache.{self.namespace}.invalidations")
+        except RedisError as e:
+            logger.warning("Cache invalidate failed for %s: %s", self.key(lookup), e)
+            metrics.incr(f"cache.{self.namespace}.errors")
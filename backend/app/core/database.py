@@ -1,15 +1,77 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import time
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 from app.core.config import settings
+from app.core.metrics import metrics
 
-# Заменяем postgresql:// на postgresql+asyncpg:// для async
-database_url = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
 
-engine = create_async_engine(
-    database_url,
-    echo=settings.ENVIRONMENT == "development",
-    future=True
-)
+def _instrumented_pool_class(name: str) -> type[AsyncAdaptedQueuePool]:
+    """
+    Класс пула, который замеряет ожидание свободного соединения.
+    Имя метрики - в замыкании: pool.recreate() создает пул того же класса
+    """
+
+    class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                metrics.observe(f"db.{name}.checkout_wait_ms", (time.perf_counter() - started) * 1000)
+
+    return InstrumentedQueuePool
+
+
+def _async_url(url: str):
+    # Заменяем postgresql:// на postgresql+asyncpg:// для async
+    async_url = make_url(url.replace("postgresql://", "postgresql+asyncpg://"))
+    # Кэш prepared statements на уровне диалекта SQLAlchemy
+    return async_url.update_query_dict({
+        "prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)
+    })
+
+
+def _create_engine(url: str, name: str) -> AsyncEngine:
+    pooled_engine = create_async_engine(
+        _async_url(url),
+        echo=settings.DB_ECHO,
+        poolclass=_instrumented_pool_class(name),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        # Кэш statements самого asyncpg (0 - для pgbouncer в transaction mode)
+        connect_args={"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+        future=True
+    )
+    @event.listens_for(pooled_engine.sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.incr(f"db.{name}.checkouts")
+
+    @event.listens_for(pooled_engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.incr(f"db.{name}.connects")
+
+    def _collect_pool_stats() -> dict:
+        # Пул читается при каждом сборе: после recreate (dispose) он другой
+        pool = pooled_engine.sync_engine.pool
+        return {
+            f"db.{name}.pool_size": pool.size(),
+            f"db.{name}.checked_out": pool.checkedout(),
+            f"db.{name}.checked_in": pool.checkedin(),
+            f"db.{name}.overflow": pool.overflow(),
+        }
+
+    metrics.register_collector(_collect_pool_stats)
+    return pooled_engine
+
+
+engine = _create_engine(settings.DATABASE_URL, "primary")
 
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -17,11 +79,42 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
+# Реплика для read-only эндпоинтов; без DATABASE_REPLICA_URL читаем с primary
+read_engine: Optional[AsyncEngine] = (
+    _create_engine(settings.DATABASE_REPLICA_URL, "replica") if settings.DATABASE_REPLICA_URL else None
+)
+
+# info["replica"] - сессия может отставать от primary: ModelCache не кэширует ее чтения
+ReadSessionLocal = async_sessionmaker(
+    read_engine or engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    info={"replica": read_engine is not None}
+)
+
+# Движок для Celery-воркеров: каждая задача крутит собственный event loop,
+# поэтому соединения asyncpg не должны переживать задачу (без пула)
+worker_engine = create_async_engine(
+    _async_url(settings.DATABASE_URL),
+    poolclass=NullPool,
+    connect_args={"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+    future=True
+)
+
+WorkerSessionLocal = async_sessionmaker(
+    worker_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
 async def get_db() -> AsyncSession:
+    # Соединение берется из пула только при первом запросе сессии
     async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+        yield session
+
+async def get_read_db() -> AsyncSession:
+    """Сессия для read-only эндпоинтов (реплика, если настроена)"""
+    async with ReadSessionLocal() as session:
+        yield session
@@ -0,0 +1,59 @@
+from collections import defaultdict
+from threading import Lock
+from typing import Callable
+
+
+class Metrics:
+    """Простые in-process счетчики и гейджи, отдаются через GET /metrics"""
+
+    def __init__(self):
+        self._counters: dict[str, float] = defaultdict(float)
+        self._gauges: dict[str, float] = {}
+        self._summaries: dict[str, dict[str, float]] = {}
+        self._collectors: list[Callable[[], dict[str, float]]] = []
+        self._lock = Lock()
+
+    def register_collector(self, collector: Callable[[], dict[str, float]]):
+        """Функция, возвращающая гейджи на момент снимка (например, состояние пула)"""
+        self._collectors.append(collector)
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        """Наблюдение для сводки count/sum/min/max (латентности и т.п.)"""
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                self._summaries[name] = {"count": 1, "sum": value, "min": value, "max": value}
+            else:
+                summary["count"] += 1
+                summary["sum"] += value
+                summary["min"] = min(summary["min"], value)
+                summary["max"] = max(summary["max"], value)
+
+    def get(self, name: str) -> float:
+        return self._counters.get(name, self._gauges.get(name, 0))
+
+    def ratio(self, hits: str, misses: str) -> float:
+        total = self.get(hits) + self.get(misses)
+        return self.get(hits) / total if total else 0.0
+
+    def snapshot(self) -> dict:
+        for collector in self._collectors:
+            for name, value in collector().items():
+                self.set_gauge(name, value)
+        with self._lock:
+            summaries = {
+                name: {**summary, "avg": summary["sum"] / summary["count"]}
+                for name, summary in self._summaries.items()
+            }
+            return {"counters": dict(self._counters), "gauges": dict(self._gauges), "summaries": summaries}
+
+
+metrics = Metrics()
@@ -1,55 +1,92 @@
 import hmac
 import hashlib
+import json
+import time
+from functools import lru_cache
+from typing import Optional
 from urllib.parse import parse_qsl
+from fastapi import Header, HTTPException
+from app.core.cache import TTLCache
 from app.core.config import settings
 
-def validate_telegram_init_data(init_data: str) -> bool:
+
+@lru_cache(maxsize=1)
+def _get_secret_key() -> bytes:
+    """Секретный ключ WebAppData вычисляется один раз на процесс"""
+    return hmac.new(
+        "WebAppData".encode(),
+        settings.TELEGRAM_BOT_TOKEN.encode(),
+        hashlib.sha256
+    ).digest()
+
+
+# Ограниченный TTL-кэш уже проверенных initData -> telegram_id
+init_data_cache = TTLCache(
+    maxsize=settings.TELEGRAM_INIT_DATA_CACHE_SIZE,
+    ttl=settings.TELEGRAM_INIT_DATA_CACHE_TTL
+)
+
+
+def verify_init_data(init_data: str) -> Optional[int]:
     """
-    Валидация initData от Telegram Web App
+    Проверяет подпись и свежесть initData за один разбор строки.
+    Возвращает telegram_id пользователя или None, если данные невалидны.
     """
+    cached = init_data_cache.get(init_data)
+    if cached is not None:
+        return cached
+
     try:
-        # Парсим данные
-        parsed_data = dict(parse_qsl(init_data))
-        
-        # Извлекаем hash и остальные данные
+        parsed_data = dict(parse_qsl(init_data, strict_parsing=True))
         received_hash = parsed_data.pop('hash', '')
-        
-        # Создаем секретный ключ
-        secret_key = hmac.new(
-            "WebAppData".encode(),
-            settings.TELEGRAM_BOT_TOKEN.encode(),
-            hashlib.sha256
-        ).digest()
-        
-        # Создаем строку для проверки
+
         data_check_string = '\n'.join(
-            f"{key}={value}" 
+            f"{key}={value}"
             for key, value in sorted(parsed_data.items())
         )
-        
-        # Вычисляем hash
         calculated_hash = hmac.new(
-            secret_key,
+            _get_secret_key(),
             data_check_string.encode(),
             hashlib.sha256
         ).hexdigest()
-        
-        # Сравниваем
-        return hmac.compare_digest(calculated_hash, received_hash)
-    except Exception:
-        return False
+        if not hmac.compare_digest(calculated_hash, received_hash):
+            return None
+
+        # Защита от повторного использования старых initData
+        auth_date = int(parsed_data.get('auth_date', 0))
+        expires_at = auth_date + settings.TELEGRAM_INIT_DATA_MAX_AGE
+        if expires_at <= time.time():
+            return None
+
+        telegram_id = json.loads(parsed_data.get('user', '{}')).get('id')
+        if not telegram_id:
+            return None
+    except (ValueError, AttributeError, TypeError):
+        # TypeError - compare_digest с не-ASCII hash
+        return None
+
+    init_data_cache.set(init_data, telegram_id, expires_at)
+    return telegram_id
+
+
+async def get_telegram_id(
+    init_data: str = Header(..., alias="X-Telegram-Init-Data")
+) -> int:
+    """FastAPI-зависимость: telegram_id из проверенного X-Telegram-Init-Data"""
+    telegram_id = verify_init_data(init_data)
+    if telegram_id is None:
+        raise HTTPException(status_code=401, detail="Invalid Telegram init data")
+    return telegram_id
+
+
+def validate_telegram_init_data(init_data: str) -> bool:
+    """
+    Валидация initData от Telegram Web App
+    """
+    return verify_init_data(init_data) is not None
 
 def extract_telegram_user_id(init_data: str) -> Optional[int]:
     """
     Извлекает telegram_id пользователя из initData
     """
-    try:
-        parsed_data = dict(parse_qsl(init_data))
-        user_data = parsed_data.get('user', '')
-        if user_data:
-            import json
-            user = json.loads(user_data)
-            return user.get('id')
-    except Exception:
-        pass
-    return None
+    return verify_init_data(init_data)
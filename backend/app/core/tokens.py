@@ -0,0 +1,23 @@
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - без tiktoken считаем приблизительно
+    tiktoken = None
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """Число токенов текста для модели (~3 символа на токен без tiktoken)"""
+    if not text:
+        return 0
+    if tiktoken is None:
+        return len(text) // 3 + 1
+    return len(_get_encoding(model).encode(text))
@@ -2,5 +2,13 @@ from app.models.user import User
 from app.models.clone import Clone
 from app.models.diary import Diary
 from app.models.memory import CloneMemory
+from app.models.embedding_cache import EmbeddingCache
+from app.models.clone_question import CloneQuestion
+from app.models.clone_candidate import CloneCandidate
+from app.models.clone_conversation import CloneConversation
+from app.models.need import Need
+from app.models.match import Match
+from app.models.mood_rollup import MoodRollup
+from app.models.result_cache import ResultCache
 
-__all__ = ["User", "Clone", "Diary", "CloneMemory"]
+__all__ = ["User", "Clone", "Diary", "CloneMemory", "EmbeddingCache", "CloneQuestion", "CloneCandidate", "CloneConversation", "Need", "Match", "MoodRollup", "ResultCache"]
@@ -1,6 +1,9 @@
-from sqlalchemy import Column, BigInteger, String, Integer, Numeric, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, BigInteger, String, Integer, Numeric, DateTime, ForeignKey, JSON, Text, Index, Computed
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
+from pgvector.sqlalchemy import Vector
+from app.core.config import settings
 from app.core.database import Base
 
 class Clone(Base):
@@ -9,11 +12,25 @@ class Clone(Base):
     id = Column(BigInteger, primary_key=True, index=True)
     user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     
-    # Профиль личности (JSONB)
-    personality_profile = Column(JSON, nullable=False, default={})
+    # Профиль личности (JSONB, GIN jsonb_path_ops)
+    personality_profile = Column(JSONB, nullable=False, default={})
+    # Горячие поля профиля для фильтров в SQL
+    overall_mood = Column(String(50), Computed("personality_profile #>> '{emotions,mood}'", persisted=True))
+    emotion_intensity = Column(Numeric, Computed(
+        "CASE WHEN jsonb_typeof(personality_profile #> '{emotions,intensity}') = 'number' "
+        "THEN (personality_profile #>> '{emotions,intensity}')::numeric END",
+        persisted=True
+    ))
+    # Ценности по убыванию веса; заполняется при сборке профиля (ProfileService)
+    top_values = Column(ARRAY(Text), nullable=False, default=[])
+    # Накопленные взвешенные агрегаты, из которых строится профиль (profile_merge)
+    profile_aggregates = Column(JSON, nullable=False, default={})
     
-    # Векторное представление (будет добавлено после установки pgvector)
-    # personality_embedding = Column(VECTOR(1536))
+    # Векторное представление профиля для подбора кандидатов (HNSW, cosine).
+    # Загружается только явно: клон читается часто, а вектор нужен лишь матчингу
+    personality_embedding = deferred(Column(Vector(settings.EMBEDDING_DIMENSIONS), nullable=True))
+    # profile_version, по которой посчитан personality_embedding
+    personality_embedding_version = Column(Integer, nullable=True)
     
     # Статистика
     accuracy_score = Column(Numeric(5, 2), default=0.00)
@@ -21,6 +38,9 @@ class Clone(Base):
     last_diary_at = Column(DateTime, nullable=True)
     total_words_analyzed = Column(Integer, default=0)
     
+    # Версия профиля/памяти: растет с каждым новым анализом (ключ кэша ответов)
+    profile_version = Column(Integer, nullable=False, default=0)
+    
     # Состояние
     status = Column(String(50), default="creating")  # creating, active, paused, deleted
     training_stage = Column(String(50), default="initial")  # initial, learning, mature
@@ -32,3 +52,12 @@ class Clone(Base):
     
     # Relationships
     user = relationship("User", backref="clones")
+    
+    __table_args__ = (
+        Index(
+            "ix_clones_personality_profile_gin", "personality_profile",
+            postgresql_using="gin", postgresql_ops={"personality_profile": "jsonb_path_ops"}
+        ),
+        Index("ix_clones_top_values_gin", "top_values", postgresql_using="gin"),
+        Index("ix_clones_overall_mood", "overall_mood"),
+    )
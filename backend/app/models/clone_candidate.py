@@ -0,0 +1,20 @@
+from sqlalchemy import Column, BigInteger, Float, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class CloneCandidate(Base):
+    """Предрасчитанные кандидаты в пару (ночной батч матчинга)"""
+    __tablename__ = "clone_candidates"
+    
+    clone_id = Column(BigInteger, ForeignKey("clones.id", ondelete="CASCADE"), primary_key=True)
+    candidate_clone_id = Column(BigInteger, ForeignKey("clones.id", ondelete="CASCADE"), primary_key=True)
+    
+    # Косинусная близость профилей
+    similarity = Column(Float, nullable=False)
+    
+    # Метаданные
+    computed_at = Column(DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_clone_candidates_clone_similarity", "clone_id", similarity.desc()),
+    )
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, BigInteger, String, Integer, Float, DateTime, ForeignKey, JSON, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class CloneConversation(Base):
+    """Диалог двух клонов для оценки совместимости (пара хранится как clone1_id < clone2_id)"""
+    __tablename__ = "clone_conversations"
+    
+    id = Column(BigInteger, primary_key=True, index=True)
+    clone1_id = Column(BigInteger, ForeignKey("clones.id", ondelete="CASCADE"), nullable=False, index=True)
+    clone2_id = Column(BigInteger, ForeignKey("clones.id", ondelete="CASCADE"), nullable=False, index=True)
+    
+    # Диалог: [{"clone_id": ..., "content": ...}], сохраняется после каждой реплики
+    messages = Column(JSON, nullable=False, default=[])
+    
+    # Результаты анализа
+    expected_score = Column(Float, nullable=True)  # близость профилей на момент планирования
+    compatibility_analysis = Column(JSON, nullable=True)
+    
+    # Статус
+    status = Column(String(50), default="active")  # active, completed, stopped_early, failed
+    conversation_length = Column(Integer, default=0)  # Количество сообщений
+    tokens_used = Column(Integer, default=0)
+    error_count = Column(Integer, nullable=False, default=0)  # временные ошибки подряд; диалог остается active
+    
+    # Метаданные
+    started_at = Column(DateTime, server_default=func.now())
+    last_message_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_clone_conversations_pair_started", "clone1_id", "clone2_id", started_at.desc()),
+        Index("ix_clone_conversations_status", "status"),
+    )
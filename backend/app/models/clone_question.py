@@ -0,0 +1,26 @@
+from sqlalchemy import Column, BigInteger, String, Integer, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+
+class CloneQuestion(Base):
+    __tablename__ = "clone_questions"
+    
+    id = Column(BigInteger, primary_key=True, index=True)
+    clone_id = Column(BigInteger, ForeignKey("clones.id", ondelete="CASCADE"), nullable=False, index=True)
+    
+    # Вопрос и ответ клона
+    question = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    model = Column(String(100), nullable=True)
+    
+    # Латентность
+    streamed = Column(Boolean, default=False)
+    time_to_first_token_ms = Column(Integer, nullable=True)
+    latency_ms = Column(Integer, nullable=True)
+    
+    # Метаданные
+    created_at = Column(DateTime, server_default=func.now())
+    
+    # Relationships
+    clone = relationship("Clone", backref="questions")
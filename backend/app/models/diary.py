@@ -1,6 +1,9 @@
-from sqlalchemy import Column, BigInteger, String, Integer, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, BigInteger, String, Integer, Numeric, DateTime, ForeignKey, Text, Index, Computed
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
+from pgvector.sqlalchemy import Vector
+from app.core.config import settings
 from app.core.database import Base
 
 class Diary(Base):
@@ -11,18 +14,36 @@ class Diary(Base):
     clone_id = Column(BigInteger, ForeignKey("clones.id", ondelete="CASCADE"), nullable=False, index=True)
     
     # Контент
-    content_text = Column(Text, nullable=False)
+    content_text = Column(Text, nullable=True)  # NULL, пока аудио не расшифровано
     audio_file_path = Column(String(500), nullable=True)
+    audio_sha256 = Column(String(64), nullable=True)  # ключ кэша транскрипции
     audio_duration_seconds = Column(Integer, nullable=True)
     word_count = Column(Integer, nullable=True)
+    # Полнотекстовый поиск: пересчитывается СУБД при любой записи content_text
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed("to_tsvector('russian', coalesce(content_text, ''))", persisted=True)
+    ))
     
-    # Анализ
-    analysis_result = Column(JSON, nullable=True)
+    # Обработка (transcribe -> analyze -> extract_memories)
+    status = Column(String(50), nullable=False, default="pending")  # pending, transcribing, analyzing, extracting, completed, failed
+    error_message = Column(Text, nullable=True)
     
-    # Векторное представление (будет добавлено после установки pgvector)
-    # content_embedding = Column(VECTOR(1536))
+    # Анализ (JSONB, GIN jsonb_path_ops - запросы вида analysis_result @> {...})
+    analysis_result = Column(JSONB, nullable=True)
+    # Горячие поля анализа - генерируемые колонки для фильтров и агрегатов в SQL
+    mood = Column(String(50), Computed("analysis_result #>> '{emotions,mood}'", persisted=True))
+    emotion_intensity = Column(Numeric, Computed(
+        "CASE WHEN jsonb_typeof(analysis_result #> '{emotions,intensity}') = 'number' "
+        "THEN (analysis_result #>> '{emotions,intensity}')::numeric END",
+        persisted=True
+    ))
+    
+    # Векторное представление (HNSW-индекс, cosine)
+    content_embedding = Column(Vector(settings.EMBEDDING_DIMENSIONS), nullable=True)
     
     # Метаданные
+    idempotency_key = Column(String(100), nullable=True)  # заголовок Idempotency-Key запроса на создание
     created_at = Column(DateTime, server_default=func.now())
     analyzed_at = Column(DateTime, nullable=True)
     analysis_version = Column(String(50), nullable=True)
@@ -30,3 +51,20 @@ class Diary(Base):
     # Relationships
     user = relationship("User", backref="diaries")
     clone = relationship("Clone", backref="diaries")
+    
+    __table_args__ = (
+        # Keyset-пагинация списка дневников пользователя
+        Index("ix_diaries_user_created_id", "user_id", created_at.desc(), id.desc()),
+        Index(
+            "ix_diaries_analysis_result_gin", "analysis_result",
+            postgresql_using="gin", postgresql_ops={"analysis_result": "jsonb_path_ops"}
+        ),
+        Index("ix_diaries_user_mood", "user_id", "mood"),
+        # Повтор POST /diaries с тем же ключом не создает второй дневник
+        Index(
+            "ix_diaries_user_idempotency_key", "user_id", "idempotency_key",
+            unique=True, postgresql_where=idempotency_key.is_not(None)
+        ),
+        # Поиск в дневниках одного пользователя (btree_gin): user_id и термы в одном индексе
+        Index("ix_diaries_user_search_gin", "user_id", "search_vector", postgresql_using="gin"),
+    )
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from pgvector.sqlalchemy import Vector
+from app.core.config import settings
+from app.core.database import Base
+
+class EmbeddingCache(Base):
+    __tablename__ = "embedding_cache"
+    
+    # sha256(модель + нормализованный текст)
+    content_hash = Column(String(64), primary_key=True)
+    model = Column(String(100), nullable=False)
+    embedding = Column(Vector(settings.EMBEDDING_DIMENSIONS), nullable=False)
+    
+    created_at = Column(DateTime, server_default=func.now())
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, BigInteger, String, Numeric, DateTime, ForeignKey, JSON, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class Match(Base):
+    """Совпадение потребности (need1) с предложением (need2)"""
+    __tablename__ = "matches"
+    
+    id = Column(BigInteger, primary_key=True, index=True)
+    user1_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    user2_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    need1_id = Column(BigInteger, ForeignKey("needs.id", ondelete="CASCADE"), nullable=False)
+    need2_id = Column(BigInteger, ForeignKey("needs.id", ondelete="CASCADE"), nullable=False)
+    
+    # Тип совпадения
+    match_type = Column(String(50), nullable=False)  # thing, job, service
+    
+    # Детали совпадения
+    match_score = Column(Numeric(5, 2), nullable=True)  # 0-100
+    details = Column(JSON, nullable=True)  # лексическая и семантическая оценки
+    
+    # Статус
+    status = Column(String(50), default="pending")  # pending, shown, accepted, rejected, completed, cancelled
+    
+    # Метаданные
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint("need1_id", "need2_id", name="uq_matches_need_pair"),
+        Index("ix_matches_users", "user1_id", "user2_id"),
+        Index("ix_matches_status", "status"),
+    )
@@ -1,6 +1,8 @@
 from sqlalchemy import Column, BigInteger, String, Integer, DateTime, ForeignKey, Text, Numeric
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
+from pgvector.sqlalchemy import Vector
+from app.core.config import settings
 from app.core.database import Base
 
 class CloneMemory(Base):
@@ -19,8 +21,8 @@ class CloneMemory(Base):
     importance_score = Column(Numeric(3, 2), default=0.5)
     confidence_score = Column(Numeric(3, 2), default=0.5)
     
-    # Векторное представление (будет добавлено после установки pgvector)
-    # memory_embedding = Column(VECTOR(1536))
+    # Векторное представление (HNSW-индекс, cosine)
+    memory_embedding = Column(Vector(settings.EMBEDDING_DIMENSIONS), nullable=True)
     
     # Метаданные
     created_at = Column(DateTime, server_default=func.now())
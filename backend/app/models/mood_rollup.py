@@ -0,0 +1,25 @@
+from sqlalchemy import Column, BigInteger, String, Integer, Float, Date, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class MoodRollup(Base):
+    """Агрегаты настроения пользователя за день/неделю/месяц (по проанализированным дневникам)"""
+    __tablename__ = "mood_rollups"
+    
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    period = Column(String(10), primary_key=True)  # day, week, month
+    period_start = Column(Date, primary_key=True)
+    
+    # Счетчики
+    diaries_count = Column(Integer, nullable=False, default=0)
+    words_count = Column(Integer, nullable=False, default=0)
+    intensity_sum = Column(Float, nullable=False, default=0)
+    intensity_count = Column(Integer, nullable=False, default=0)
+    
+    # Распределения: {"positive": 3, ...}, {"радость": 2, ...}
+    moods = Column(JSONB, nullable=False, default={})
+    emotions = Column(JSONB, nullable=False, default={})
+    
+    # Метаданные
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,51 @@
+from sqlalchemy import Column, BigInteger, String, DateTime, ForeignKey, Text, JSON, Index
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship, deferred
+from pgvector.sqlalchemy import Vector
+from app.core.config import settings
+from app.core.database import Base
+
+class Need(Base):
+    """Потребность или предложение пользователя (из analysis_result дневника)"""
+    __tablename__ = "needs"
+    
+    id = Column(BigInteger, primary_key=True, index=True)
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    clone_id = Column(BigInteger, ForeignKey("clones.id", ondelete="CASCADE"), nullable=False)
+    source_diary_id = Column(BigInteger, ForeignKey("diaries.id", ondelete="SET NULL"), nullable=True, index=True)
+    
+    # Тип потребности
+    need_type = Column(String(50), nullable=False)  # thing, job, service
+    direction = Column(String(50), nullable=False)  # need, offer
+    
+    # Детали
+    title = Column(String(255), nullable=False)
+    description = Column(Text, nullable=True)
+    details = Column(JSON, nullable=True)
+    
+    # Локация
+    city = Column(String(255), nullable=True)
+    district = Column(String(255), nullable=True)
+    
+    # Инвертированный индекс (GIN): термы текста + служебные dir:<direction>
+    # и city:<город>, чтобы фильтр и лексический поиск шли по одному индексу
+    terms = Column(ARRAY(Text), nullable=False, default=[])
+    
+    # Вектор для семантического поиска (HNSW, cosine)
+    need_embedding = deferred(Column(Vector(settings.EMBEDDING_DIMENSIONS), nullable=True))
+    
+    # Статус
+    status = Column(String(50), default="active")  # active, matched, fulfilled, expired, cancelled
+    
+    # Метаданные
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    expires_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_needs_terms_gin", "terms", postgresql_using="gin"),
+    )
+    
+    # Relationships
+    user = relationship("User", backref="needs")
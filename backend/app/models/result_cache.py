@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class ResultCache(Base):
+    """Результаты дорогих вызовов (транскрипция, анализ) по хэшу входа"""
+    __tablename__ = "result_cache"
+    
+    # sha256(вид + версия + вход): нормализованный текст или хэш аудиофайла
+    content_hash = Column(String(64), primary_key=True)
+    kind = Column(String(20), nullable=False)  # transcript, analysis
+    version = Column(String(100), nullable=False)
+    result = Column(JSONB, nullable=False)
+    
+    created_at = Column(DateTime, server_default=func.now())
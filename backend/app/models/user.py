@@ -13,6 +13,10 @@ class User(Base):
     age = Column(Integer, nullable=True)
     city = Column(String(255), nullable=True)
     gender = Column(String(50), nullable=True)
+    # Предпочтения для подбора пары (None - без ограничения)
+    looking_for_gender = Column(String(50), nullable=True)  # male, female
+    preferred_age_min = Column(Integer, nullable=True)
+    preferred_age_max = Column(Integer, nullable=True)
     timezone = Column(String(50), nullable=True)
     language_code = Column(String(10), default="ru")
     is_premium = Column(Boolean, default=False)
@@ -0,0 +1,64 @@
+"""
+Объединение частичных analysis_result, полученных по сегментам длинного дневника.
+
+Схема ответа GPT свободная, поэтому слияние структурное: словари - по ключам,
+списки - объединение без повторов, числа - среднее по весам сегментов,
+строки - значение с наибольшим суммарным весом.
+"""
+import json
+from collections import defaultdict
+from typing import Any
+
+
+def _item_key(value: Any) -> str:
+    if isinstance(value, str):
+        return value.strip().lower()
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+def _merge_values(values: list[Any], weights: list[float]) -> Any:
+    present = [(v, w) for v, w in zip(values, weights) if v is not None]
+    if not present:
+        return None
+    values = [v for v, _ in present]
+    weights = [w for _, w in present]
+
+    if all(isinstance(v, dict) for v in values):
+        return merge_analyses(values, weights)
+
+    if all(isinstance(v, list) for v in values):
+        merged, seen = [], set()
+        for items in values:
+            for item in items:
+                key = _item_key(item)
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(item)
+        return merged
+
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        average = sum(v * w for v, w in zip(values, weights)) / (sum(weights) or 1)
+        return round(average, 2)
+
+    # Строки и смешанные типы: побеждает значение с наибольшим весом
+    scores: dict[str, float] = defaultdict(float)
+    originals: dict[str, Any] = {}
+    for value, weight in zip(values, weights):
+        key = _item_key(value)
+        scores[key] += weight
+        originals.setdefault(key, value)
+    return originals[max(scores, key=scores.get)]
+
+
+def merge_analyses(results: list[dict], weights: list[float] | None = None) -> dict:
+    """Слияние анализов сегментов; веса - обычно длина сегмента"""
+    weights = weights or [1.0] * len(results)
+    keys: list[str] = []
+    for result in results:
+        for key in result:
+            if key not in keys:
+                keys.append(key)
+    return {
+        key: _merge_values([result.get(key) for result in results], weights)
+        for key in keys
+    }
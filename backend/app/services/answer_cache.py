@@ -0,0 +1,104 @@
+import math
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+@dataclass
+class _CachedAnswer:
+    embedding: list[float] | None
+    answer: str
+    expires_at: float
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(re.findall(r"\w+", question.lower()))
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class AnswerCache:
+    """
+    Кэш ответов клона в памяти процесса.
+
+    Ключ - (clone_id, profile_version): новый анализ дневника увеличивает
+    версию, и старые ответы перестают находиться без явной инвалидации.
+    Сначала ищется точное совпадение нормализованного вопроса, затем
+    (если задан порог) ближайший по эмбеддингу вопрос той же версии.
+    """
+
+    def __init__(
+        self,
+        maxsize: int | None = None,
+        ttl: int | None = None,
+        max_per_clone: int | None = None,
+        similarity_threshold: float | None = None
+    ):
+        self.ttl = ttl or settings.ANSWER_CACHE_TTL_SECONDS
+        self.max_per_clone = max_per_clone or settings.ANSWER_CACHE_MAX_PER_CLONE
+        self.similarity_threshold = (
+            settings.ANSWER_CACHE_SIMILARITY_THRESHOLD if similarity_threshold is None else similarity_threshold
+        )
+        # LRU по клонам; внутри - LRU по вопросам
+        self._buckets = TTLCache(maxsize=maxsize or settings.ANSWER_CACHE_MAX_CLONES, ttl=self.ttl)
+
+    def get(self, clone_id: int, version: int, question: str, embedding: list[float] | None = None) -> str | None:
+        bucket: OrderedDict[str, _CachedAnswer] | None = self._buckets.get((clone_id, version))
+        if bucket is None:
+            self._record("answer_cache.misses")
+            return None
+
+        now = time.time()
+        key = normalize_question(question)
+        entry = bucket.get(key)
+        if entry is not None and entry.expires_at > now:
+            bucket.move_to_end(key)
+            self._record("answer_cache.hits_exact")
+            return entry.answer
+
+        if embedding is not None and self.similarity_threshold > 0:
+            best_key, best_score = None, self.similarity_threshold
+            for cached_key, cached in bucket.items():
+                if cached.embedding is None or cached.expires_at <= now:
+                    continue
+                score = _cosine(embedding, cached.embedding)
+                if score >= best_score:
+                    best_key, best_score = cached_key, score
+            if best_key is not None:
+                bucket.move_to_end(best_key)
+                self._record("answer_cache.hits_semantic")
+                return bucket[best_key].answer
+
+        self._record("answer_cache.misses")
+        return None
+
+    def put(self, clone_id: int, version: int, question: str, answer: str, embedding: list[float] | None = None):
+        bucket = self._buckets.get((clone_id, version))
+        if bucket is None:
+            bucket = OrderedDict()
+        key = normalize_question(question)
+        bucket[key] = _CachedAnswer(embedding=embedding, answer=answer, expires_at=time.time() + self.ttl)
+        bucket.move_to_end(key)
+        while len(bucket) > self.max_per_clone:
+            bucket.popitem(last=False)
+        self._buckets.set((clone_id, version), bucket)
+
+    def _record(self, counter: str):
+        metrics.incr(counter)
+        metrics.set_gauge("answer_cache.hit_rate", self.hit_rate())
+
+    def hit_rate(self) -> float:
+        hits = metrics.get("answer_cache.hits_exact") + metrics.get("answer_cache.hits_semantic")
+        total = hits + metrics.get("answer_cache.misses")
+        return hits / total if total else 0.0
+
+
+answer_cache = AnswerCache()
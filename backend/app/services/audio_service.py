@@ -0,0 +1,182 @@
+"""
+Подготовка аудио к Whisper: моно 16 кГц mp3, вырезание длинных пауз
+и нарезка длинных записей по тишине на куски для параллельной транскрипции.
+
+ffmpeg/ffprobe запускаются в пуле процессов, чтобы не блокировать event loop.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.openai_service import OpenAIService
+
+logger = logging.getLogger(__name__)
+
+# Версия транскрипции для ключа кэша результатов (модель + подготовка аудио)
+TRANSCRIPT_VERSION = "whisper-1"
+
+_SILENCE_START = re.compile(r"silence_start: (-?\d+(?:\.\d+)?)")
+_SILENCE_END = re.compile(r"silence_end: (-?\d+(?:\.\d+)?)")
+
+_executor: Executor | None = None
+
+
+def _get_executor() -> Executor:
+    """
+    Пул процессов для ffmpeg. Внутри демонических процессов (prefork-воркеры
+    Celery) дочерние процессы запрещены - там используется пул потоков,
+    тяжелая работа все равно выполняется отдельным процессом ffmpeg.
+    """
+    global _executor
+    if _executor is None:
+        if multiprocessing.current_process().daemon:
+            _executor = ThreadPoolExecutor(max_workers=settings.AUDIO_WORKERS)
+        else:
+            _executor = ProcessPoolExecutor(max_workers=settings.AUDIO_WORKERS)
+    return _executor
+
+
+@dataclass
+class PreparedAudio:
+    workdir: str
+    chunks: list[str]
+    duration_seconds: float
+
+
+def _run(args: list[str]) -> subprocess.CompletedProcess:
+    return subprocess.run(args, capture_output=True, text=True, check=True)
+
+
+def _probe_duration(path: str) -> float:
+    result = _run([
+        "ffprobe", "-v", "error", "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1", path
+    ])
+    # ffprobe печатает N/A, если длительность не определить (например, все вырезано как тишина)
+    value = result.stdout.strip()
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"ffprobe returned no duration for {path}: {value!r}") from None
+
+
+def _detect_silences(path: str) -> list[tuple[float, float]]:
+    result = _run([
+        "ffmpeg", "-hide_banner", "-nostats", "-i", path,
+        "-af", f"silencedetect=noise={settings.AUDIO_SILENCE_THRESHOLD_DB}dB:d={settings.AUDIO_SPLIT_SILENCE_SECONDS}",
+        "-f", "null", "-"
+    ])
+    starts = [float(m) for m in _SILENCE_START.findall(result.stderr)]
+    ends = [float(m) for m in _SILENCE_END.findall(result.stderr)]
+    return list(zip(starts, ends))
+
+
+def choose_split_points(duration: float, silences: list[tuple[float, float]], chunk_seconds: float) -> list[float]:
+    """
+    Точки разреза: середина последней паузы во второй половине очередного окна
+    chunk_seconds; если пауз нет - режем ровно по границе окна.
+    """
+    midpoints = [(start + end) / 2 for start, end in silences]
+    points = []
+    last = 0.0
+    while duration - last > chunk_seconds:
+        window_start, window_end = last + chunk_seconds / 2, last + chunk_seconds
+        candidates = [m for m in midpoints if window_start <= m <= window_end]
+        point = candidates[-1] if candidates else window_end
+        points.append(point)
+        last = point
+    return points
+
+
+def prepare_audio(source_path: str) -> PreparedAudio:
+    """Нормализация, удаление пауз и нарезка (выполняется в пуле)"""
+    workdir = tempfile.mkdtemp(prefix="audio_", dir=settings.AUDIO_WORK_DIR)
+    try:
+        return _prepare_in(workdir, source_path)
+    except BaseException:
+        # При успехе каталог удаляет вызывающий после транскрипции
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+
+
+def _prepare_in(workdir: str, source_path: str) -> PreparedAudio:
+    normalized = os.path.join(workdir, "normalized.mp3")
+    _run([
+        "ffmpeg", "-hide_banner", "-nostats", "-y", "-i", source_path,
+        "-ac", "1", "-ar", "16000",
+        # Паузы длиннее AUDIO_TRIM_SILENCE_SECONDS вырезаются целиком
+        "-af", (
+            f"silenceremove=start_periods=1:start_threshold={settings.AUDIO_SILENCE_THRESHOLD_DB}dB:"
+            f"stop_periods=-1:stop_duration={settings.AUDIO_TRIM_SILENCE_SECONDS}:"
+            f"stop_threshold={settings.AUDIO_SILENCE_THRESHOLD_DB}dB"
+        ),
+        "-c:a", "libmp3lame", "-b:a", settings.AUDIO_BITRATE,
+        normalized
+    ])
+    duration = _probe_duration(normalized)
+
+    if duration <= settings.AUDIO_CHUNK_SECONDS:
+        return PreparedAudio(workdir=workdir, chunks=[normalized], duration_seconds=duration)
+
+    points = choose_split_points(duration, _detect_silences(normalized), settings.AUDIO_CHUNK_SECONDS)
+    bounds = list(zip([0.0] + points, points + [duration]))
+    chunks = []
+    for index, (start, end) in enumerate(bounds):
+        chunk_path = os.path.join(workdir, f"chunk_{index:03d}.mp3")
+        _run([
+            "ffmpeg", "-hide_banner", "-nostats", "-y", "-i", normalized,
+            "-ss", f"{start:.3f}", "-to", f"{end:.3f}", "-c", "copy", chunk_path
+        ])
+        chunks.append(chunk_path)
+    return PreparedAudio(workdir=workdir, chunks=chunks, duration_seconds=duration)
+
+
+@dataclass
+class Transcript:
+    text: str
+    duration_seconds: float | None
+
+
+class AudioService:
+    def __init__(self, openai_service: OpenAIService | None = None):
+        self.openai_service = openai_service or OpenAIService()
+    
+    async def transcribe(self, audio_path: str) -> Transcript:
+        """Транскрипция с нормализацией и параллельной обработкой кусков"""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            prepared = await loop.run_in_executor(_get_executor(), prepare_audio, audio_path)
+        except (FileNotFoundError, subprocess.CalledProcessError, ValueError) as e:
+            # Нет ffmpeg или файл не разобрался - отправляем как есть
+            logger.warning("Audio preprocessing failed for %s: %s", audio_path, e)
+            metrics.incr("audio.preprocess_failures")
+            text = await self.openai_service.transcribe_audio(audio_path)
+            return Transcript(text=text, duration_seconds=None)
+        metrics.observe("audio.preprocess_ms", (time.perf_counter() - started) * 1000)
+        
+        try:
+            semaphore = asyncio.Semaphore(settings.AUDIO_TRANSCRIBE_MAX_PARALLEL)
+            
+            async def transcribe_chunk(path: str) -> str:
+                async with semaphore:
+                    return await self.openai_service.transcribe_audio(path)
+            
+            # gather сохраняет порядок кусков
+            parts = await asyncio.gather(*(transcribe_chunk(path) for path in prepared.chunks))
+        finally:
+            await loop.run_in_executor(None, shutil.rmtree, prepared.workdir, True)
+        
+        metrics.observe("audio.chunks_per_file", len(prepared.chunks))
+        metrics.observe("audio.transcribe_ms", (time.perf_counter() - started) * 1000)
+        text = " ".join(part.strip() for part in parts if part and part.strip())
+        return Transcript(text=text, duration_seconds=prepared.duration_seconds)
@@ -1,9 +1,24 @@
+import asyncio
+import time
+from typing import AsyncIterator
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from app.core.cache import ModelCache
+from app.core.config import settings
+from app.core.metrics import metrics
 from app.models.clone import Clone
-from app.models.memory import CloneMemory
+from app.models.clone_question import CloneQuestion
+from app.services.answer_cache import answer_cache
+from app.services.embedding_service import EmbeddingService
+from app.services.llm_scheduler import Priority
 from app.services.openai_service import OpenAIService
-import json
+from app.services.prompt_context import PromptContextBuilder
+from app.services.retrieval_service import RetrievalService
+
+# Кэш клонов по user_id
+clone_cache = ModelCache(Clone, "clone")
+
+ASK_MODEL = "gpt-4"
 
 class CloneService:
     def __init__(self, db: AsyncSession):
@@ -11,55 +26,164 @@ class CloneService:
         self.openai_service = OpenAIService()
     
     async def get_user_clone(self, user_id: int) -> Clone | None:
+        return await clone_cache.get(self.db, user_id, lambda: self._load_user_clone(user_id))
+    
+    async def _load_user_clone(self, user_id: int) -> Clone | None:
         result = await self.db.execute(
             select(Clone).where(Clone.user_id == user_id)
         )
         return result.scalar_one_or_none()
     
-    async def ask_clone(self, clone_id: int, question: str) -> str:
-        """Получить ответ от клона на вопрос"""
+    async def invalidate(self, user_id: int):
+        """Сбрасывает кэш клона после изменения профиля или статистики"""
+        await clone_cache.invalidate(user_id)
+    
+    async def _embed_question(self, question: str) -> list[float] | None:
+        try:
+            return await EmbeddingService(self.db, priority=Priority.INTERACTIVE).embed(question)
+        except Exception as e:
+            print(f"Error embedding question: {e}")
+            return None
+    
+    async def _get_clone(self, clone_id: int) -> Clone:
         clone = await self.db.get(Clone, clone_id)
         if not clone:
             raise ValueError("Clone not found")
+        return clone
+    
+    def _cached_answer(self, clone: Clone, question: str, question_embedding: list[float] | None) -> str | None:
+        if not settings.ANSWER_CACHE_ENABLED:
+            return None
+        return answer_cache.get(clone.id, clone.profile_version or 0, question, question_embedding)
+    
+    def _cache_answer(self, clone: Clone, question: str, question_embedding: list[float] | None, answer: str):
+        if settings.ANSWER_CACHE_ENABLED and answer:
+            answer_cache.put(clone.id, clone.profile_version or 0, question, answer, question_embedding)
+    
+    async def _build_messages(
+        self,
+        clone: Clone,
+        question: str,
+        question_embedding: list[float] | None
+    ) -> tuple[list[dict], list[int]]:
+        """Сообщения для LLM и id воспоминаний, попавших в контекст"""
+        # Получаем релевантные воспоминания и фрагменты дневников
+        context = await RetrievalService(self.db).retrieve(clone.id, question_embedding)
         
-        # Получаем релевантные воспоминания
-        memories_result = await self.db.execute(
-            select(CloneMemory)
-            .where(CloneMemory.clone_id == clone_id)
-            .order_by(CloneMemory.importance_score.desc())
-            .limit(10)
-        )
-        memories = list(memories_result.scalars().all())
+        # Формируем системный промпт в рамках бюджета токенов
+        system_prompt = PromptContextBuilder(model=ASK_MODEL).build(clone, context).system_prompt
         
-        # Формируем системный промпт
-        memories_text = "\n".join([f"- {m.memory_content}" for m in memories])
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": question}
+        ]
+        return messages, [memory.id for memory in context.memories]
+    
+    async def _save_answer(
+        self,
+        clone_id: int,
+        question: str,
+        answer: str,
+        streamed: bool,
+        latency_ms: int,
+        time_to_first_token_ms: int | None = None,
+        memory_ids: list[int] | None = None
+    ) -> CloneQuestion:
+        record = CloneQuestion(
+            clone_id=clone_id,
+            question=question,
+            answer=answer,
+            model=ASK_MODEL,
+            streamed=streamed,
+            time_to_first_token_ms=time_to_first_token_ms,
+            latency_ms=latency_ms
+        )
+        self.db.add(record)
+        # Использование воспоминаний - в той же транзакции, что и ответ
+        await RetrievalService(self.db).mark_used(memory_ids or [])
+        await self.db.commit()
+        return record
+    
+    async def ask_clone(self, clone_id: int, question: str) -> str:
+        """Получить ответ от клона на вопрос"""
+        started = time.perf_counter()
+        clone = await self._get_clone(clone_id)
+        question_embedding = await self._embed_question(question)
         
-        system_prompt = f"""Ты - ИИ-клон пользователя. Твоя задача - общаться и думать как этот человек.
-
-ПРОФИЛЬ ЛИЧНОСТИ:
-{json.dumps(clone.personality_profile, ensure_ascii=False, indent=2)}
-
-ВАЖНЫЕ ФАКТЫ О ПОЛЬЗОВАТЕЛЕ:
-{memories_text}
-
-СТИЛЬ ОБЩЕНИЯ:
-- Используй слова и фразы, которые использует пользователь
-- Отражай его эмоциональные паттерны
-- Думай как он думает
-- Реагируй как он реагирует
-
-ПОМНИ:
-- Ты не просто имитируешь, ты понимаешь его ценности и мотивации
-- Используй конкретные факты из его жизни
-- Будь последовательным в характере"""
+        cached = self._cached_answer(clone, question, question_embedding)
+        if cached is not None:
+            return cached
         
-        response = await self.openai_service.client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": question}
-            ],
+        messages, memory_ids = await self._build_messages(clone, question, question_embedding)
+        response = await self.openai_service.chat(
+            model=ASK_MODEL,
+            messages=messages,
+            hedge=True,
             temperature=0.7
         )
+        answer = response.choices[0].message.content
+        
+        latency_ms = int((time.perf_counter() - started) * 1000)
+        metrics.observe("clone_ask.latency_ms", latency_ms)
+        await self._save_answer(
+            clone_id, question, answer, streamed=False, latency_ms=latency_ms, memory_ids=memory_ids
+        )
+        self._cache_answer(clone, question, question_embedding, answer)
+        return answer
+    
+    async def ask_clone_stream(self, clone_id: int, question: str) -> AsyncIterator[str]:
+        """
+        Ответ клона по токенам. Ответ сохраняется только после полного стрима;
+        при отмене (клиент отключился) upstream-соединение закрывается сразу.
+        """
+        started = time.perf_counter()
+        clone = await self._get_clone(clone_id)
+        question_embedding = await self._embed_question(question)
         
-        return response.choices[0].message.content
+        cached = self._cached_answer(clone, question, question_embedding)
+        if cached is not None:
+            yield cached
+            return
+        
+        messages, memory_ids = await self._build_messages(clone, question, question_embedding)
+        stream = await self.openai_service.chat(
+            model=ASK_MODEL,
+            messages=messages,
+            temperature=0.7,
+            stream=True
+        )
+        
+        parts: list[str] = []
+        time_to_first_token_ms = None
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if not token:
+                    continue
+                if time_to_first_token_ms is None:
+                    time_to_first_token_ms = int((time.perf_counter() - started) * 1000)
+                    metrics.observe("clone_ask.stream.ttft_ms", time_to_first_token_ms)
+                parts.append(token)
+                yield token
+        except (asyncio.CancelledError, GeneratorExit):
+            metrics.incr("clone_ask.stream.cancelled")
+            raise
+        finally:
+            # Закрываем HTTP-ответ OpenAI, чтобы генерация не продолжалась впустую
+            await stream.response.aclose()
+        
+        answer = "".join(parts)
+        latency_ms = int((time.perf_counter() - started) * 1000)
+        metrics.observe("clone_ask.stream.latency_ms", latency_ms)
+        await self._save_answer(
+            clone_id,
+            question,
+            answer,
+            streamed=True,
+            latency_ms=latency_ms,
+            time_to_first_token_ms=time_to_first_token_ms,
+            memory_ids=memory_ids
+        )
+        self._cache_answer(clone, question, question_embedding, answer)
@@ -0,0 +1,288 @@
+"""
+Диалоги клонов для оценки совместимости - самый дорогой конвейер платформы.
+
+Пары берутся из clone_candidates в порядке ожидаемой совместимости (близость
+профилей), недавно оцененные пропускаются. Каждый вызов модели списывается
+с суточного бюджета токенов в Redis; при его исчерпании диалог остается
+в статусе active и продолжается со следующего запуска с сохраненного места.
+Диалог с явно низкой промежуточной оценкой останавливается досрочно.
+"""
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, exists
+from app.core.cache import get_redis
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.clone import Clone
+from app.models.clone_candidate import CloneCandidate
+from app.models.clone_conversation import CloneConversation
+from app.services.llm_scheduler import Priority, estimate_tokens
+from app.services.openai_service import OpenAIService
+from app.services.prompt_context import PromptContextBuilder
+from app.services.retrieval_service import RetrievalService
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_MODEL = "gpt-4"
+CHECK_MODEL = "gpt-3.5-turbo"
+
+DIALOGUE_RULES = """СЕЙЧАС ТЫ ЗНАКОМИШЬСЯ С ДРУГИМ ЧЕЛОВЕКОМ:
+- Говори от первого лица, как этот пользователь
+- Отвечай коротко: 1-3 предложения
+- Рассказывай о себе и спрашивай собеседника о его ценностях, интересах и планах"""
+
+CHECK_PROMPT = """Оцени по началу диалога, насколько собеседники совместимы (дружба, отношения, взаимопомощь).
+Ответь JSON: {"score": число от 0 до 1}"""
+
+ANALYSIS_PROMPT = """Проанализируй диалог двух людей и оцени их совместимость. Всегда отвечай валидным JSON:
+{
+    "overall_score": 0.87,
+    "values_match": 0.9,
+    "communication_match": 0.85,
+    "interests_match": 0.88,
+    "insights": ["Оба ценят семью", "Похожий юмор"]
+}
+Оценки - числа от 0 до 1."""
+
+
+class ConversationBudgetExhausted(Exception):
+    """Суточный бюджет токенов на диалоги клонов исчерпан"""
+
+
+class DailyTokenBudget:
+    """Суточный (UTC) бюджет токенов, общий для всех воркеров"""
+    
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+    
+    def _key(self) -> str:
+        return f"budget:{self.name}:{datetime.utcnow().date().isoformat()}"
+    
+    async def reserve(self, tokens: int) -> bool:
+        key = self._key()
+        redis = get_redis()
+        used = await redis.incrby(key, tokens)
+        if used == tokens:
+            await redis.expire(key, 2 * 24 * 60 * 60)
+        if used > self.limit:
+            await redis.decrby(key, tokens)
+            return False
+        return True
+    
+    async def adjust(self, delta: int):
+        """Поправка резерва на фактический расход"""
+        if delta:
+            await get_redis().incrby(self._key(), delta)
+    
+    async def used(self) -> int:
+        return int(await get_redis().get(self._key()) or 0)
+
+
+@dataclass
+class PlannedPair:
+    clone1_id: int
+    clone2_id: int
+    expected_score: float
+
+
+def _transcript(conversation: CloneConversation) -> str:
+    names = {conversation.clone1_id: "Собеседник 1", conversation.clone2_id: "Собеседник 2"}
+    return "\n".join(f"{names[m['clone_id']]}: {m['content']}" for m in conversation.messages)
+
+
+class ConversationService:
+    def __init__(self, db: AsyncSession, budget: DailyTokenBudget):
+        self.db = db
+        self.budget = budget
+        self.openai_service = OpenAIService()
+    
+    async def plan_pairs(self, limit: int) -> list[PlannedPair]:
+        """
+        Новые пары в порядке ожидаемой совместимости: пара хранится один раз
+        (меньший id первым), недавно оцененные и незавершенные пропускаются.
+        """
+        clone1 = func.least(CloneCandidate.clone_id, CloneCandidate.candidate_clone_id)
+        clone2 = func.greatest(CloneCandidate.clone_id, CloneCandidate.candidate_clone_id)
+        recent = datetime.utcnow() - timedelta(days=settings.CONVERSATION_REEVALUATE_AFTER_DAYS)
+        pairs = (
+            select(clone1.label("clone1_id"), clone2.label("clone2_id"), func.max(CloneCandidate.similarity).label("score"))
+            .group_by(clone1, clone2)
+            .subquery()
+        )
+        evaluated = exists().where(
+            CloneConversation.clone1_id == pairs.c.clone1_id,
+            CloneConversation.clone2_id == pairs.c.clone2_id,
+            (CloneConversation.started_at > recent) | (CloneConversation.status == "active")
+        )
+        result = await self.db.execute(
+            select(pairs.c.clone1_id, pairs.c.clone2_id, pairs.c.score)
+            .where(~evaluated)
+            .order_by(pairs.c.score.desc())
+            .limit(limit)
+        )
+        return [PlannedPair(row.clone1_id, row.clone2_id, float(row.score)) for row in result]
+    
+    async def resumable(self) -> list[int]:
+        """Диалоги, прерванные исчерпанием бюджета или падением воркера"""
+        result = await self.db.execute(
+            select(CloneConversation.id)
+            .where(CloneConversation.status == "active")
+            .order_by(CloneConversation.expected_score.desc().nulls_last(), CloneConversation.id)
+        )
+        return list(result.scalars())
+    
+    async def start(self, pair: PlannedPair) -> int:
+        conversation = CloneConversation(
+            clone1_id=pair.clone1_id,
+            clone2_id=pair.clone2_id,
+            expected_score=pair.expected_score,
+            messages=[],
+            status="active",
+            conversation_length=0,
+            tokens_used=0
+        )
+        self.db.add(conversation)
+        await self.db.commit()
+        return conversation.id
+    
+    async def _call(self, conversation: CloneConversation, model: str, messages: list[dict], max_tokens: int, **kwargs) -> str:
+        estimate = estimate_tokens(messages, completion_tokens=max_tokens)
+        try:
+            reserved = await self.budget.reserve(estimate)
+        except RedisError as e:
+            # Без учета расхода не тратим: бюджет должен соблюдаться строго
+            logger.warning("Conversation budget unavailable: %s", e)
+            reserved = False
+        if not reserved:
+            raise ConversationBudgetExhausted()
+        
+        try:
+            response = await self.openai_service.chat(
+                messages=messages,
+                model=model,
+                priority=Priority.BACKGROUND,
+                timeout=settings.OPENAI_TIMEOUT_ANALYZE,
+                max_tokens=max_tokens,
+                **kwargs
+            )
+        except BaseException:
+            # Вызов не состоялся - резерв возвращается в бюджет
+            try:
+                await self.budget.adjust(-estimate)
+            except RedisError as e:
+                logger.warning("Conversation budget refund failed: %s", e)
+            raise
+        used = response.usage.total_tokens if response.usage else estimate
+        await self.budget.adjust(used - estimate)
+        conversation.tokens_used = (conversation.tokens_used or 0) + used
+        metrics.incr("conversations.tokens", used)
+        return response.choices[0].message.content or ""
+    
+    async def _system_prompt(self, clone: Clone) -> str:
+        # Без вопроса - самые важные воспоминания и последние дневники
+        context = await RetrievalService(self.db).retrieve(clone.id, None)
+        prompt = PromptContextBuilder(model=CONVERSATION_MODEL).build(clone, context).system_prompt
+        return f"{prompt}\n\n{DIALOGUE_RULES}"
+    
+    def _turn_messages(self, conversation: CloneConversation, speaker_id: int, system_prompt: str) -> list[dict]:
+        messages = [{"role": "system", "content": system_prompt}]
+        for message in conversation.messages:
+            role = "assistant" if message["clone_id"] == speaker_id else "user"
+            messages.append({"role": role, "content": message["content"]})
+        if len(messages) == 1:
+            messages.append({"role": "user", "content": "Привет! Расскажи немного о себе."})
+        return messages
+    
+    async def _check_score(self, conversation: CloneConversation) -> float | None:
+        content = await self._call(
+            conversation,
+            CHECK_MODEL,
+            [
+                {"role": "system", "content": CHECK_PROMPT},
+                {"role": "user", "content": _transcript(conversation)}
+            ],
+            max_tokens=20,
+            response_format={"type": "json_object"},
+            temperature=0
+        )
+        try:
+            return float(json.loads(content)["score"])
+        except (ValueError, KeyError, TypeError):
+            return None
+    
+    async def _analyze(self, conversation: CloneConversation) -> dict:
+        content = await self._call(
+            conversation,
+            CONVERSATION_MODEL,
+            [
+                {"role": "system", "content": ANALYSIS_PROMPT},
+                {"role": "user", "content": _transcript(conversation)}
+            ],
+            max_tokens=settings.CONVERSATION_ANALYSIS_MAX_TOKENS,
+            response_format={"type": "json_object"},
+            temperature=0.3
+        )
+        return json.loads(content)
+    
+    def _finish(self, conversation: CloneConversation, status: str, analysis: dict):
+        conversation.status = status
+        conversation.compatibility_analysis = analysis
+        conversation.completed_at = datetime.utcnow()
+        metrics.incr(f"conversations.{status}")
+    
+    async def run(self, conversation_id: int) -> str:
+        """
+        Ведет диалог с сохраненного места до конца, досрочной остановки
+        или исчерпания бюджета. Каждая реплика сохраняется сразу.
+        """
+        conversation = await self.db.get(CloneConversation, conversation_id)
+        if not conversation or conversation.status != "active":
+            return conversation.status if conversation else "missing"
+        clones = {
+            clone_id: await self.db.get(Clone, clone_id)
+            for clone_id in (conversation.clone1_id, conversation.clone2_id)
+        }
+        if None in clones.values():
+            self._finish(conversation, "failed", {"error": "clone not found"})
+            await self.db.commit()
+            return conversation.status
+        prompts = {clone_id: await self._system_prompt(clone) for clone_id, clone in clones.items()}
+        
+        try:
+            while len(conversation.messages) < settings.CONVERSATION_MAX_MESSAGES:
+                # Реплики по очереди, начинает clone1
+                speaker_id = (conversation.clone1_id, conversation.clone2_id)[len(conversation.messages) % 2]
+                content = await self._call(
+                    conversation,
+                    CONVERSATION_MODEL,
+                    self._turn_messages(conversation, speaker_id, prompts[speaker_id]),
+                    max_tokens=settings.CONVERSATION_TURN_MAX_TOKENS,
+                    temperature=0.8
+                )
+                # Новый список, чтобы SQLAlchemy увидел изменение JSON-колонки
+                conversation.messages = conversation.messages + [{"clone_id": speaker_id, "content": content.strip()}]
+                conversation.conversation_length = len(conversation.messages)
+                conversation.last_message_at = datetime.utcnow()
+                conversation.error_count = 0
+                await self.db.commit()
+                
+                length = len(conversation.messages)
+                if length % settings.CONVERSATION_CHECK_EVERY == 0 and length < settings.CONVERSATION_MAX_MESSAGES:
+                    score = await self._check_score(conversation)
+                    if score is not None and score < settings.CONVERSATION_EARLY_STOP_SCORE:
+                        self._finish(conversation, "stopped_early", {"overall_score": score, "early_stop": True})
+                        await self.db.commit()
+                        return conversation.status
+            
+            self._finish(conversation, "completed", await self._analyze(conversation))
+            await self.db.commit()
+        except ConversationBudgetExhausted:
+            # Реплики уже сохранены - продолжим в следующий запуск
+            await self.db.commit()
+            raise
+        return conversation.status
@@ -1,14 +1,113 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select, func, tuple_, literal, literal_column, Float
+from sqlalchemy.orm import defer
+from app.core.config import settings
 from app.models.diary import Diary
 from app.models.clone import Clone
+from app.services.clone_service import clone_cache
+from app.services.mood_timeline_service import MoodTimelineService
+from app.services.openai_service import ANALYSIS_VERSION
+from app.services.profile_service import ProfileService
+from dataclasses import dataclass
 from datetime import datetime
+import base64
+import html
+
+
+class DuplicateDiaryError(Exception):
+    """Дневник с этим Idempotency-Key уже создан параллельным запросом"""
+    
+    def __init__(self, diary: "Diary"):
+        super().__init__(f"Diary {diary.id} already exists for this idempotency key")
+        self.diary = diary
+
+
+@dataclass
+class DiarySummary:
+    id: int
+    status: str
+    word_count: int | None
+    created_at: datetime
+    analyzed_at: datetime | None
+    preview: str | None
+
+
+@dataclass
+class DiarySearchHit:
+    id: int
+    created_at: datetime
+    rank: float
+    snippet: str
+
+
+def encode_cursor(created_at: datetime, diary_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{diary_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """ValueError, если курсор поврежден"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, diary_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(diary_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def encode_search_cursor(rank: float, diary_id: int) -> str:
+    # repr - точное представление float, иначе keyset пропустит или повторит строки
+    raw = f"{rank!r}|{diary_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> tuple[float, int]:
+    """ValueError, если курсор поврежден"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        rank, diary_id = raw.split("|")
+        return float(rank), int(diary_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+# Конфигурация должна совпадать с выражением Diary.search_vector
+SEARCH_CONFIG = literal_column("'russian'::regconfig")
+
+# Маркеры подсветки, которых не бывает в тексте: фрагмент экранируется целиком,
+# и только затем маркеры заменяются на теги
+_HIGHLIGHT_START, _HIGHLIGHT_STOP = "\x02", "\x03"
+
+
+def render_snippet(headline: str) -> str:
+    return html.escape(headline).replace(_HIGHLIGHT_START, "<b>").replace(_HIGHLIGHT_STOP, "</b>")
+
 
 class DiaryService:
     def __init__(self, db: AsyncSession):
         self.db = db
     
-    async def create_diary(self, user_id: int, content_text: str, audio_file_path: str = None) -> Diary:
+    async def get_by_idempotency_key(self, user_id: int, idempotency_key: str) -> Diary | None:
+        result = await self.db.execute(
+            select(Diary)
+            .options(defer(Diary.content_embedding))
+            .where(Diary.user_id == user_id, Diary.idempotency_key == idempotency_key)
+        )
+        return result.scalar_one_or_none()
+    
+    async def create_diary(
+        self,
+        user_id: int,
+        content_text: str | None = None,
+        audio_file_path: str = None,
+        audio_sha256: str | None = None,
+        idempotency_key: str | None = None
+    ) -> Diary:
+        """
+        Создает дневник в статусе pending; текст аудио-дневника появится после транскрипции.
+        DuplicateDiaryError, если дневник с idempotency_key успели создать параллельно.
+        """
         # Получаем или создаем клон
         clone_result = await self.db.execute(
             select(Clone).where(Clone.user_id == user_id)
@@ -27,7 +126,10 @@ class DiaryService:
             clone_id=clone.id,
             content_text=content_text,
             audio_file_path=audio_file_path,
-            word_count=len(content_text.split())
+            audio_sha256=audio_sha256,
+            word_count=len(content_text.split()) if content_text else None,
+            status="pending",
+            idempotency_key=idempotency_key
         )
         
         self.db.add(diary)
@@ -35,25 +137,196 @@ class DiaryService:
         # Обновляем статистику клона
         clone.diaries_count = (clone.diaries_count or 0) + 1
         clone.last_diary_at = datetime.utcnow()
-        clone.total_words_analyzed = (clone.total_words_analyzed or 0) + diary.word_count
+        clone.total_words_analyzed = (clone.total_words_analyzed or 0) + (diary.word_count or 0)
         
-        await self.db.commit()
+        try:
+            await self.db.commit()
+        except IntegrityError:
+            # Счетчики клона откатываются вместе с дневником
+            await self.db.rollback()
+            existing = await self.get_by_idempotency_key(user_id, idempotency_key) if idempotency_key else None
+            if existing is None:
+                raise
+            raise DuplicateDiaryError(existing)
         await self.db.refresh(diary)
+        await clone_cache.invalidate(user_id)
         
         return diary
     
+    async def set_status(self, diary_id: int, status: str, error_message: str | None = None):
+        diary = await self.db.get(Diary, diary_id)
+        if diary:
+            diary.status = status
+            diary.error_message = error_message
+            await self.db.commit()
+    
+    async def set_transcript(self, diary_id: int, content_text: str, audio_duration_seconds: float | None = None):
+        """Сохраняет результат транскрипции и досчитывает статистику клона"""
+        diary = await self.db.get(Diary, diary_id)
+        if not diary:
+            return
+        
+        diary.content_text = content_text
+        diary.word_count = len(content_text.split())
+        if audio_duration_seconds is not None:
+            diary.audio_duration_seconds = int(audio_duration_seconds)
+        
+        clone = await self.db.get(Clone, diary.clone_id)
+        if clone:
+            clone.total_words_analyzed = (clone.total_words_analyzed or 0) + diary.word_count
+        
+        await self.db.commit()
+        await clone_cache.invalidate(diary.user_id)
+    
     async def update_analysis(self, diary_id: int, analysis_result: dict):
         diary = await self.db.get(Diary, diary_id)
         if diary:
+            previous_analysis = diary.analysis_result
             diary.analysis_result = analysis_result
             diary.analyzed_at = datetime.utcnow()
-            diary.analysis_version = "gpt-4"
+            diary.analysis_version = ANALYSIS_VERSION
+            
+            # Инкрементально вливаем анализ в профиль клона
+            profile_service = ProfileService(self.db)
+            clone = await profile_service.lock_clone(diary.clone_id)
+            # Под той же блокировкой клона - агрегаты динамики настроения
+            await MoodTimelineService(self.db).record(diary, analysis_result, previous_analysis)
+            if clone:
+                profile_service.merge_analysis(clone, analysis_result, diary.created_at)
+                # Новый анализ меняет знания клона - кэш ответов старой версии не используется
+                clone.profile_version = (clone.profile_version or 0) + 1
             await self.db.commit()
+            await clone_cache.invalidate(diary.user_id)
     
-    async def get_user_diaries(self, user_id: int) -> list[Diary]:
+    async def get_user_diary(self, user_id: int, diary_id: int) -> Diary | None:
         result = await self.db.execute(
             select(Diary)
+            .options(defer(Diary.content_embedding))
+            .where(Diary.id == diary_id, Diary.user_id == user_id)
+        )
+        return result.scalar_one_or_none()
+    
+    async def list_user_diaries(
+        self,
+        user_id: int,
+        limit: int,
+        cursor: str | None = None
+    ) -> tuple[list[DiarySummary], str | None]:
+        """
+        Страница дневников без полных текстов: keyset по (created_at DESC, id DESC),
+        индекс ix_diaries_user_created_id. Возвращает (строки, курсор следующей страницы).
+        """
+        query = (
+            select(
+                Diary.id,
+                Diary.status,
+                Diary.word_count,
+                Diary.created_at,
+                Diary.analyzed_at,
+                func.left(Diary.content_text, settings.DIARY_PREVIEW_CHARS).label("preview")
+            )
             .where(Diary.user_id == user_id)
-            .order_by(Diary.created_at.desc())
+            .order_by(Diary.created_at.desc(), Diary.id.desc())
+            .limit(limit + 1)
+        )
+        if cursor:
+            created_at, diary_id = decode_cursor(cursor)
+            query = query.where(tuple_(Diary.created_at, Diary.id) < tuple_(created_at, diary_id))
+        
+        rows = [DiarySummary(**row._mapping) for row in await self.db.execute(query)]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+        return rows, next_cursor
+    
+    async def mood_stats(self, user_id: int, since: datetime | None = None) -> dict[str, dict]:
+        """Число дневников и средняя интенсивность эмоций по настроению"""
+        query = (
+            select(
+                Diary.mood,
+                func.count().label("diaries"),
+                func.avg(Diary.emotion_intensity).label("avg_intensity")
+            )
+            .where(Diary.user_id == user_id, Diary.mood.is_not(None))
+            .group_by(Diary.mood)
+        )
+        if since is not None:
+            query = query.where(Diary.created_at >= since)
+        return {
+            row.mood: {
+                "diaries": row.diaries,
+                "avg_intensity": round(float(row.avg_intensity), 2) if row.avg_intensity is not None else None
+            }
+            for row in await self.db.execute(query)
+        }
+    
+    async def find_by_emotion(self, user_id: int, emotion: str, limit: int) -> list[DiarySummary]:
+        """Дневники с эмоцией среди основных: containment-запрос по GIN-индексу analysis_result"""
+        result = await self.db.execute(
+            select(
+                Diary.id,
+                Diary.status,
+                Diary.word_count,
+                Diary.created_at,
+                Diary.analyzed_at,
+                func.left(Diary.content_text, settings.DIARY_PREVIEW_CHARS).label("preview")
+            )
+            .where(
+                Diary.user_id == user_id,
+                Diary.analysis_result.contains({"emotions": {"primary": [emotion]}})
+            )
+            .order_by(Diary.created_at.desc(), Diary.id.desc())
+            .limit(limit)
+        )
+        return [DiarySummary(**row._mapping) for row in result]
+    
+    async def search_user_diaries(
+        self,
+        user_id: int,
+        query: str,
+        limit: int,
+        cursor: str | None = None
+    ) -> tuple[list[DiarySearchHit], str | None]:
+        """
+        Полнотекстовый поиск по дневникам пользователя: ранжирование ts_rank,
+        keyset по (rank DESC, id DESC), индекс ix_diaries_user_search_gin.
+        Подсветка (ts_headline) считается только для строк страницы.
+        """
+        tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        rank = func.ts_rank(Diary.search_vector, tsquery)
+        page = (
+            select(Diary.id, Diary.created_at, rank.label("rank"))
+            .where(Diary.user_id == user_id, Diary.search_vector.bool_op("@@")(tsquery))
+            .order_by(rank.desc(), Diary.id.desc())
+            .limit(limit + 1)
+        )
+        if cursor:
+            last_rank, last_id = decode_search_cursor(cursor)
+            page = page.where(tuple_(rank, Diary.id) < tuple_(literal(last_rank, Float), last_id))
+        page = page.subquery()
+        
+        options = (
+            f"StartSel={_HIGHLIGHT_START}, StopSel={_HIGHLIGHT_STOP}, "
+            f"MaxWords={settings.DIARY_SEARCH_SNIPPET_WORDS}, MinWords={settings.DIARY_SEARCH_SNIPPET_WORDS // 3}, "
+            f"MaxFragments={settings.DIARY_SEARCH_SNIPPET_FRAGMENTS}"
+        )
+        result = await self.db.execute(
+            select(
+                page.c.id,
+                page.c.created_at,
+                page.c.rank,
+                func.ts_headline(SEARCH_CONFIG, Diary.content_text, tsquery, options).label("headline")
+            )
+            .join(Diary, Diary.id == page.c.id)
+            .order_by(page.c.rank.desc(), page.c.id.desc())
         )
-        return list(result.scalars().all())
+        hits = [
+            DiarySearchHit(id=row.id, created_at=row.created_at, rank=float(row.rank), snippet=render_snippet(row.headline or ""))
+            for row in result
+        ]
+        next_cursor = None
+        if len(hits) > limit:
+            hits = hits[:limit]
+            next_cursor = encode_search_cursor(hits[-1].rank, hits[-1].id)
+        return hits, next_cursor
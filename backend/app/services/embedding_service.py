@@ -0,0 +1,169 @@
+import hashlib
+import math
+import re
+from typing import Protocol
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.embedding_cache import EmbeddingCache
+from app.models.diary import Diary
+from app.models.memory import CloneMemory
+from app.services.llm_scheduler import Priority, estimate_tokens, llm_scheduler
+from app.services.openai_service import get_openai_client, with_retries
+
+
+class EmbeddingBackend(Protocol):
+    model: str
+    
+    async def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        ...
+
+
+class OpenAIEmbeddingBackend:
+    """Эмбеддинги OpenAI: один запрос на пачку текстов"""
+    
+    def __init__(self, model: str | None = None, priority: Priority = Priority.BACKGROUND):
+        self.model = model or settings.EMBEDDING_MODEL
+        self.priority = priority
+    
+    async def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        client = get_openai_client().with_options(timeout=settings.OPENAI_TIMEOUT_EMBEDDINGS)
+        tokens = estimate_tokens(text="".join(texts))
+        
+        async def call():
+            await llm_scheduler.acquire(self.model, self.priority, tokens)
+            return await client.embeddings.create(model=self.model, input=texts)
+        
+        response = await with_retries("embeddings", call)
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+
+class LocalHashEmbeddingBackend:
+    """
+    Детерминированные эмбеддинги без сети (feature hashing по словам и биграммам).
+    Для офлайн-бенчмарков и тестовых окружений, не для качества поиска.
+    """
+    
+    model = "local-hash-v1"
+    
+    def __init__(self, dimensions: int | None = None):
+        self.dimensions = dimensions or settings.EMBEDDING_DIMENSIONS
+    
+    def _embed(self, text: str) -> list[float]:
+        vector = [0.0] * self.dimensions
+        tokens = re.findall(r"\w+", text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+    
+    async def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(t) for t in texts]
+
+
+def get_embedding_backend(name: str | None = None, priority: Priority = Priority.BACKGROUND) -> EmbeddingBackend:
+    name = name or settings.EMBEDDING_BACKEND
+    if name == "openai":
+        return OpenAIEmbeddingBackend(priority=priority)
+    if name == "local":
+        return LocalHashEmbeddingBackend()
+    raise ValueError(f"Unknown embedding backend: {name}")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def content_hash(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\n{normalize_text(text)}".encode()).hexdigest()
+
+
+class EmbeddingService:
+    """
+    Эмбеддинги пачками с дедупликацией по хэшу содержимого.
+    Уже посчитанные векторы берутся из таблицы embedding_cache.
+    """
+    
+    def __init__(
+        self,
+        db: AsyncSession,
+        backend: EmbeddingBackend | None = None,
+        batch_size: int | None = None,
+        priority: Priority = Priority.BACKGROUND
+    ):
+        self.db = db
+        self.backend = backend or get_embedding_backend(priority=priority)
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+    
+    async def embed(self, text: str) -> list[float]:
+        return (await self.embed_many([text]))[0]
+    
+    async def embed_many(self, texts: list[str]) -> list[list[float]]:
+        """Векторы в порядке texts; одинаковые тексты считаются один раз"""
+        hashes = [content_hash(self.backend.model, t) for t in texts]
+        unique: dict[str, str] = {}
+        for h, t in zip(hashes, texts):
+            unique.setdefault(h, normalize_text(t))
+        
+        vectors = await self._load_cached(list(unique))
+        metrics.incr("embeddings.cache_hits", len(vectors))
+        
+        missing = [h for h in unique if h not in vectors]
+        for i in range(0, len(missing), self.batch_size):
+            batch = missing[i:i + self.batch_size]
+            embedded = await self.backend.embed_batch([unique[h] for h in batch])
+            metrics.incr("embeddings.requests")
+            metrics.incr("embeddings.texts_embedded", len(batch))
+            vectors.update(zip(batch, embedded))
+            await self._store_cached(batch, embedded)
+        
+        return [list(vectors[h]) for h in hashes]
+    
+    async def _load_cached(self, hashes: list[str]) -> dict[str, list[float]]:
+        if not hashes:
+            return {}
+        result = await self.db.execute(
+            select(EmbeddingCache.content_hash, EmbeddingCache.embedding)
+            .where(EmbeddingCache.content_hash.in_(hashes))
+        )
+        return {row.content_hash: row.embedding for row in result}
+    
+    async def _store_cached(self, hashes: list[str], embeddings: list[list[float]]):
+        await self.db.execute(
+            insert(EmbeddingCache)
+            .values([
+                {"content_hash": h, "model": self.backend.model, "embedding": e}
+                for h, e in zip(hashes, embeddings)
+            ])
+            .on_conflict_do_nothing(index_elements=["content_hash"])
+        )
+        await self.db.commit()
+    
+    async def embed_memories(self, memories: list[CloneMemory]):
+        """Считает и записывает memory_embedding одним bulk UPDATE"""
+        if not memories:
+            return
+        vectors = await self.embed_many([m.memory_content for m in memories])
+        await self.db.execute(
+            update(CloneMemory),
+            [{"id": m.id, "memory_embedding": v} for m, v in zip(memories, vectors)]
+        )
+        await self.db.commit()
+    
+    async def embed_diaries(self, diaries: list[Diary]):
+        """Считает и записывает content_embedding одним bulk UPDATE"""
+        diaries = [d for d in diaries if d.content_text]
+        if not diaries:
+            return
+        vectors = await self.embed_many([d.content_text[:settings.EMBEDDING_MAX_CHARS] for d in diaries])
+        await self.db.execute(
+            update(Diary),
+            [{"id": d.id, "content_embedding": v} for d, v in zip(diaries, vectors)]
+        )
+        await self.db.commit()
@@ -0,0 +1,167 @@
+"""
+Планировщик запросов к OpenAI: приоритеты, бюджеты RPM/TPM и single-flight.
+
+Бюджеты общие для всех процессов (API и воркеры Celery) и хранятся в Redis
+как два token bucket'а на модель. Приоритет реализован резервом: фоновые
+запросы не могут опустошить бюджет ниже своей доли резерва, поэтому
+интерактивным вопросам к клону всегда остается запас.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from collections import defaultdict
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, TypeVar
+from redis.exceptions import RedisError
+from app.core.cache import get_redis
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    ONBOARDING = 1
+    BACKGROUND = 2
+
+
+class LLMBudgetExceeded(Exception):
+    """Бюджет модели не освободился за допустимое время ожидания"""
+
+
+# KEYS: bucket запросов, bucket токенов
+# ARGV: rpm, tpm, стоимость в токенах, доля резерва
+# Возвращает {1, 0} при успехе или {0, секунды ожидания}
+_ACQUIRE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local reserve = tonumber(ARGV[4])
+
+local function refill(key, capacity)
+    local data = redis.call('HMGET', key, 'level', 'ts')
+    local level = tonumber(data[1]) or capacity
+    local ts = tonumber(data[2]) or now
+    return math.min(capacity, level + (now - ts) * capacity / 60)
+end
+
+local rpm = tonumber(ARGV[1])
+local tpm = tonumber(ARGV[2])
+local cost = math.min(tonumber(ARGV[3]), tpm * (1 - reserve))
+
+local requests = refill(KEYS[1], rpm)
+local tokens = refill(KEYS[2], tpm)
+
+local wait = 0
+if requests - 1 < rpm * reserve then
+    wait = math.max(wait, (1 + rpm * reserve - requests) * 60 / rpm)
+end
+if tokens - cost < tpm * reserve then
+    wait = math.max(wait, (cost + tpm * reserve - tokens) * 60 / tpm)
+end
+
+if wait == 0 then
+    requests = requests - 1
+    tokens = tokens - cost
+end
+redis.call('HSET', KEYS[1], 'level', requests, 'ts', now)
+redis.call('HSET', KEYS[2], 'level', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 120)
+redis.call('EXPIRE', KEYS[2], 120)
+
+if wait == 0 then
+    return {1, '0'}
+end
+return {0, tostring(wait)}
+"""
+
+
+def estimate_tokens(messages: list[dict] | None = None, text: str | None = None, completion_tokens: int = 0) -> int:
+    """Грубая оценка: ~3 символа на токен для русского текста"""
+    chars = len(text or "")
+    for message in messages or []:
+        chars += len(message.get("content") or "")
+    return chars // 3 + completion_tokens
+
+
+class LLMScheduler:
+    def __init__(self):
+        self._waiting: dict[tuple[str, Priority], int] = defaultdict(int)
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+    def _budget(self, model: str) -> dict[str, int]:
+        return settings.LLM_MODEL_BUDGETS.get(model) or settings.LLM_MODEL_BUDGETS["default"]
+
+    def _update_queue_gauge(self, model: str, priority: Priority):
+        metrics.set_gauge(f"llm.queue_depth.{model}.{priority.name.lower()}", self._waiting[(model, priority)])
+
+    async def _try_acquire(self, model: str, priority: Priority, tokens: int) -> float:
+        """0 - бюджет получен, иначе рекомендуемое ожидание в секундах"""
+        budget = self._budget(model)
+        reserve = settings.LLM_PRIORITY_RESERVES[priority.name.lower()]
+        try:
+            allowed, wait = await get_redis().eval(
+                _ACQUIRE_SCRIPT, 2,
+                f"llm:budget:{model}:requests", f"llm:budget:{model}:tokens",
+                budget["rpm"], budget["tpm"], tokens, reserve
+            )
+        except RedisError as e:
+            # Без Redis не блокируем запросы: OpenAI сам ответит 429
+            logger.warning("LLM scheduler unavailable: %s", e)
+            metrics.incr("llm.scheduler_errors")
+            return 0
+        return 0 if int(allowed) == 1 else float(wait)
+
+    async def acquire(self, model: str, priority: Priority, tokens: int):
+        """Ждет, пока бюджет модели позволит выполнить запрос данного приоритета"""
+        started = time.perf_counter()
+        max_wait = settings.LLM_PRIORITY_MAX_WAIT[priority.name.lower()]
+        key = (model, priority)
+        self._waiting[key] += 1
+        self._update_queue_gauge(model, priority)
+        try:
+            while True:
+                wait = await self._try_acquire(model, priority, tokens)
+                if wait == 0:
+                    break
+                waited = time.perf_counter() - started
+                if waited + wait > max_wait:
+                    if priority == Priority.INTERACTIVE:
+                        # Пользователь ждет: лучше рискнуть 429, чем не ответить
+                        metrics.incr("llm.forced_interactive")
+                        break
+                    metrics.incr(f"llm.budget_exceeded.{priority.name.lower()}")
+                    raise LLMBudgetExceeded(f"{model} budget unavailable for {priority.name}")
+                await asyncio.sleep(min(wait, 1.0) * random.uniform(0.8, 1.2))
+        finally:
+            self._waiting[key] -= 1
+            self._update_queue_gauge(model, priority)
+        metrics.observe(f"llm.wait_ms.{priority.name.lower()}", (time.perf_counter() - started) * 1000)
+
+    async def single_flight(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Одинаковые одновременные запросы выполняются один раз.
+        Вызов идет в отдельной задаче: отмена одного ожидающего не отменяет остальных.
+        """
+        future = self._in_flight.get(key)
+        if future is not None:
+            metrics.incr("llm.coalesced")
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(call())
+        self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(future)
+
+
+def request_key(model: str, payload: Any) -> str:
+    raw = json.dumps({"model": model, "payload": payload}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,185 @@
+"""
+Генерация кандидатов в пару: ANN-поиск по personality_embedding клонов
+с жесткими фильтрами пользователей (город, возраст, пол).
+
+Дорогая проверка совместимости (диалог клонов) запускается только
+для top-N кандидатов отсюда, а не для всех пар.
+"""
+from dataclasses import dataclass
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, insert, or_, text
+from sqlalchemy.orm import undefer
+from app.core.config import settings
+from app.models.clone import Clone
+from app.models.clone_candidate import CloneCandidate
+from app.models.user import User
+from app.services.embedding_service import EmbeddingService
+from app.services.prompt_context import render_profile
+
+
+@dataclass
+class Candidate:
+    clone_id: int
+    user_id: int
+    similarity: float
+
+
+def profile_text(profile: dict) -> str:
+    """Текст профиля для эмбеддинга - тот же компактный вид, что и в промпте"""
+    return "\n".join(render_profile(profile))
+
+
+def hard_filters(user: User) -> list:
+    """
+    Взаимные жесткие условия для кандидата: он подходит под предпочтения
+    пользователя, а пользователь - под его предпочтения.
+    """
+    conditions = [
+        User.id != user.id,
+        User.deleted_at.is_(None),
+        User.onboarding_completed.is_(True),
+    ]
+    if user.city:
+        conditions.append(User.city == user.city)
+    if user.looking_for_gender:
+        conditions.append(User.gender == user.looking_for_gender)
+    if user.preferred_age_min is not None:
+        conditions.append(User.age >= user.preferred_age_min)
+    if user.preferred_age_max is not None:
+        conditions.append(User.age <= user.preferred_age_max)
+
+    # Предпочтения кандидата: неизвестный пол/возраст пользователя их не проходит
+    if user.gender:
+        conditions.append(or_(User.looking_for_gender.is_(None), User.looking_for_gender == user.gender))
+    else:
+        conditions.append(User.looking_for_gender.is_(None))
+    if user.age is not None:
+        conditions.append(or_(User.preferred_age_min.is_(None), User.preferred_age_min <= user.age))
+        conditions.append(or_(User.preferred_age_max.is_(None), User.preferred_age_max >= user.age))
+    else:
+        conditions.append(User.preferred_age_min.is_(None))
+        conditions.append(User.preferred_age_max.is_(None))
+    return conditions
+
+
+class MatchingService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def embed_profiles(self, clone_ids: list[int] | None = None, batch_size: int | None = None) -> int:
+        """
+        Пересчитывает personality_embedding клонов, у которых профиль новее вектора.
+        Клоны идут порциями по id с коммитом каждой порции. Возвращает число обновленных клонов.
+        """
+        batch_size = batch_size or settings.MATCHING_BATCH_SIZE
+        total = 0
+        last_id = 0
+        while True:
+            query = (
+                select(Clone.id, Clone.profile_version, Clone.personality_profile)
+                .where(
+                    Clone.id > last_id,
+                    Clone.status == "active",
+                    Clone.personality_profile != {},
+                    or_(
+                        Clone.personality_embedding_version.is_(None),
+                        Clone.personality_embedding_version != Clone.profile_version
+                    )
+                )
+                .order_by(Clone.id)
+                .limit(batch_size)
+            )
+            if clone_ids is not None:
+                query = query.where(Clone.id.in_(clone_ids))
+            rows = (await self.db.execute(query)).all()
+            if not rows:
+                return total
+            
+            # Неизменившийся текст профиля возьмется из embedding_cache
+            vectors = await EmbeddingService(self.db).embed_many([profile_text(row.personality_profile) for row in rows])
+            await self.db.execute(
+                update(Clone),
+                [
+                    {"id": row.id, "personality_embedding": vector, "personality_embedding_version": row.profile_version}
+                    for row, vector in zip(rows, vectors)
+                ]
+            )
+            await self.db.commit()
+            total += len(rows)
+            last_id = rows[-1].id
+    
+    async def _configure_search(self, ef_search: int | None = None, exact: bool = False):
+        # exact - точный перебор без HNSW (эталон для замера recall)
+        await self.db.execute(text(f"SET LOCAL enable_indexscan = {'off' if exact else 'on'}"))
+        if exact:
+            return
+        # Фильтры отсекают часть найденных HNSW соседей: итеративный скан
+        # (pgvector >= 0.8) добирает результаты вместо того, чтобы вернуть меньше N
+        await self.db.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search or settings.MATCHING_HNSW_EF_SEARCH)}"))
+        if settings.MATCHING_HNSW_ITERATIVE_SCAN:
+            await self.db.execute(text(f"SET LOCAL hnsw.iterative_scan = {settings.MATCHING_HNSW_ITERATIVE_SCAN}"))
+    
+    async def find_candidates(
+        self,
+        clone_id: int,
+        limit: int | None = None,
+        ef_search: int | None = None,
+        exact: bool = False
+    ) -> list[Candidate]:
+        """Top-N клонов с ближайшими профилями среди прошедших жесткие фильтры"""
+        limit = limit or settings.MATCHING_CANDIDATES_PER_CLONE
+        row = (await self.db.execute(
+            select(Clone, User)
+            .join(User, User.id == Clone.user_id)
+            .options(undefer(Clone.personality_embedding))
+            .where(Clone.id == clone_id)
+        )).first()
+        if not row or row.Clone.personality_embedding is None:
+            return []
+        clone, user = row
+        
+        await self._configure_search(ef_search, exact)
+        distance = Clone.personality_embedding.cosine_distance(clone.personality_embedding)
+        result = await self.db.execute(
+            select(Clone.id, Clone.user_id, (1 - distance).label("similarity"))
+            .join(User, User.id == Clone.user_id)
+            .where(
+                Clone.id != clone.id,
+                Clone.status == "active",
+                Clone.personality_embedding.is_not(None),
+                *hard_filters(user)
+            )
+            .order_by(distance)
+            .limit(limit)
+        )
+        return [Candidate(clone_id=r.id, user_id=r.user_id, similarity=float(r.similarity)) for r in result]
+    
+    async def refresh_candidates(self, clone_id: int) -> int:
+        """Пересчитывает и сохраняет кандидатов клона"""
+        candidates = await self.find_candidates(clone_id)
+        await self.db.execute(delete(CloneCandidate).where(CloneCandidate.clone_id == clone_id))
+        if candidates:
+            await self.db.execute(
+                insert(CloneCandidate),
+                [
+                    {"clone_id": clone_id, "candidate_clone_id": c.clone_id, "similarity": c.similarity}
+                    for c in candidates
+                ]
+            )
+        await self.db.commit()
+        return len(candidates)
+    
+    async def get_candidates(self, clone_id: int, limit: int | None = None) -> list[Candidate]:
+        """Кандидаты из ночного батча; если их еще нет - считаются на лету"""
+        limit = limit or settings.MATCHING_CANDIDATES_PER_CLONE
+        result = await self.db.execute(
+            select(CloneCandidate.candidate_clone_id, Clone.user_id, CloneCandidate.similarity)
+            .join(Clone, Clone.id == CloneCandidate.candidate_clone_id)
+            .where(CloneCandidate.clone_id == clone_id, Clone.status == "active")
+            .order_by(CloneCandidate.similarity.desc())
+            .limit(limit)
+        )
+        candidates = [Candidate(clone_id=r[0], user_id=r[1], similarity=r[2]) for r in result]
+        if candidates:
+            return candidates
+        return await self.find_candidates(clone_id, limit)
@@ -0,0 +1,113 @@
+"""
+Консолидация воспоминаний клона: склейка почти одинаковых фактов
+и удаление старых неважных.
+
+Похожесть считается векторно в NumPy: нормированные эмбеддинги
+умножаются блоками по block_size строк, поэтому память на клон -
+O(block_size * n), а не O(n^2).
+"""
+from dataclasses import dataclass
+from datetime import datetime
+import numpy as np
+
+
+@dataclass
+class MemoryRow:
+    id: int
+    clone_id: int
+    memory_type: str
+    importance: float
+    confidence: float
+    usage_count: int
+    last_used_at: datetime | None
+    created_at: datetime | None
+
+
+@dataclass
+class MergeGroup:
+    keep: MemoryRow
+    duplicates: list[MemoryRow]
+    importance: float
+    confidence: float
+    usage_count: int
+    last_used_at: datetime | None
+
+
+def _find(parent: np.ndarray, i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def duplicate_components(embeddings: np.ndarray, threshold: float, block_size: int = 512) -> np.ndarray:
+    """
+    Номер компоненты для каждой строки: строки с косинусной близостью >= threshold
+    (в том числе транзитивно) получают одинаковый номер.
+    """
+    n = len(embeddings)
+    parent = np.arange(n)
+    if n < 2:
+        return parent
+    
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.maximum(norms, 1e-12)
+    
+    for start in range(0, n, block_size):
+        block = vectors[start:start + block_size]
+        similarity = block @ vectors.T
+        rows, cols = np.nonzero(similarity >= threshold)
+        rows += start
+        # Каждая пара один раз, без диагонали
+        mask = cols > rows
+        for i, j in zip(rows[mask], cols[mask]):
+            root_i, root_j = _find(parent, i), _find(parent, j)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+    
+    return np.array([_find(parent, i) for i in range(n)])
+
+
+def combine_confidence(scores: list[float], cap: float = 0.99) -> float:
+    """Независимые подтверждения: 1 - П(1 - c)"""
+    disbelief = float(np.prod([1.0 - min(max(s, 0.0), 1.0) for s in scores]))
+    return round(min(1.0 - disbelief, cap), 2)
+
+
+def _latest(values: list[datetime | None]) -> datetime | None:
+    present = [v for v in values if v is not None]
+    return max(present) if present else None
+
+
+def plan_merges(rows: list[MemoryRow], embeddings: np.ndarray, threshold: float, block_size: int = 512) -> list[MergeGroup]:
+    """Группы дубликатов одного клона; склеиваются только воспоминания одного типа"""
+    groups: dict[tuple[str, int], list[int]] = {}
+    by_type: dict[str, list[int]] = {}
+    for index, row in enumerate(rows):
+        by_type.setdefault(row.memory_type, []).append(index)
+    
+    for memory_type, indices in by_type.items():
+        components = duplicate_components(embeddings[indices], threshold, block_size)
+        for position, component in enumerate(components):
+            groups.setdefault((memory_type, int(component)), []).append(indices[position])
+    
+    plans = []
+    for indices in groups.values():
+        if len(indices) < 2:
+            continue
+        members = [rows[i] for i in indices]
+        # Остается самое важное и востребованное, при равенстве - более новое
+        members.sort(
+            key=lambda r: (r.importance, r.usage_count, r.created_at or datetime.min),
+            reverse=True
+        )
+        plans.append(MergeGroup(
+            keep=members[0],
+            duplicates=members[1:],
+            importance=max(r.importance for r in members),
+            confidence=combine_confidence([r.confidence for r in members]),
+            usage_count=sum(r.usage_count for r in members),
+            last_used_at=_latest([r.last_used_at for r in members])
+        ))
+    return plans
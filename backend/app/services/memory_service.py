@@ -0,0 +1,102 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func
+from app.models.clone import Clone
+from app.models.diary import Diary
+from app.models.memory import CloneMemory
+from app.services.clone_service import clone_cache
+from app.services.embedding_service import EmbeddingService
+
+# Поле analysis_result -> (тип воспоминания, шаблон текста, важность)
+MEMORY_RULES = {
+    "values": ("value", "Ценит {}", 0.9),
+    "interests": ("preference", "Любит {}", 0.7),
+    "goals": ("goal", "Цель: {}", 0.8),
+    "fears": ("fear", "Боится: {}", 0.7),
+    "experiences": ("experience", "{}", 0.6),
+}
+
+
+def extract_memories(analysis_result: dict) -> list[dict]:
+    """Конкретные факты из анализа дневника; повторы внутри анализа отбрасываются"""
+    memories, seen = [], set()
+    for field, (memory_type, template, importance) in MEMORY_RULES.items():
+        items = analysis_result.get(field)
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            if not isinstance(item, str) or not item.strip():
+                continue
+            content = template.format(item.strip())
+            key = (memory_type, content.lower())
+            if key in seen:
+                continue
+            seen.add(key)
+            memories.append({
+                "memory_type": memory_type,
+                "memory_content": content,
+                "importance_score": importance,
+            })
+    return memories
+
+
+class MemoryService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def create_from_diary(self, diary: Diary) -> int:
+        """
+        Создает CloneMemory из analysis_result дневника и считает их эмбеддинги.
+        Идемпотентно: повторная доставка задачи не создаст дубликаты, а только
+        досчитает эмбеддинги, если прошлая попытка упала после коммита строк.
+        Возвращает число новых воспоминаний.
+        """
+        if not diary.analysis_result:
+            return 0
+        
+        already_extracted = await self.db.scalar(
+            select(CloneMemory.id).where(CloneMemory.source_diary_id == diary.id).limit(1)
+        )
+        if already_extracted:
+            missing = list((await self.db.execute(
+                select(CloneMemory).where(
+                    CloneMemory.source_diary_id == diary.id,
+                    CloneMemory.memory_embedding.is_(None)
+                )
+            )).scalars())
+            await EmbeddingService(self.db).embed_memories(missing)
+            return 0
+        
+        candidates = extract_memories(diary.analysis_result)
+        if not candidates:
+            return 0
+        
+        # Точные повторы уже известных фактов не создаем - похожие склеит консолидация
+        existing = set(
+            (await self.db.execute(
+                select(CloneMemory.memory_type, func.lower(CloneMemory.memory_content))
+                .where(
+                    CloneMemory.clone_id == diary.clone_id,
+                    func.lower(CloneMemory.memory_content).in_([m["memory_content"].lower() for m in candidates])
+                )
+            )).all()
+        )
+        memories = [
+            CloneMemory(clone_id=diary.clone_id, source_diary_id=diary.id, confidence_score=0.5, **m)
+            for m in candidates
+            if (m["memory_type"], m["memory_content"].lower()) not in existing
+        ]
+        if not memories:
+            return 0
+        
+        self.db.add_all(memories)
+        # Память клона изменилась - ответы старой версии больше не актуальны
+        await self.db.execute(
+            update(Clone)
+            .where(Clone.id == diary.clone_id)
+            .values(profile_version=Clone.profile_version + 1)
+        )
+        await self.db.commit()
+        await clone_cache.invalidate(diary.user_id)
+        
+        await EmbeddingService(self.db).embed_memories(memories)
+        return len(memories)
@@ -0,0 +1,176 @@
+"""
+Динамика настроения пользователя: агрегаты по дням, неделям и месяцам.
+
+Агрегаты (mood_rollups) обновляются инкрементально при сохранении анализа
+дневника, поэтому график читает несколько строк, а не все analysis_result.
+Период определяется датой создания дневника (UTC), неделя начинается с понедельника.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, insert, tuple_
+from app.core.config import settings
+from app.models.clone import Clone
+from app.models.diary import Diary
+from app.models.mood_rollup import MoodRollup
+
+PERIODS = ("day", "week", "month")
+
+
+@dataclass
+class TimelinePoint:
+    period_start: date
+    diaries_count: int
+    words_count: int
+    avg_intensity: float | None
+    moods: dict[str, int]
+    dominant_mood: str | None
+    emotions: dict[str, int]
+
+
+def period_start(day: date, period: str) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def diary_contribution(emotions: dict | None, word_count: int | None) -> dict:
+    """Вклад одного дневника в агрегаты по блоку emotions его анализа"""
+    emotions = emotions if isinstance(emotions, dict) else {}
+    mood = emotions.get("mood")
+    intensity = emotions.get("intensity")
+    primary = emotions.get("primary")
+    return {
+        "words": word_count or 0,
+        "mood": mood.strip().lower() if isinstance(mood, str) and mood.strip() else None,
+        "intensity": float(intensity) if isinstance(intensity, (int, float)) and not isinstance(intensity, bool) else None,
+        "emotions": sorted({
+            e.strip().lower() for e in primary if isinstance(e, str) and e.strip()
+        }) if isinstance(primary, list) else [],
+    }
+
+
+def _add_count(counts: dict, key: str, delta: int) -> dict:
+    counts[key] = counts.get(key, 0) + delta
+    if counts[key] <= 0:
+        del counts[key]
+    return counts
+
+
+def apply_contribution(values: dict, contribution: dict, sign: int = 1):
+    """Добавляет (sign=1) или вычитает (sign=-1) вклад дневника из полей агрегата"""
+    has_intensity = contribution["intensity"] is not None
+    values["diaries_count"] = (values.get("diaries_count") or 0) + sign
+    values["words_count"] = (values.get("words_count") or 0) + sign * contribution["words"]
+    values["intensity_sum"] = (values.get("intensity_sum") or 0.0) + sign * (contribution["intensity"] or 0.0)
+    values["intensity_count"] = (values.get("intensity_count") or 0) + sign * has_intensity
+    # Новые словари, чтобы SQLAlchemy увидел изменение JSONB-колонок
+    moods = dict(values.get("moods") or {})
+    if contribution["mood"]:
+        _add_count(moods, contribution["mood"], sign)
+    values["moods"] = moods
+    emotions = dict(values.get("emotions") or {})
+    for emotion in contribution["emotions"]:
+        _add_count(emotions, emotion, sign)
+    values["emotions"] = emotions
+
+
+def _point(rollup: MoodRollup) -> TimelinePoint:
+    moods = rollup.moods or {}
+    top_emotions = sorted((rollup.emotions or {}).items(), key=lambda item: (-item[1], item[0]))
+    return TimelinePoint(
+        period_start=rollup.period_start,
+        diaries_count=rollup.diaries_count,
+        words_count=rollup.words_count,
+        avg_intensity=round(rollup.intensity_sum / rollup.intensity_count, 2) if rollup.intensity_count else None,
+        moods=moods,
+        dominant_mood=max(moods, key=lambda mood: (moods[mood], mood)) if moods else None,
+        emotions=dict(top_emotions[:settings.MOOD_TIMELINE_TOP_EMOTIONS]),
+    )
+
+
+class MoodTimelineService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def record(self, diary: Diary, analysis_result: dict, previous_analysis: dict | None = None):
+        """
+        Учитывает анализ дневника во всех периодах; при повторном анализе
+        вычитает прежний. Коммит и блокировка клона - на вызывающем
+        (DiaryService.update_analysis), иначе параллельные анализы потеряют обновления.
+        """
+        day = (diary.created_at or datetime.utcnow()).date()
+        keys = [(period, period_start(day, period)) for period in PERIODS]
+        result = await self.db.execute(
+            select(MoodRollup).where(
+                MoodRollup.user_id == diary.user_id,
+                tuple_(MoodRollup.period, MoodRollup.period_start).in_(keys)
+            )
+        )
+        rollups = {(r.period, r.period_start): r for r in result.scalars()}
+        
+        added = diary_contribution(analysis_result.get("emotions"), diary.word_count)
+        removed = diary_contribution(previous_analysis.get("emotions"), diary.word_count) if previous_analysis else None
+        for period, start in keys:
+            rollup = rollups.get((period, start))
+            if rollup is None:
+                rollup = MoodRollup(user_id=diary.user_id, period=period, period_start=start)
+                self.db.add(rollup)
+            values = {column: getattr(rollup, column) for column in (
+                "diaries_count", "words_count", "intensity_sum", "intensity_count", "moods", "emotions"
+            )}
+            if removed:
+                apply_contribution(values, removed, sign=-1)
+            apply_contribution(values, added)
+            for column, value in values.items():
+                setattr(rollup, column, value)
+    
+    async def timeline(self, user_id: int, period: str, limit: int, until: date | None = None) -> list[TimelinePoint]:
+        """Последние limit периодов с дневниками (до until включительно), по возрастанию даты"""
+        query = (
+            select(MoodRollup)
+            .where(MoodRollup.user_id == user_id, MoodRollup.period == period, MoodRollup.diaries_count > 0)
+            .order_by(MoodRollup.period_start.desc())
+            .limit(limit)
+        )
+        if until is not None:
+            query = query.where(MoodRollup.period_start <= until)
+        rollups = list((await self.db.execute(query)).scalars())
+        return [_point(rollup) for rollup in reversed(rollups)]
+    
+    async def rebuild(self, user_id: int) -> int:
+        """Пересчет агрегатов пользователя по всем проанализированным дневникам"""
+        # Та же блокировка, что и при инкрементальном обновлении
+        await self.db.execute(select(Clone.id).where(Clone.user_id == user_id).with_for_update())
+        await self.db.execute(delete(MoodRollup).where(MoodRollup.user_id == user_id))
+        
+        # Из analysis_result нужен только блок emotions
+        result = await self.db.stream(
+            select(Diary.created_at, Diary.word_count, Diary.analysis_result["emotions"].label("emotions"))
+            .where(Diary.user_id == user_id, Diary.analysis_result.is_not(None))
+            .execution_options(yield_per=1000)
+        )
+        rollups: dict[tuple[str, date], dict] = {}
+        async for row in result:
+            contribution = diary_contribution(row.emotions, row.word_count)
+            for period in PERIODS:
+                start = period_start(row.created_at.date(), period)
+                apply_contribution(rollups.setdefault((period, start), {}), contribution)
+        
+        if rollups:
+            await self.db.execute(
+                insert(MoodRollup),
+                [
+                    {
+                        "user_id": user_id,
+                        "period": period,
+                        "period_start": start,
+                        **values
+                    }
+                    for (period, start), values in rollups.items()
+                ]
+            )
+        await self.db.commit()
+        return len(rollups)
@@ -0,0 +1,91 @@
+"""
+Локальный справочник имен для определения пола без запроса к LLM.
+
+Имена хранятся строками через пробел и разворачиваются в один dict
+при импорте: имя -> "m" / "f" / "u" (неоднозначное). Уменьшительные
+формы приводятся к полному имени, поэтому Саша и Женя - "u".
+"""
+
+_MALE = """
+александр алексей анатолий андрей антон аркадий арсений артем артур богдан борис вадим валентин
+валерий василий виктор виталий владимир владислав всеволод вячеслав гавриил геннадий георгий
+герман глеб григорий давид даниил данил денис дмитрий евгений егор елисей захар иван игнат игорь
+илья иннокентий иосиф кирилл климент константин лев леонид лука макар максим марат марк матвей
+мирон михаил назар никита николай олег павел петр платон прохор роберт родион роман ростислав
+руслан рустам святослав семен сергей станислав степан тагир тимофей тимур тихон федор филипп
+эдуард эльдар эмиль юрий яков ярослав айдар азат ильдар ринат тимерлан фарид шамиль
+alexander alex andrew anthony arthur benjamin charles christopher daniel david edward eric george
+henry jack jacob james john joseph kevin liam lucas mark matthew michael nicholas oliver patrick
+paul peter richard robert ryan samuel scott stephen steven thomas timothy william
+"""
+
+_FEMALE = """
+агата агния аделина алена алина алиса алла анастасия ангелина анжелика анна антонина арина
+валентина валерия варвара василиса вера вероника виктория галина дарья диана ева евгения
+екатерина елена елизавета жанна зарина злата зоя инна ирина камилла карина кира клавдия
+кристина ксения лариса лидия лилия любовь людмила майя маргарита марина мария милана мирослава
+надежда наталья нина оксана олеся ольга полина раиса регина светлана снежана софия софья
+станислава таисия тамара татьяна ульяна эвелина элина эльвира юлия яна ярослава алсу гульнара динара
+лейла ляйсан эльмира
+alice amanda amelia anna ashley barbara charlotte chloe elizabeth emily emma grace hannah helen
+isabella jennifer jessica julia kate laura linda lisa lucy maria mary megan mia natalie olivia
+rachel rebecca sarah sophia sophie victoria
+"""
+
+# Имена, которые носят и мужчины, и женщины
+_AMBIGUOUS = """
+саша женя валя шура слава стася вася
+alex sasha jordan taylor casey morgan riley jamie sam charlie robin
+"""
+
+# Уменьшительная форма -> полное имя (формы, совпадающие для двух имен, - в _AMBIGUOUS)
+_DIMINUTIVES = """
+леша:алексей алеша:алексей андрюша:андрей антоша:антон артемка:артем боря:борис вадик:вадим
+витя:виктор вова:владимир володя:владимир влад:владислав гена:геннадий гоша:георгий жора:георгий
+гриша:григорий даня:даниил дима:дмитрий егорка:егор ваня:иван игорек:игорь илюша:илья
+кирюша:кирилл костя:константин лева:лев леня:леонид макс:максим миша:михаил коля:николай
+паша:павел петя:петр рома:роман сережа:сергей стас:станислав степа:степан тима:тимофей федя:федор
+юра:юрий яша:яков
+настя:анастасия аня:анна ася:анна варя:варвара вика:виктория галя:галина даша:дарья катя:екатерина
+лена:елена лиза:елизавета ира:ирина ксюша:ксения люда:людмила маша:мария надя:надежда
+наташа:наталья оля:ольга поля:полина света:светлана соня:софья таня:татьяна юля:юлия
+"""
+
+
+def _build_index() -> dict[str, str]:
+    index = {}
+    for name in _MALE.split():
+        index[name] = "m"
+    for name in _FEMALE.split():
+        # Имя есть в обоих списках (alex) - значит неоднозначное
+        index[name] = "u" if index.get(name) == "m" else "f"
+    for pair in _DIMINUTIVES.split():
+        short, full = pair.split(":")
+        if full in index:
+            index.setdefault(short, index[full])
+    for name in _AMBIGUOUS.split():
+        index[name] = "u"
+    return index
+
+
+_INDEX = _build_index()
+
+_CODES = {"m": "male", "f": "female", "u": "ambiguous"}
+
+
+def normalize_name(name: str) -> str:
+    """Первое слово в нижнем регистре, ё -> е, без пунктуации"""
+    words = name.strip().lower().replace("ё", "е").split()
+    if not words:
+        return ""
+    return "".join(ch for ch in words[0] if ch.isalpha() or ch == "-")
+
+
+def lookup_gender(name: str) -> str | None:
+    """male / female / ambiguous (Саша, Женя) или None, если имени нет в справочнике"""
+    normalized = normalize_name(name)
+    code = _INDEX.get(normalized)
+    if code is None and "-" in normalized:
+        # Двойное имя (Анна-Мария) - по первой части
+        code = _INDEX.get(normalized.split("-")[0])
+    return _CODES[code] if code else None
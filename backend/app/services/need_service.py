@@ -0,0 +1,248 @@
+"""
+Потребности и предложения пользователей: извлечение из analysis_result
+и инкрементальный подбор встречных предложений.
+
+Кандидаты ищутся двумя индексами без полного просмотра таблицы:
+- лексически - GIN по массиву термов (needs.terms && термы запроса);
+- семантически - HNSW по need_embedding.
+Фильтр по направлению и городу - служебные термы dir:/city: в том же массиве.
+Итоговая оценка - взвешенная сумма доли общих термов и косинусной близости.
+"""
+from dataclasses import dataclass
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import undefer
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.diary import Diary
+from app.models.match import Match
+from app.models.need import Need
+from app.models.user import User
+from app.services.embedding_service import EmbeddingService
+from app.services.russian_terms import normalize_city, normalize_terms
+
+NEED_TYPES = {"thing", "job", "service"}
+
+# Поля, из которых берется заголовок, в порядке приоритета
+TITLE_FIELDS = ("item", "position", "service_type", "skill", "title", "name", "description")
+
+OPPOSITE = {"need": "offer", "offer": "need"}
+
+
+@dataclass
+class MatchCandidate:
+    need_id: int
+    user_id: int
+    lexical: float
+    semantic: float
+    score: float
+
+
+def parse_items(analysis_result: dict, direction: str) -> list[dict]:
+    """Элементы needs/offers из анализа в виде полей Need"""
+    items = []
+    for entry in analysis_result.get(f"{direction}s") or []:
+        if isinstance(entry, str):
+            entry = {"item": entry}
+        if not isinstance(entry, dict):
+            continue
+        title = next((entry[f] for f in TITLE_FIELDS if isinstance(entry.get(f), str) and entry[f].strip()), None)
+        if not title:
+            continue
+        extra = []
+        for key, value in entry.items():
+            if key in ("type", "location", "city") or value == title:
+                continue
+            if isinstance(value, list):
+                value = ", ".join(str(v) for v in value)
+            if value:
+                extra.append(str(value))
+        items.append({
+            "need_type": entry.get("type") if entry.get("type") in NEED_TYPES else "thing",
+            "direction": direction,
+            "title": title.strip()[:255],
+            "description": "; ".join(extra) or None,
+            "details": entry,
+            "city": entry.get("location") or entry.get("city"),
+        })
+    return items
+
+
+def filter_terms(direction: str, city: str | None) -> list[str]:
+    terms = [f"dir:{direction}"]
+    city = normalize_city(city)
+    if city:
+        terms.append(f"city:{city}")
+    return terms
+
+
+def index_terms(title: str, description: str | None, direction: str, city: str | None) -> list[str]:
+    return normalize_terms(f"{title} {description or ''}") + filter_terms(direction, city)
+
+
+def content_terms(terms: list[str]) -> list[str]:
+    return [t for t in terms if ":" not in t]
+
+
+def need_text(need: Need) -> str:
+    return f"{need.title}. {need.description}" if need.description else need.title
+
+
+class NeedService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def create_from_diary(self, diary: Diary) -> list[Need]:
+        """
+        Создает needs/offers из analysis_result дневника, считает эмбеддинги
+        и сразу подбирает встречные. Повторный вызов для дневника новых строк
+        не создает, а досчитывает эмбеддинги и совпадения, если прошлая
+        попытка упала после коммита строк (повтор совпадений игнорируется).
+        """
+        if not diary.analysis_result:
+            return []
+        existing = list((await self.db.execute(
+            select(Need)
+            .options(undefer(Need.need_embedding))
+            .where(Need.source_diary_id == diary.id)
+            .order_by(Need.id)
+        )).scalars())
+        if existing:
+            await self._embed_and_match(existing)
+            return []
+        
+        items = parse_items(diary.analysis_result, "need") + parse_items(diary.analysis_result, "offer")
+        if not items:
+            return []
+        
+        user = await self.db.get(User, diary.user_id)
+        needs = []
+        for item in items:
+            # Город из дневника, иначе из анкеты
+            item["city"] = item["city"] or (user.city if user else None)
+            needs.append(Need(
+                user_id=diary.user_id,
+                clone_id=diary.clone_id,
+                source_diary_id=diary.id,
+                terms=index_terms(item["title"], item["description"], item["direction"], item["city"]),
+                status="active",
+                need_embedding=None,
+                **item
+            ))
+        self.db.add_all(needs)
+        await self.db.commit()
+        
+        await self._embed_and_match(needs)
+        return needs
+    
+    async def _embed_and_match(self, needs: list[Need]):
+        embeddings = {n.id: n.need_embedding for n in needs if n.need_embedding is not None}
+        missing = [n for n in needs if n.id not in embeddings]
+        if missing:
+            vectors = await EmbeddingService(self.db).embed_many([need_text(n) for n in missing])
+            await self.db.execute(
+                update(Need),
+                [{"id": n.id, "need_embedding": v} for n, v in zip(missing, vectors)]
+            )
+            await self.db.commit()
+            embeddings.update((n.id, v) for n, v in zip(missing, vectors))
+        
+        for need in needs:
+            await self.match(need, embeddings[need.id])
+    
+    async def _lexical(self, need: Need, filters: list[str], query_terms: list[str]) -> dict[int, tuple[int, float]]:
+        if not query_terms:
+            return {}
+        # Самые новые из совпавших по GIN; объем работы ограничен лимитом
+        result = await self.db.execute(
+            select(Need.id, Need.user_id, Need.terms)
+            .where(
+                Need.terms.contains(filters),
+                Need.terms.overlap(query_terms),
+                Need.status == "active",
+                Need.user_id != need.user_id
+            )
+            .order_by(Need.id.desc())
+            .limit(settings.NEEDS_LEXICAL_SCAN_LIMIT)
+        )
+        query = set(query_terms)
+        return {
+            row.id: (row.user_id, len(query & set(row.terms)) / len(query))
+            for row in result
+        }
+    
+    async def _semantic(self, need: Need, filters: list[str], embedding: list[float]) -> dict[int, tuple[int, float]]:
+        await self.db.execute(text(f"SET LOCAL hnsw.ef_search = {int(settings.NEEDS_HNSW_EF_SEARCH)}"))
+        if settings.MATCHING_HNSW_ITERATIVE_SCAN:
+            await self.db.execute(text(f"SET LOCAL hnsw.iterative_scan = {settings.MATCHING_HNSW_ITERATIVE_SCAN}"))
+        distance = Need.need_embedding.cosine_distance(embedding)
+        result = await self.db.execute(
+            select(Need.id, Need.user_id, (1 - distance).label("similarity"))
+            .where(
+                Need.terms.contains(filters),
+                Need.need_embedding.is_not(None),
+                Need.status == "active",
+                Need.user_id != need.user_id
+            )
+            .order_by(distance)
+            .limit(settings.NEEDS_SEMANTIC_TOP_K)
+        )
+        return {row.id: (row.user_id, float(row.similarity)) for row in result}
+    
+    async def find_matches(self, need: Need, embedding: list[float] | None) -> list[MatchCandidate]:
+        """Встречные need/offer того же города, лучшие по совокупной оценке"""
+        filters = filter_terms(OPPOSITE[need.direction], need.city)
+        lexical = await self._lexical(need, filters, content_terms(need.terms))
+        semantic = await self._semantic(need, filters, embedding) if embedding is not None else {}
+        
+        # Найденным только лексически досчитываем близость по их id
+        missing = [need_id for need_id in lexical if need_id not in semantic]
+        if embedding is not None and missing:
+            distance = Need.need_embedding.cosine_distance(embedding)
+            result = await self.db.execute(
+                select(Need.id, (1 - distance).label("similarity"))
+                .where(Need.id.in_(missing), Need.need_embedding.is_not(None))
+            )
+            for row in result:
+                semantic[row.id] = (lexical[row.id][0], float(row.similarity))
+        
+        weight = settings.NEEDS_LEXICAL_WEIGHT
+        candidates = []
+        for need_id in lexical.keys() | semantic.keys():
+            user_id = (lexical.get(need_id) or semantic[need_id])[0]
+            lexical_score = lexical.get(need_id, (None, 0.0))[1]
+            semantic_score = semantic.get(need_id, (None, 0.0))[1]
+            score = weight * lexical_score + (1 - weight) * semantic_score
+            if score >= settings.NEEDS_MATCH_MIN_SCORE:
+                candidates.append(MatchCandidate(need_id, user_id, lexical_score, semantic_score, score))
+        candidates.sort(key=lambda c: c.score, reverse=True)
+        return candidates[:settings.NEEDS_MATCHES_PER_ITEM]
+    
+    async def match(self, need: Need, embedding: list[float] | None) -> int:
+        """Сохраняет совпадения для новой потребности/предложения; повторы игнорируются"""
+        candidates = await self.find_matches(need, embedding)
+        if not candidates:
+            return 0
+        rows = []
+        for candidate in candidates:
+            # need1 - всегда потребность, need2 - предложение
+            own = (need.id, need.user_id)
+            other = (candidate.need_id, candidate.user_id)
+            (need1_id, user1_id), (need2_id, user2_id) = (own, other) if need.direction == "need" else (other, own)
+            rows.append({
+                "user1_id": user1_id,
+                "user2_id": user2_id,
+                "need1_id": need1_id,
+                "need2_id": need2_id,
+                "match_type": need.need_type,
+                "match_score": round(candidate.score * 100, 2),
+                "details": {"lexical": round(candidate.lexical, 3), "semantic": round(candidate.semantic, 3)},
+                "status": "pending",
+            })
+        result = await self.db.execute(
+            insert(Match).values(rows).on_conflict_do_nothing(constraint="uq_matches_need_pair")
+        )
+        await self.db.commit()
+        metrics.incr("needs.matches_created", result.rowcount)
+        return result.rowcount
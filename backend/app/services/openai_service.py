@@ -1,27 +1,132 @@
+import asyncio
 import json
-from openai import AsyncOpenAI
+import logging
+import random
+import re
+import time
+import weakref
+from typing import Awaitable, Callable, TypeVar
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError
+from redis.exceptions import RedisError
+from app.core.cache import get_redis
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.tokens import count_tokens
+from app.services.analysis_merge import merge_analyses
+from app.services.llm_scheduler import Priority, estimate_tokens, llm_scheduler, request_key
+from app.services.name_gender import lookup_gender, normalize_name
 
-class OpenAIService:
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-    
-    async def transcribe_audio(self, audio_file_path: str) -> str:
-        """Транскрипция аудио через Whisper"""
-        with open(audio_file_path, "rb") as audio_file:
-            transcript = await self.client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                language="ru"
-            )
-        return transcript.text
-    
-    async def analyze_diary(self, diary_text: str) -> dict:
-        """Анализ дневника через GPT-4"""
-        prompt = """Ты - эксперт по анализу личности. Проанализируй дневник человека и извлеки структурированную информацию.
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Один клиент (и пул HTTP-соединений) на event loop процесса:
+# у API-процесса loop один, воркеры Celery запускают свой loop на задачу
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+
+def get_openai_client() -> AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(settings.OPENAI_TIMEOUT_CHAT, connect=settings.OPENAI_CONNECT_TIMEOUT)
+        )
+        client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            http_client=http_client,
+            # Ретраи делаем сами: с джиттером и метриками
+            max_retries=0
+        )
+        _clients[loop] = client
+    return client
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (APIConnectionError, APITimeoutError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
 
-ДНЕВНИК:
-{diary_text}
+
+def _retry_after(error: Exception) -> float | None:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+async def with_retries(operation: str, call: Callable[[], Awaitable[T]]) -> T:
+    """Повторяет call на 429/5xx/сетевых ошибках с экспоненциальной задержкой и full jitter"""
+    attempt = 0
+    while True:
+        try:
+            return await call()
+        except Exception as e:
+            if not is_retryable(e) or attempt >= settings.OPENAI_MAX_RETRIES:
+                metrics.incr(f"openai.{operation}.errors")
+                raise
+            delay = random.uniform(0, min(settings.OPENAI_RETRY_MAX_DELAY, settings.OPENAI_RETRY_BASE_DELAY * 2 ** attempt))
+            retry_after = _retry_after(e)
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, settings.OPENAI_RETRY_MAX_DELAY))
+            attempt += 1
+            metrics.incr(f"openai.{operation}.retries")
+            logger.warning("OpenAI %s failed (%s), retry %s in %.2fs", operation, e, attempt, delay)
+            await asyncio.sleep(delay)
+
+
+async def hedged(call: Callable[[], Awaitable[T]], delay: float) -> T:
+    """
+    Запускает запасной запрос, если первый не ответил за delay секунд,
+    и возвращает первый успешный результат; второй запрос отменяется.
+    """
+    first = asyncio.ensure_future(call())
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+        
+        metrics.incr("openai.hedged_requests")
+        second = asyncio.ensure_future(call())
+        tasks.append(second)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        metrics.incr("openai.hedge_wins")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # В том числе при отмене вызывающего во время любого ожидания
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+# Версия анализа: сохраняется в diaries.analysis_version и входит в ключ кэша
+# результатов - при смене модели или промпта ее нужно поднять
+ANALYSIS_VERSION = "gpt-4/schema-2"
+
+# Инструкции анализа не зависят от дневника: неизменный префикс промпта
+# собирается один раз, а текст дневника идет отдельным сообщением в конце
+ANALYSIS_SYSTEM_PROMPT = """Ты - эксперт по анализу личности. Проанализируй дневник человека и извлеки структурированную информацию. Всегда отвечай валидным JSON.
 
 ИЗВЛЕКИ СЛЕДУЮЩУЮ ИНФОРМАЦИЮ:
 
@@ -60,35 +165,269 @@ class OpenAIService:
 8. ПОТРЕБНОСТИ И ПРЕДЛОЖЕНИЯ:
    - Что нужно (вещи, работа, услуги)
    - Что предлагает (вещи, работа, услуги)
+   - Локация (если упоминается)
+
+ВЕРНИ ОТВЕТ СТРОГО В ФОРМАТЕ JSON С ЭТИМИ КЛЮЧАМИ:
+{
+    "emotions": {
+        "primary": ["радость", "спокойствие"],
+        "intensity": 7,
+        "mood": "positive"
+    },
+    "values": ["семья", "саморазвитие", "честность"],
+    "interests": ["программирование", "музыка", "путешествия"],
+    "communication_style": {
+        "formality": "неформальный",
+        "humor": "да, ироничный",
+        "sentence_length": "средние",
+        "slang": "иногда",
+        "emotionality": "высокая",
+        "common_phrases": ["короче", "в общем", "типа"]
+    },
+    "thinking_patterns": {
+        "type": "аналитический",
+        "optimism": "оптимист",
+        "focus": "детали",
+        "decision_style": "логический"
+    },
+    "goals": ["выучить Python", "найти работу мечты"],
+    "fears": ["неудача", "одиночество"],
+    "experiences": ["переехал в новый город", "начал изучать программирование"],
+    "needs": [
+        {"type": "thing", "item": "чайник", "location": "Москва"}
+    ],
+    "offers": [],
+    "key_phrases": ["короче говоря", "в принципе", "типа того"]
+}
+
+ПРАВИЛА:
+- Ключи - ровно как в примере, на английском; значения - на русском
+- Все ключи обязательны; если данных нет - пустой список []
+- emotions.intensity - число от 1 до 10, emotions.mood - одно из positive, neutral, negative
+- needs/offers: type - одно из thing, job, service"""
+
+
+class AnalysisSchemaError(ValueError):
+    """Ответ анализа не соответствует схеме ANALYSIS_SYSTEM_PROMPT"""
+
+
+# Ключи, по которым читают анализ профиль, воспоминания, биржа и генерируемые колонки
+ANALYSIS_LIST_KEYS = ("values", "interests", "goals", "fears", "experiences", "needs", "offers")
+ANALYSIS_MOODS = {"positive", "neutral", "negative"}
 
-ВЕРНИ ОТВЕТ В ФОРМАТЕ JSON.""".format(diary_text=diary_text)
+
+def validate_analysis(result: dict) -> dict:
+    """Проверяет обязательные ключи анализа; AnalysisSchemaError, если их нет"""
+    if not isinstance(result, dict):
+        raise AnalysisSchemaError("analysis is not a JSON object")
+    problems = [key for key in ANALYSIS_LIST_KEYS if not isinstance(result.get(key), list)]
+    emotions = result.get("emotions")
+    if not isinstance(emotions, dict):
+        problems.append("emotions")
+    else:
+        if not isinstance(emotions.get("primary"), list):
+            problems.append("emotions.primary")
+        intensity = emotions.get("intensity")
+        try:
+            emotions["intensity"] = float(intensity)
+        except (TypeError, ValueError):
+            problems.append("emotions.intensity")
+        if emotions.get("mood") not in ANALYSIS_MOODS:
+            problems.append("emotions.mood")
+    if problems:
+        raise AnalysisSchemaError(f"analysis is missing or has invalid keys: {', '.join(problems)}")
+    return result
+
+
+def split_into_segments(text: str, segment_tokens: int, overlap_tokens: int) -> list[str]:
+    """Режет текст по предложениям на сегменты ~segment_tokens с перекрытием"""
+    sentences = []
+    for sentence in re.split(r"(?<=[.!?…])\s+", text.strip()):
+        # Предложение длиннее сегмента (транскрипт без пунктуации) - режем по словам
+        if count_tokens(sentence) > segment_tokens:
+            words = sentence.split()
+            words_per_piece = max(1, segment_tokens // 3)  # русское слово - до ~3 токенов
+            sentences.extend(
+                " ".join(words[i:i + words_per_piece]) for i in range(0, len(words), words_per_piece)
+            )
+        else:
+            sentences.append(sentence)
+    
+    segments, current, current_tokens = [], [], 0
+    for sentence in sentences:
+        tokens = count_tokens(sentence)
+        if current and current_tokens + tokens > segment_tokens:
+            segments.append(" ".join(current))
+            # Хвост предыдущего сегмента переносим для связности
+            overlap, overlap_size = [], 0
+            for previous in reversed(current):
+                size = count_tokens(previous)
+                if overlap_size + size > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += size
+            current, current_tokens = overlap, overlap_size
+        current.append(sentence)
+        current_tokens += tokens
+    if current:
+        segments.append(" ".join(current))
+    return segments
+
+
+class OpenAIService:
+    def __init__(self):
+        self.client = get_openai_client()
+    
+    async def chat(
+        self,
+        messages: list[dict],
+        model: str,
+        priority: Priority = Priority.INTERACTIVE,
+        timeout: float | None = None,
+        hedge: bool = False,
+        coalesce: bool = False,
+        **kwargs
+    ):
+        """
+        chat.completions.create через планировщик: бюджет модели по приоритету,
+        таймаут, ретраи и (опционально) хеджирование и склейка одинаковых запросов
+        """
+        client = self.client.with_options(timeout=timeout or settings.OPENAI_TIMEOUT_CHAT)
+        tokens = estimate_tokens(
+            messages,
+            completion_tokens=kwargs.get("max_tokens") or settings.LLM_DEFAULT_COMPLETION_TOKENS
+        )
+        
+        async def call():
+            await llm_scheduler.acquire(model, priority, tokens)
+            return await client.chat.completions.create(model=model, messages=messages, **kwargs)
+        
+        async def call_with_retries():
+            if hedge and settings.OPENAI_HEDGING_ENABLED and not kwargs.get("stream"):
+                return await with_retries("chat", lambda: hedged(call, settings.OPENAI_HEDGE_DELAY))
+            return await with_retries("chat", call)
+        
+        if coalesce and not kwargs.get("stream"):
+            key = request_key(model, {"messages": messages, **kwargs})
+            return await llm_scheduler.single_flight(key, call_with_retries)
+        return await call_with_retries()
+    
+    async def transcribe_audio(self, audio_file_path: str, priority: Priority = Priority.BACKGROUND) -> str:
+        """Транскрипция аудио через Whisper"""
+        client = self.client.with_options(timeout=settings.OPENAI_TIMEOUT_TRANSCRIBE)
+        
+        async def call():
+            await llm_scheduler.acquire("whisper-1", priority, 0)
+            # Файл открывается заново на каждую попытку
+            with open(audio_file_path, "rb") as audio_file:
+                return await client.audio.transcriptions.create(
+                    model="whisper-1",
+                    file=audio_file,
+                    language="ru"
+                )
+        
+        transcript = await with_retries("transcribe", call)
+        return transcript.text
+    
+    async def analyze_diary(self, diary_text: str, priority: Priority = Priority.BACKGROUND) -> dict:
+        """Анализ дневника через GPT-4; длинные дневники - по сегментам (map-reduce)"""
+        if count_tokens(diary_text) <= settings.DIARY_ANALYSIS_SINGLE_CALL_TOKENS:
+            return await self._analyze_text(f"ДНЕВНИК:\n{diary_text}", priority)
+        
+        segments = split_into_segments(
+            diary_text,
+            settings.DIARY_ANALYSIS_SEGMENT_TOKENS,
+            settings.DIARY_ANALYSIS_SEGMENT_OVERLAP_TOKENS
+        )
+        semaphore = asyncio.Semaphore(settings.DIARY_ANALYSIS_MAX_PARALLEL)
+        
+        async def analyze_segment(index: int, segment: str) -> tuple[dict, int]:
+            async with semaphore:
+                started = time.perf_counter()
+                result = await self._analyze_text(
+                    f"ДНЕВНИК (фрагмент {index + 1} из {len(segments)}):\n{segment}",
+                    priority
+                )
+                duration_ms = int((time.perf_counter() - started) * 1000)
+                metrics.observe("analysis.segment_ms", duration_ms)
+                return result, duration_ms
         
-        response = await self.client.chat.completions.create(
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(analyze_segment(i, seg) for i, seg in enumerate(segments)))
+        merged = merge_analyses([result for result, _ in outcomes], [len(seg) for seg in segments])
+        merged["_meta"] = {
+            "segments": len(segments),
+            "segment_timings_ms": [duration for _, duration in outcomes],
+            "total_ms": int((time.perf_counter() - started) * 1000)
+        }
+        return merged
+    
+    async def _analyze_text(self, user_content: str, priority: Priority) -> dict:
+        response = await self.chat(
             model="gpt-4",
             messages=[
-                {"role": "system", "content": "Ты эксперт по анализу личности. Всегда отвечай валидным JSON."},
-                {"role": "user", "content": prompt}
+                {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+                {"role": "user", "content": user_content}
             ],
+            priority=priority,
+            timeout=settings.OPENAI_TIMEOUT_ANALYZE,
             response_format={"type": "json_object"},
             temperature=0.3
         )
         
-        return json.loads(response.choices[0].message.content)
+        # Каждый сегмент проверяется до слияния: слитый анализ наследует схему
+        return validate_analysis(json.loads(response.choices[0].message.content))
     
     async def guess_gender(self, name: str) -> str:
-        """Предположение пола по имени"""
-        response = await self.client.chat.completions.create(
+        """
+        Предположение пола по имени: справочник, затем кэш ответов LLM, затем LLM.
+        male / female / ambiguous (имя из справочника носят оба пола) / unknown
+        """
+        guess = lookup_gender(name)
+        if guess is not None:
+            metrics.incr("gender.local_hits")
+            return guess
+        
+        normalized = normalize_name(name)
+        if not normalized:
+            return "unknown"
+        
+        # v2: ключи v1 могли хранить "male" для ответа "female"
+        key = f"gender:v2:{normalized}"
+        try:
+            cached = await get_redis().get(key)
+        except RedisError as e:
+            logger.warning("Gender cache get failed for %s: %s", key, e)
+            cached = None
+        if cached:
+            metrics.incr("gender.cache_hits")
+            return cached
+        
+        metrics.incr("gender.llm_calls")
+        guess = await self._guess_gender_llm(normalized)
+        try:
+            await get_redis().set(key, guess, ex=settings.GENDER_CACHE_TTL_SECONDS)
+        except RedisError as e:
+            logger.warning("Gender cache set failed for %s: %s", key, e)
+        return guess
+    
+    async def _guess_gender_llm(self, name: str) -> str:
+        response = await self.chat(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "Определи пол по имени. Ответь только: мужчина, женщина или неизвестно."},
                 {"role": "user", "content": name}
             ],
+            priority=Priority.ONBOARDING,
+            timeout=settings.OPENAI_TIMEOUT_GUESS_GENDER,
+            coalesce=True,
             temperature=0.1
         )
         
-        guess = response.choices[0].message.content.lower()
-        if "мужчина" in guess or "male" in guess:
-            return "male"
-        elif "женщина" in guess or "female" in guess:
+        # Сравниваем целые слова: "male" - подстрока "female"
+        words = set(re.findall(r"\w+", response.choices[0].message.content.lower()))
+        if words & {"женщина", "female"}:
             return "female"
+        if words & {"мужчина", "male"}:
+            return "male"
         return "unknown"
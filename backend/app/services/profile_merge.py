@@ -0,0 +1,165 @@
+"""
+Инкрементальное слияние analysis_result дневников в профиль клона.
+
+Профиль строится из накопленных агрегатов, а не из всей истории:
+- списки строк (ценности, интересы, цели...) - веса элементов;
+- строки (формальность, тип мышления...) - распределение значений;
+- числа (интенсивность эмоций) - взвешенное среднее.
+
+Затухание по давности: вклад дневника с датой t равен 2^((t - t0) / half_life),
+т.е. старые вклады не пересчитываются, а новые весят экспоненциально больше.
+Когда множитель вырастает, агрегаты один раз перемасштабируются и t0 сдвигается.
+Обновление стоит O(размер одного анализа) независимо от числа дневников.
+"""
+import math
+from datetime import datetime
+from typing import Any
+
+AGGREGATES_VERSION = 1
+
+# Выше этого множителя агрегаты перемасштабируются, чтобы не терять точность
+_RESCALE_THRESHOLD = 2.0 ** 20
+
+# Листья, для которых в профиль пишется и распределение (<лист>_weights)
+WEIGHTED_PATHS = {"values", "emotions.primary", "emotions.mood"}
+
+
+def empty_aggregates() -> dict:
+    return {
+        "version": AGGREGATES_VERSION,
+        "t0": None,
+        "diaries": 0,
+        "total_weight": 0.0,
+        "lists": {},
+        "labels": {},
+        "numbers": {},
+    }
+
+
+def _days(moment: datetime) -> float:
+    return moment.timestamp() / 86400.0
+
+
+def _key(value: str) -> str:
+    return " ".join(value.strip().lower().split())
+
+
+def _flatten(analysis: dict, prefix: str = ""):
+    """(путь, значение) для листьев анализа; служебные ключи (_meta) пропускаются"""
+    for key, value in analysis.items():
+        if str(key).startswith("_"):
+            continue
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{path}.")
+        else:
+            yield path, value
+
+
+def _rescale(aggregates: dict, factor: float):
+    aggregates["total_weight"] /= factor
+    for bucket in ("lists", "labels"):
+        for items in aggregates[bucket].values():
+            for item in items.values():
+                item[0] /= factor
+    for pair in aggregates["numbers"].values():
+        pair[0] /= factor
+        pair[1] /= factor
+
+
+def _prune(items: dict, max_items: int):
+    """Ограничивает размер карты: выбрасывает самые легкие элементы"""
+    if len(items) <= max_items * 2:
+        return
+    keep = sorted(items, key=lambda k: items[k][0], reverse=True)[:max_items]
+    for key in list(items):
+        if key not in keep:
+            del items[key]
+
+
+def apply_analysis(
+    aggregates: dict | None,
+    analysis: dict,
+    moment: datetime,
+    half_life_days: float,
+    max_items: int
+) -> dict:
+    """Добавляет один анализ в агрегаты (изменяет и возвращает aggregates)"""
+    if not aggregates or aggregates.get("version") != AGGREGATES_VERSION:
+        aggregates = empty_aggregates()
+    
+    days = _days(moment)
+    if aggregates["t0"] is None:
+        aggregates["t0"] = days
+    exponent = (days - aggregates["t0"]) / half_life_days if half_life_days > 0 else 0.0
+    weight = 2.0 ** exponent
+    if weight > _RESCALE_THRESHOLD:
+        _rescale(aggregates, weight)
+        aggregates["t0"] = days
+        weight = 1.0
+    
+    aggregates["diaries"] += 1
+    aggregates["total_weight"] += weight
+    
+    for path, value in _flatten(analysis):
+        if isinstance(value, bool) or value is None:
+            continue
+        if isinstance(value, (int, float)):
+            pair = aggregates["numbers"].setdefault(path, [0.0, 0.0])
+            pair[0] += value * weight
+            pair[1] += weight
+        elif isinstance(value, str):
+            if value.strip():
+                items = aggregates["labels"].setdefault(path, {})
+                item = items.setdefault(_key(value), [0.0, value.strip()])
+                item[0] += weight
+                _prune(items, max_items)
+        elif isinstance(value, list):
+            strings = {_key(v): v.strip() for v in value if isinstance(v, str) and v.strip()}
+            if strings:
+                items = aggregates["lists"].setdefault(path, {})
+                for key, original in strings.items():
+                    item = items.setdefault(key, [0.0, original])
+                    item[0] += weight
+                _prune(items, max_items)
+            # Списки объектов (needs/offers) в профиль не сворачиваются
+    return aggregates
+
+
+def _set_path(profile: dict, path: str, value: Any):
+    *parents, leaf = path.split(".")
+    node = profile
+    for parent in parents:
+        node = node.setdefault(parent, {})
+    node[leaf] = value
+
+
+def _distribution(items: dict) -> dict[str, float]:
+    total = sum(weight for weight, _ in items.values()) or 1.0
+    ranked = sorted(items.values(), key=lambda item: item[0], reverse=True)
+    return {original: round(weight / total, 3) for weight, original in ranked}
+
+
+def render_aggregates(aggregates: dict, top_items: int) -> dict:
+    """Профиль для клона и API из агрегатов"""
+    profile: dict = {}
+    if not aggregates or not aggregates.get("diaries"):
+        return profile
+    
+    for path, items in aggregates["lists"].items():
+        ranked = sorted(items.values(), key=lambda item: item[0], reverse=True)
+        _set_path(profile, path, [original for _, original in ranked[:top_items]])
+        if path in WEIGHTED_PATHS:
+            _set_path(profile, f"{path}_weights", dict(list(_distribution(items).items())[:top_items]))
+    
+    for path, items in aggregates["labels"].items():
+        distribution = _distribution(items)
+        _set_path(profile, path, next(iter(distribution)))
+        if path in WEIGHTED_PATHS:
+            _set_path(profile, f"{path}_weights", distribution)
+    
+    for path, (weighted_sum, weight) in aggregates["numbers"].items():
+        if weight > 0 and math.isfinite(weighted_sum):
+            _set_path(profile, path, round(weighted_sum / weight, 2))
+    
+    return profile
@@ -0,0 +1,132 @@
+import copy
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from app.core.config import settings
+from app.models.clone import Clone
+from app.models.diary import Diary
+from app.services.clone_service import clone_cache
+from app.services.profile_merge import apply_analysis, empty_aggregates, render_aggregates
+
+
+def diff_profiles(expected: dict, actual: dict, tolerance: float = 0.01, prefix: str = "") -> list[str]:
+    """Пути, где профили расходятся (числа сравниваются с допуском)"""
+    diffs = []
+    for key in sorted(set(expected) | set(actual)):
+        path = f"{prefix}{key}"
+        left, right = expected.get(key), actual.get(key)
+        if isinstance(left, dict) and isinstance(right, dict):
+            diffs.extend(diff_profiles(left, right, tolerance, f"{path}."))
+        elif isinstance(left, (int, float)) and isinstance(right, (int, float)):
+            if abs(left - right) > tolerance:
+                diffs.append(path)
+        elif left != right:
+            diffs.append(path)
+    return diffs
+
+
+class ProfileService:
+    """Профиль личности клона из анализов его дневников"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def lock_clone(self, clone_id: int) -> Clone | None:
+        """Клон под FOR UPDATE: параллельные воркеры не теряют слияния друг друга"""
+        result = await self.db.execute(
+            select(Clone)
+            .where(Clone.id == clone_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
+    
+    def _set_profile(self, clone: Clone, aggregates: dict, profile: dict):
+        clone.profile_aggregates = aggregates
+        clone.personality_profile = profile
+        values = profile.get("values")
+        clone.top_values = [str(v) for v in values] if isinstance(values, list) else []
+        clone.last_trained_at = datetime.utcnow()
+    
+    def merge_analysis(self, clone: Clone, analysis_result: dict, diary_created_at: datetime | None):
+        """Добавляет анализ одного дневника в профиль - без чтения истории"""
+        # Копия, чтобы SQLAlchemy увидел изменение JSON-колонки
+        aggregates = apply_analysis(
+            copy.deepcopy(clone.profile_aggregates or {}),
+            analysis_result,
+            diary_created_at or datetime.utcnow(),
+            settings.PROFILE_DECAY_HALF_LIFE_DAYS,
+            settings.PROFILE_MAX_TRACKED_ITEMS
+        )
+        self._set_profile(clone, aggregates, render_aggregates(aggregates, settings.PROFILE_TOP_ITEMS))
+        # Первый проанализированный дневник делает клона доступным для матчинга
+        if clone.status == "creating":
+            clone.status = "active"
+    
+    async def rebuild(self, clone_id: int, save: bool = True) -> dict | None:
+        """
+        Полный пересчет профиля по всем проанализированным дневникам клона.
+        Возвращает профиль; при save=False клон не изменяется (для сверки).
+        """
+        clone = await self.lock_clone(clone_id) if save else await self.db.get(Clone, clone_id)
+        if not clone:
+            return None
+        
+        aggregates = empty_aggregates()
+        rows = await self.db.stream(
+            select(Diary.created_at, Diary.analysis_result)
+            .where(Diary.clone_id == clone_id, Diary.analysis_result.is_not(None))
+            .order_by(Diary.created_at, Diary.id)
+            .execution_options(yield_per=500)
+        )
+        async for created_at, analysis_result in rows:
+            aggregates = apply_analysis(
+                aggregates,
+                analysis_result,
+                created_at,
+                settings.PROFILE_DECAY_HALF_LIFE_DAYS,
+                settings.PROFILE_MAX_TRACKED_ITEMS
+            )
+        profile = render_aggregates(aggregates, settings.PROFILE_TOP_ITEMS)
+        
+        if save:
+            self._set_profile(clone, aggregates, profile)
+            clone.profile_version = (clone.profile_version or 0) + 1
+            await self.db.commit()
+            await clone_cache.invalidate(clone.user_id)
+        return profile
+    
+    async def verify(self, clone_id: int) -> list[str]:
+        """Сверяет инкрементальный профиль с полным пересчетом"""
+        clone = await self.db.get(Clone, clone_id)
+        if not clone:
+            return []
+        rebuilt = await self.rebuild(clone_id, save=False)
+        return diff_profiles(rebuilt or {}, clone.personality_profile or {})
+    
+    async def find_clones(
+        self,
+        values: list[str] | None = None,
+        match_all: bool = False,
+        mood: str | None = None,
+        limit: int = 100
+    ) -> list[int]:
+        """Id активных клонов по ценностям (GIN по top_values) и общему настроению"""
+        query = select(Clone.id).where(Clone.status == "active").order_by(Clone.id).limit(limit)
+        if values:
+            query = query.where(Clone.top_values.contains(values) if match_all else Clone.top_values.overlap(values))
+        if mood:
+            query = query.where(Clone.overall_mood == mood)
+        return list((await self.db.execute(query)).scalars())
+    
+    async def value_popularity(self, limit: int = 20) -> list[tuple[str, int]]:
+        """Самые частые ценности среди активных клонов - агрегат целиком в SQL"""
+        value = func.unnest(Clone.top_values).label("value")
+        values = select(value).where(Clone.status == "active").subquery()
+        result = await self.db.execute(
+            select(values.c.value, func.count().label("clones"))
+            .group_by(values.c.value)
+            .order_by(func.count().desc())
+            .limit(limit)
+        )
+        return [(row.value, row.clones) for row in result]
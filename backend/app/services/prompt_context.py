@@ -0,0 +1,128 @@
+import json
+from dataclasses import dataclass
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.tokens import count_tokens
+from app.models.clone import Clone
+from app.services.retrieval_service import RetrievedContext
+
+PERSONA_HEADER = "Ты - ИИ-клон пользователя. Твоя задача - общаться и думать как этот человек."
+
+PERSONA_RULES = """СТИЛЬ ОБЩЕНИЯ:
+- Используй слова и фразы, которые использует пользователь
+- Отражай его эмоциональные паттерны
+- Думай как он думает
+- Реагируй как он реагирует
+
+ПОМНИ:
+- Ты не просто имитируешь, ты понимаешь его ценности и мотивации
+- Используй конкретные факты из его жизни
+- Будь последовательным в характере"""
+
+
+@dataclass
+class PromptContext:
+    system_prompt: str
+    tokens: int
+    memories_used: int
+    diaries_used: int
+
+
+def render_profile(profile: dict, prefix: str = "") -> list[str]:
+    """Компактный вид профиля: строка `ключ: значения` вместо JSON с отступами"""
+    lines = []
+    for key, value in (profile or {}).items():
+        name = f"{prefix}{key}"
+        if value in (None, "", [], {}):
+            continue
+        if isinstance(value, dict):
+            lines.extend(render_profile(value, f"{name}."))
+        elif isinstance(value, list):
+            items = [
+                json.dumps(v, ensure_ascii=False, separators=(",", ":")) if isinstance(v, (dict, list)) else str(v)
+                for v in value
+            ]
+            lines.append(f"{name}: {', '.join(items)}")
+        else:
+            lines.append(f"{name}: {value}")
+    return lines
+
+
+# Статическая часть промпта на (clone_id, profile_version)
+_static_cache = TTLCache(maxsize=settings.PROMPT_STATIC_CACHE_SIZE, ttl=settings.PROMPT_STATIC_CACHE_TTL)
+
+
+class PromptContextBuilder:
+    """
+    Собирает системный промпт клона в рамках бюджета токенов.
+
+    Порядок заполнения: ядро профиля (статическая часть, кэшируется на версию
+    клона), затем найденные воспоминания, затем фрагменты дневников.
+    Статическая часть идет первой, чтобы префикс промпта не менялся между вопросами.
+    """
+    
+    def __init__(self, model: str = "gpt-4", token_budget: int | None = None):
+        self.model = model
+        self.token_budget = token_budget or settings.PROMPT_CONTEXT_TOKEN_BUDGET
+    
+    def static_part(self, clone: Clone) -> tuple[str, int]:
+        key = (clone.id, clone.profile_version or 0)
+        cached = _static_cache.get(key)
+        if cached is not None:
+            metrics.incr("prompt.static_cache_hits")
+            return cached
+        metrics.incr("prompt.static_cache_misses")
+        
+        # Ядро профиля - в пределах своей доли бюджета
+        profile_lines = []
+        profile_tokens = 0
+        for line in render_profile(clone.personality_profile):
+            line_tokens = count_tokens(line, self.model) + 1
+            if profile_tokens + line_tokens > settings.PROMPT_PROFILE_MAX_TOKENS:
+                break
+            profile_lines.append(line)
+            profile_tokens += line_tokens
+        
+        text = f"{PERSONA_HEADER}\n\nПРОФИЛЬ ЛИЧНОСТИ:\n" + "\n".join(profile_lines) + f"\n\n{PERSONA_RULES}"
+        result = (text, count_tokens(text, self.model))
+        _static_cache.set(key, result)
+        return result
+    
+    def build(self, clone: Clone, context: RetrievedContext) -> PromptContext:
+        static_text, tokens = self.static_part(clone)
+        sections = [static_text]
+        
+        memories_used = 0
+        memory_lines = []
+        for memory in context.memories:
+            line = f"- {memory.memory_content}"
+            line_tokens = count_tokens(line, self.model) + 1
+            if tokens + line_tokens > self.token_budget:
+                break
+            memory_lines.append(line)
+            tokens += line_tokens
+            memories_used += 1
+        if memory_lines:
+            sections.append("ВАЖНЫЕ ФАКТЫ О ПОЛЬЗОВАТЕЛЕ:\n" + "\n".join(memory_lines))
+        
+        diaries_used = 0
+        diary_lines = []
+        for fragment in context.diary_fragments:
+            line = f"- {fragment.text}"
+            line_tokens = count_tokens(line, self.model) + 1
+            if tokens + line_tokens > self.token_budget:
+                break
+            diary_lines.append(line)
+            tokens += line_tokens
+            diaries_used += 1
+        if diary_lines:
+            sections.append("ФРАГМЕНТЫ ДНЕВНИКОВ ПО ТЕМЕ ВОПРОСА:\n" + "\n".join(diary_lines))
+        
+        metrics.observe("prompt.context_tokens", tokens)
+        return PromptContext(
+            system_prompt="\n\n".join(sections),
+            tokens=tokens,
+            memories_used=memories_used,
+            diaries_used=diaries_used
+        )
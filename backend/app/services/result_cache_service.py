@@ -0,0 +1,72 @@
+"""
+Дедупликация дорогих вызовов: одинаковое аудио не транскрибируется,
+а одинаковый текст не анализируется повторно.
+
+Ключ - sha256 от вида результата, его версии и входа: для транскрипции -
+хэш байтов загруженного файла, для анализа - нормализованный текст.
+Смена версии (модель, промпт) делает старые записи недостижимыми.
+
+Сэкономленные вызовы считаются в Redis (общий счетчик для всех воркеров)
+и отдаются в GET /metrics.
+"""
+import hashlib
+import logging
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from app.core.cache import get_redis
+from app.core.metrics import metrics
+from app.models.result_cache import ResultCache
+from app.services.embedding_service import normalize_text
+
+logger = logging.getLogger(__name__)
+
+SAVED_KEY = "dedup:saved"
+
+
+def result_key(kind: str, version: str, content: str) -> str:
+    return hashlib.sha256(f"{kind}\n{version}\n{content}".encode()).hexdigest()
+
+
+def transcript_key(audio_sha256: str, version: str) -> str:
+    return result_key("transcript", version, audio_sha256)
+
+
+def analysis_key(text: str, version: str) -> str:
+    return result_key("analysis", version, normalize_text(text))
+
+
+async def record_saved(name: str, value: float = 1):
+    """Учитывает сэкономленный вызов: transcriptions, audio_seconds, analyses, analysis_tokens"""
+    metrics.incr(f"dedup.{name}_saved", value)
+    try:
+        await get_redis().hincrbyfloat(SAVED_KEY, name, value)
+    except RedisError as e:
+        logger.warning("Dedup counter unavailable: %s", e)
+
+
+async def saved_totals() -> dict[str, float]:
+    """Сэкономленные вызовы по всем процессам"""
+    return {name: float(value) for name, value in (await get_redis().hgetall(SAVED_KEY)).items()}
+
+
+class ResultCacheService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get(self, kind: str, content_hash: str) -> dict | None:
+        result = await self.db.scalar(
+            select(ResultCache.result).where(ResultCache.content_hash == content_hash)
+        )
+        metrics.incr(f"result_cache.{kind}.{'hits' if result is not None else 'misses'}")
+        return result
+    
+    async def put(self, kind: str, content_hash: str, version: str, result: dict):
+        # Параллельный воркер мог сохранить тот же результат - оставляем первый
+        await self.db.execute(
+            insert(ResultCache)
+            .values(content_hash=content_hash, kind=kind, version=version, result=result)
+            .on_conflict_do_nothing(index_elements=["content_hash"])
+        )
+        await self.db.commit()
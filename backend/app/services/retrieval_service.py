@@ -0,0 +1,143 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, text, func
+from app.core.config import settings
+from app.models.diary import Diary
+from app.models.memory import CloneMemory
+
+
+@dataclass
+class DiaryFragment:
+    diary_id: int
+    created_at: datetime | None
+    text: str
+    similarity: float
+
+
+@dataclass
+class RetrievedContext:
+    memories: list[CloneMemory] = field(default_factory=list)
+    diary_fragments: list[DiaryFragment] = field(default_factory=list)
+
+
+class RetrievalService:
+    """Семантический поиск воспоминаний и дневников клона через pgvector"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def retrieve(
+        self,
+        clone_id: int,
+        query_embedding: list[float] | None,
+        memories_k: int | None = None,
+        diaries_k: int | None = None
+    ) -> RetrievedContext:
+        """
+        Top-k воспоминаний и фрагментов дневников по косинусной близости к вопросу.
+        Без эмбеддинга вопроса (или если векторов еще нет) - самые важные воспоминания
+        и последние дневники.
+        """
+        memories_k = memories_k or settings.RETRIEVAL_MEMORIES_TOP_K
+        diaries_k = diaries_k or settings.RETRIEVAL_DIARIES_TOP_K
+        
+        context = RetrievedContext()
+        if query_embedding is not None:
+            await self._configure_search()
+            context.memories = await self._similar_memories(clone_id, query_embedding, memories_k)
+            context.diary_fragments = await self._similar_diaries(clone_id, query_embedding, diaries_k)
+        
+        if not context.memories:
+            context.memories = await self._important_memories(clone_id, memories_k)
+        if not context.diary_fragments:
+            context.diary_fragments = await self._recent_diaries(clone_id, diaries_k)
+        return context
+    
+    async def _configure_search(self):
+        # Точность/скорость HNSW для этой транзакции. Фильтр по клону отсекает
+        # почти всех соседей из индекса: итеративный скан добирает top-k
+        await self.db.execute(text(f"SET LOCAL hnsw.ef_search = {int(settings.RETRIEVAL_HNSW_EF_SEARCH)}"))
+        if settings.RETRIEVAL_HNSW_ITERATIVE_SCAN:
+            await self.db.execute(text(f"SET LOCAL hnsw.iterative_scan = {settings.RETRIEVAL_HNSW_ITERATIVE_SCAN}"))
+    
+    async def _similar_memories(self, clone_id: int, query_embedding: list[float], k: int) -> list[CloneMemory]:
+        distance = CloneMemory.memory_embedding.cosine_distance(query_embedding)
+        result = await self.db.execute(
+            select(CloneMemory)
+            .where(
+                CloneMemory.clone_id == clone_id,
+                CloneMemory.memory_embedding.is_not(None)
+            )
+            .order_by(distance)
+            .limit(k)
+        )
+        return list(result.scalars().all())
+    
+    async def _similar_diaries(self, clone_id: int, query_embedding: list[float], k: int) -> list[DiaryFragment]:
+        distance = Diary.content_embedding.cosine_distance(query_embedding)
+        result = await self.db.execute(
+            select(
+                Diary.id,
+                Diary.created_at,
+                func.left(Diary.content_text, settings.RETRIEVAL_DIARY_FRAGMENT_CHARS).label("fragment"),
+                (1 - distance).label("similarity")
+            )
+            .where(
+                Diary.clone_id == clone_id,
+                Diary.content_embedding.is_not(None)
+            )
+            .order_by(distance)
+            .limit(k)
+        )
+        return [
+            DiaryFragment(
+                diary_id=row.id,
+                created_at=row.created_at,
+                text=row.fragment or "",
+                similarity=float(row.similarity)
+            )
+            for row in result
+        ]
+    
+    async def _recent_diaries(self, clone_id: int, k: int) -> list[DiaryFragment]:
+        result = await self.db.execute(
+            select(
+                Diary.id,
+                Diary.created_at,
+                func.left(Diary.content_text, settings.RETRIEVAL_DIARY_FRAGMENT_CHARS).label("fragment")
+            )
+            .where(Diary.clone_id == clone_id, Diary.content_text.is_not(None))
+            .order_by(Diary.created_at.desc())
+            .limit(k)
+        )
+        return [
+            DiaryFragment(diary_id=row.id, created_at=row.created_at, text=row.fragment or "", similarity=0.0)
+            for row in result
+        ]
+    
+    async def _important_memories(self, clone_id: int, k: int) -> list[CloneMemory]:
+        result = await self.db.execute(
+            select(CloneMemory)
+            .where(CloneMemory.clone_id == clone_id)
+            .order_by(CloneMemory.importance_score.desc())
+            .limit(k)
+        )
+        return list(result.scalars().all())
+    
+    async def mark_used(self, memory_ids: list[int]):
+        """
+        Отмечает воспоминания, попавшие в ответ пользователю. Без коммита:
+        вызывающий сохраняет отметку вместе с ответом, а не на каждом чтении
+        """
+        if not memory_ids:
+            return
+        await self.db.execute(
+            update(CloneMemory)
+            .where(CloneMemory.id.in_(memory_ids))
+            .values(
+                last_used_at=datetime.utcnow(),
+                usage_count=func.coalesce(CloneMemory.usage_count, 0) + 1
+            )
+            .execution_options(synchronize_session=False)
+        )
@@ -0,0 +1,62 @@
+"""
+Нормализация русского (и латинского) текста в термы для инвертированного индекса.
+
+Легкий стеммер без зависимостей: нижний регистр, ё -> е, стоп-слова,
+отсечение самого длинного подходящего окончания с сохранением основы
+не короче 3 букв. «чайник», «чайника», «чайники» дают один терм.
+"""
+import re
+
+_TOKEN = re.compile(r"[а-яa-z0-9]+")
+
+_STOPWORDS = frozenset("""
+и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по только ее мне было
+вот от меня еще нет о из ему теперь когда даже ну вдруг ли если уже или ни быть был него до вас
+нибудь опять уж вам ведь там потом себя ничего ей может они тут где есть надо ней для мы тебя их
+чем была сам чтоб без будто чего раз тоже себе под будет ж тогда кто этот того потому этого какой
+совсем ним здесь этом один почти мой тем чтобы нее сейчас были куда зачем всех никогда можно при
+наконец два об другой хоть после над больше тот через эти нас про всего них какая много разве три
+эту моя впрочем хорошо свою этой перед иногда лучше чуть том нельзя такой им более всегда конечно
+всю между нужен нужна нужно нужны хочу ищу есть очень
+the a an and or of to in for with on at by is are be
+""".split())
+
+# Окончания по убыванию длины: при отсечении берется самое длинное
+_ENDINGS = sorted(set("""
+иями ями ами ией иям ием иях ов ев ей ам ям ах ях ом ем ой ый ий ая яя ое ее ые ие ую юю
+ого его ому ему ыми ими ать ять ить еть уть ешь ет ют ут ит ат ят ем им ишь ете ите ла ло ли
+ть ся сь а я о е ы и у ю ь й
+""".split()), key=len, reverse=True)
+
+_MIN_STEM = 3
+
+
+def stem(word: str) -> str:
+    if not word.isalpha() or not "а" <= word[0] <= "я":
+        return word
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= _MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def normalize_terms(text: str) -> list[str]:
+    """Уникальные термы текста в порядке появления"""
+    terms = []
+    seen = set()
+    for token in _TOKEN.findall(text.lower().replace("ё", "е")):
+        if len(token) < 2 or token in _STOPWORDS:
+            continue
+        term = stem(token)
+        if term not in seen:
+            seen.add(term)
+            terms.append(term)
+    return terms
+
+
+def normalize_city(city: str | None) -> str | None:
+    """«Москва, центр» -> «москва»"""
+    if not city:
+        return None
+    name = city.split(",")[0].strip().lower().replace("ё", "е")
+    return name or None
@@ -0,0 +1,102 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from fastapi import UploadFile
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLargeError(Exception):
+    """Файл превышает MAX_UPLOAD_SIZE"""
+
+
+@dataclass
+class UploadStats:
+    path: str
+    bytes_written: int
+    duration_seconds: float
+    sha256: str  # хэш содержимого - ключ дедупликации транскрипции
+
+    @property
+    def bytes_per_second(self) -> float:
+        if self.duration_seconds <= 0:
+            return float(self.bytes_written)
+        return self.bytes_written / self.duration_seconds
+
+
+class UploadService:
+    """Потоковое сохранение загрузок на диск фиксированными чанками"""
+
+    def __init__(self, upload_dir: str | None = None, max_size: int | None = None, chunk_size: int | None = None):
+        self.upload_dir = upload_dir or settings.UPLOAD_DIR
+        self.max_size = max_size or settings.MAX_UPLOAD_SIZE
+        self.chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+
+    def build_path(self, prefix: str, filename: str | None) -> str:
+        # Имя клиента не используется как путь: только расширение
+        ext = os.path.splitext(filename or "")[1][:10]
+        return os.path.join(self.upload_dir, f"{prefix}_{uuid.uuid4().hex}{ext}")
+
+    async def save(self, upload: UploadFile, prefix: str) -> UploadStats:
+        """
+        Читает загрузку чанками и пишет их на диск в пуле потоков.
+        Лимит размера проверяется по мере чтения, поэтому слишком большой
+        файл обрывается на первом лишнем чанке, а не после буферизации.
+        """
+        # Размер может быть известен заранее - тогда отказываем сразу
+        if upload.size is not None and upload.size > self.max_size:
+            raise UploadTooLargeError(f"File exceeds {self.max_size} bytes")
+
+        await asyncio.to_thread(os.makedirs, self.upload_dir, exist_ok=True)
+        path = self.build_path(prefix, upload.filename)
+
+        started = time.perf_counter()
+        written = 0
+        digest = hashlib.sha256()
+        f = await asyncio.to_thread(open, path, "wb")
+        try:
+            while True:
+                chunk = await upload.read(self.chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > self.max_size:
+                    raise UploadTooLargeError(f"File exceeds {self.max_size} bytes")
+                digest.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+        except BaseException:
+            await asyncio.to_thread(f.close)
+            await asyncio.to_thread(_remove_quietly, path)
+            raise
+        await asyncio.to_thread(f.close)
+
+        stats = UploadStats(
+            path=path,
+            bytes_written=written,
+            duration_seconds=time.perf_counter() - started,
+            sha256=digest.hexdigest()
+        )
+        logger.info(
+            "Upload saved: %s bytes in %.3fs (%.0f B/s) -> %s",
+            stats.bytes_written, stats.duration_seconds, stats.bytes_per_second, stats.path
+        )
+        metrics.observe("upload.bytes_per_second", stats.bytes_per_second)
+        metrics.observe("upload.latency_ms", stats.duration_seconds * 1000)
+        return stats
+
+    async def discard(self, path: str):
+        """Удаляет сохраненную загрузку, которая не понадобилась"""
+        await asyncio.to_thread(_remove_quietly, path)
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
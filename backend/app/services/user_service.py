@@ -1,12 +1,19 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from app.core.cache import ModelCache
 from app.models.user import User
 
+# Кэш пользователей по telegram_id
+user_cache = ModelCache(User, "user")
+
 class UserService:
     def __init__(self, db: AsyncSession):
         self.db = db
     
     async def get_by_telegram_id(self, telegram_id: int) -> User | None:
+        return await user_cache.get(self.db, telegram_id, lambda: self._load_by_telegram_id(telegram_id))
+    
+    async def _load_by_telegram_id(self, telegram_id: int) -> User | None:
         result = await self.db.execute(
             select(User).where(User.telegram_id == telegram_id)
         )
@@ -19,4 +26,13 @@ class UserService:
             self.db.add(user)
             await self.db.commit()
             await self.db.refresh(user)
+            # Сбрасываем негативную запись
+            await user_cache.invalidate(telegram_id)
+        return user
+    
+    async def save(self, user: User) -> User:
+        """Сохраняет изменения пользователя и сбрасывает его кэш"""
+        await self.db.commit()
+        await self.db.refresh(user)
+        await user_cache.invalidate(user.telegram_id)
         return user
@@ -0,0 +1,94 @@
+"""
+Ежедневный запуск диалогов клонов: сначала продолжаются прерванные,
+затем новые пары по убыванию ожидаемой совместимости. Параллельность
+ограничена CONVERSATION_MAX_PARALLEL, расход - суточным бюджетом токенов.
+"""
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime
+from app.worker import celery_app
+from app.core.config import settings
+from app.core.database import WorkerSessionLocal
+from app.models.clone_conversation import CloneConversation
+from app.services.conversation_service import (
+    ConversationBudgetExhausted,
+    ConversationService,
+    DailyTokenBudget,
+    PlannedPair,
+)
+from app.services.llm_scheduler import LLMBudgetExceeded
+from app.services.openai_service import is_retryable
+from app.tasks.diary_tasks import run_async
+
+logger = logging.getLogger(__name__)
+
+
+async def _record_error(conversation_id: int, error: Exception) -> str:
+    """
+    Временная ошибка (таймаут, 429/5xx) оставляет диалог active - он продолжится
+    в следующий запуск; failed - после CONVERSATION_MAX_ERRORS подряд или сразу
+    для прочих ошибок. Иначе пара пропускалась бы на CONVERSATION_REEVALUATE_AFTER_DAYS.
+    """
+    async with WorkerSessionLocal() as db:
+        conversation = await db.get(CloneConversation, conversation_id)
+        if not conversation:
+            return "failed"
+        conversation.error_count = (conversation.error_count or 0) + 1
+        if not is_retryable(error) or conversation.error_count >= settings.CONVERSATION_MAX_ERRORS:
+            conversation.status = "failed"
+            conversation.compatibility_analysis = {"error": str(error)}
+            conversation.completed_at = datetime.utcnow()
+        await db.commit()
+        return "failed" if conversation.status == "failed" else "deferred"
+
+
+async def _run_conversations() -> dict:
+    budget = DailyTokenBudget("conversations", settings.CONVERSATION_DAILY_TOKEN_BUDGET)
+    async with WorkerSessionLocal() as db:
+        service = ConversationService(db, budget)
+        resumed = await service.resumable()
+        planned = await service.plan_pairs(settings.CONVERSATION_PAIRS_PER_RUN)
+    
+    semaphore = asyncio.Semaphore(settings.CONVERSATION_MAX_PARALLEL)
+    exhausted = asyncio.Event()
+    statuses: Counter = Counter()
+    
+    async def process(item: int | PlannedPair):
+        async with semaphore:
+            # После исчерпания бюджета новые диалоги не начинаем
+            if exhausted.is_set():
+                return
+            conversation_id = item if isinstance(item, int) else None
+            try:
+                async with WorkerSessionLocal() as db:
+                    service = ConversationService(db, budget)
+                    if conversation_id is None:
+                        conversation_id = await service.start(item)
+                    statuses[await service.run(conversation_id)] += 1
+            except ConversationBudgetExhausted:
+                exhausted.set()
+                statuses["paused"] += 1
+            except LLMBudgetExceeded:
+                # Давление на лимиты модели: диалог остается active и продолжится позже
+                statuses["deferred"] += 1
+            except Exception as e:
+                logger.warning("Conversation %s failed: %s", conversation_id, e)
+                statuses[await _record_error(conversation_id, e) if conversation_id is not None else "failed"] += 1
+    
+    await asyncio.gather(*(process(item) for item in [*resumed, *planned]))
+    
+    summary = {
+        "resumed": len(resumed),
+        "planned": len(planned),
+        "budget_exhausted": exhausted.is_set(),
+        "tokens_used_today": await budget.used(),
+        **statuses
+    }
+    logger.info("Clone conversations: %s", summary)
+    return summary
+
+
+@celery_app.task(name="conversations.run")
+def run_conversations() -> dict:
+    return run_async(_run_conversations())
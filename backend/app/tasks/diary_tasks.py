@@ -0,0 +1,145 @@
+"""
+Фоновая обработка дневников: transcribe -> analyze -> extract_memories.
+
+Каждый этап - отдельная Celery-задача, поэтому этапы ретраятся независимо
+и масштабируются вместе с числом воркеров, а POST /diaries не ждет OpenAI.
+"""
+import asyncio
+import logging
+from celery import chain
+from app.worker import celery_app
+from app.core.config import settings
+from app.core.database import WorkerSessionLocal
+from app.models.diary import Diary
+from app.core.tokens import count_tokens
+from app.services.audio_service import AudioService, TRANSCRIPT_VERSION
+from app.services.diary_service import DiaryService
+from app.services.embedding_service import EmbeddingService
+from app.services.memory_service import MemoryService
+from app.services.need_service import NeedService
+from app.services.openai_service import OpenAIService, ANALYSIS_VERSION
+from app.services.result_cache_service import ResultCacheService, analysis_key, transcript_key, record_saved
+
+logger = logging.getLogger(__name__)
+
+
+def run_async(coro):
+    """Выполняет корутину в отдельном event loop воркера"""
+    return asyncio.run(coro)
+
+
+class DiaryTask(celery_app.Task):
+    """Базовая задача этапа: ретраи с экспоненциальной задержкой и пометка failed"""
+    abstract = True
+    autoretry_for = (Exception,)
+    retry_backoff = True
+    retry_backoff_max = settings.DIARY_TASK_RETRY_BACKOFF_MAX
+    retry_jitter = True
+    max_retries = settings.DIARY_TASK_MAX_RETRIES
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        # Вызывается только когда ретраи исчерпаны
+        diary_id = args[0] if args else kwargs.get("diary_id")
+        logger.error("Diary %s failed at %s: %s", diary_id, self.name, exc)
+        if diary_id is not None:
+            run_async(_set_status(diary_id, "failed", f"{self.name}: {exc}"))
+
+
+async def _set_status(diary_id: int, status: str, error_message: str | None = None):
+    async with WorkerSessionLocal() as db:
+        await DiaryService(db).set_status(diary_id, status, error_message)
+
+
+async def _transcribe(diary_id: int) -> int:
+    async with WorkerSessionLocal() as db:
+        diary_service = DiaryService(db)
+        diary = await db.get(Diary, diary_id)
+        if not diary:
+            logger.warning("Diary %s not found, skipping transcription", diary_id)
+            return diary_id
+        
+        # Повторная доставка задачи: текст уже получен
+        if diary.content_text:
+            return diary_id
+        
+        await diary_service.set_status(diary_id, "transcribing")
+        # Тот же файл уже расшифровывался (повторная отправка) - Whisper не вызываем
+        cache = ResultCacheService(db)
+        key = transcript_key(diary.audio_sha256, TRANSCRIPT_VERSION) if diary.audio_sha256 else None
+        cached = await cache.get("transcript", key) if key else None
+        if cached is not None:
+            await record_saved("transcriptions")
+            await record_saved("audio_seconds", cached.get("duration_seconds") or 0)
+            await diary_service.set_transcript(diary_id, cached["text"], cached.get("duration_seconds"))
+            return diary_id
+        
+        transcript = await AudioService().transcribe(diary.audio_file_path)
+        if key:
+            await cache.put("transcript", key, TRANSCRIPT_VERSION, {
+                "text": transcript.text,
+                "duration_seconds": transcript.duration_seconds
+            })
+        await diary_service.set_transcript(diary_id, transcript.text, transcript.duration_seconds)
+    return diary_id
+
+
+async def _analyze(diary_id: int) -> int:
+    async with WorkerSessionLocal() as db:
+        diary_service = DiaryService(db)
+        diary = await db.get(Diary, diary_id)
+        if not diary or diary.analysis_result is not None:
+            return diary_id
+        
+        await diary_service.set_status(diary_id, "analyzing")
+        # Одинаковый текст той же версией анализа уже разбирался - GPT-4 не вызываем
+        cache = ResultCacheService(db)
+        key = analysis_key(diary.content_text, ANALYSIS_VERSION)
+        analysis_result = await cache.get("analysis", key)
+        if analysis_result is not None:
+            await record_saved("analyses")
+            await record_saved("analysis_tokens", count_tokens(diary.content_text))
+        else:
+            analysis_result = await OpenAIService().analyze_diary(diary.content_text)
+            await cache.put("analysis", key, ANALYSIS_VERSION, analysis_result)
+        await diary_service.update_analysis(diary_id, analysis_result)
+    return diary_id
+
+
+async def _extract_memories(diary_id: int) -> int:
+    async with WorkerSessionLocal() as db:
+        diary_service = DiaryService(db)
+        diary = await db.get(Diary, diary_id)
+        if not diary:
+            return diary_id
+        
+        await diary_service.set_status(diary_id, "extracting")
+        if diary.content_embedding is None:
+            await EmbeddingService(db).embed_diaries([diary])
+        await MemoryService(db).create_from_diary(diary)
+        await NeedService(db).create_from_diary(diary)
+        await diary_service.set_status(diary_id, "completed")
+    return diary_id
+
+
+@celery_app.task(base=DiaryTask, bind=True, name="diaries.transcribe")
+def transcribe_diary(self, diary_id: int) -> int:
+    return run_async(_transcribe(diary_id))
+
+
+@celery_app.task(base=DiaryTask, bind=True, name="diaries.analyze")
+def analyze_diary(self, diary_id: int) -> int:
+    return run_async(_analyze(diary_id))
+
+
+@celery_app.task(base=DiaryTask, bind=True, name="diaries.extract_memories")
+def extract_memories(self, diary_id: int) -> int:
+    return run_async(_extract_memories(diary_id))
+
+
+def enqueue_diary_processing(diary_id: int, has_audio: bool):
+    """Ставит цепочку обработки дневника в очередь"""
+    if has_audio:
+        pipeline = chain(transcribe_diary.s(diary_id), analyze_diary.s(), extract_memories.s())
+    else:
+        pipeline = chain(analyze_diary.s(diary_id), extract_memories.s())
+    return pipeline.apply_async()
@@ -0,0 +1,72 @@
+"""
+Ночной батч подбора кандидатов: обновляет personality_embedding клонов
+с изменившимся профилем и пересчитывает clone_candidates для всех активных.
+
+Клоны обрабатываются параллельно (MATCHING_PARALLEL), у каждой корутины
+своя сессия - ANN-запросы идут по разным соединениям.
+"""
+import asyncio
+import logging
+import time
+from sqlalchemy import select
+from app.worker import celery_app
+from app.core.config import settings
+from app.core.database import WorkerSessionLocal
+from app.core.metrics import metrics
+from app.models.clone import Clone
+from app.services.matching_service import MatchingService
+from app.tasks.diary_tasks import run_async
+
+logger = logging.getLogger(__name__)
+
+
+async def _refresh_all() -> dict:
+    started = time.perf_counter()
+    async with WorkerSessionLocal() as db:
+        embedded = await MatchingService(db).embed_profiles()
+        clone_ids = list((await db.execute(
+            select(Clone.id)
+            .where(Clone.status == "active", Clone.personality_embedding.is_not(None))
+            .order_by(Clone.id)
+        )).scalars())
+    
+    semaphore = asyncio.Semaphore(settings.MATCHING_PARALLEL)
+    failures = 0
+    
+    async def refresh(clone_id: int) -> int:
+        nonlocal failures
+        async with semaphore:
+            clone_started = time.perf_counter()
+            try:
+                async with WorkerSessionLocal() as db:
+                    count = await MatchingService(db).refresh_candidates(clone_id)
+            except Exception as e:
+                # Один клон не должен срывать весь батч
+                failures += 1
+                logger.warning("Candidate refresh failed for clone %s: %s", clone_id, e)
+                return 0
+            metrics.observe("matching.refresh_ms", (time.perf_counter() - clone_started) * 1000)
+            return count
+    
+    counts = []
+    # Корутины создаются порциями, а не сразу на все клоны
+    for start in range(0, len(clone_ids), settings.MATCHING_BATCH_SIZE):
+        chunk = clone_ids[start:start + settings.MATCHING_BATCH_SIZE]
+        counts.extend(await asyncio.gather(*(refresh(clone_id) for clone_id in chunk)))
+    
+    duration_ms = int((time.perf_counter() - started) * 1000)
+    metrics.observe("matching.batch_ms", duration_ms)
+    summary = {
+        "embedded": embedded,
+        "clones": len(clone_ids),
+        "candidates": sum(counts),
+        "failures": failures,
+        "duration_ms": duration_ms
+    }
+    logger.info("Candidate refresh: %s", summary)
+    return summary
+
+
+@celery_app.task(name="matching.refresh_candidates")
+def refresh_candidates() -> dict:
+    return run_async(_refresh_all())
@@ -0,0 +1,150 @@
+"""
+Периодическая консолидация воспоминаний клонов (Celery beat, раз в сутки).
+
+Клоны обрабатываются пачками по id (keyset), эмбеддинги загружаются
+по одному клону - в памяти только воспоминания текущего клона. Для каждого
+клона: удаление старых неважных воспоминаний, затем склейка дубликатов
+по косинусной близости эмбеддингов.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import select, update, delete, func
+from app.worker import celery_app
+from app.core.config import settings
+from app.core.database import WorkerSessionLocal
+from app.core.metrics import metrics
+from app.models.clone import Clone
+from app.models.memory import CloneMemory
+from app.services.clone_service import clone_cache
+from app.services.memory_consolidation import MemoryRow, plan_merges
+from app.tasks.diary_tasks import run_async
+
+logger = logging.getLogger(__name__)
+
+
+async def _prune(db, clone_ids: list[int]) -> set[int]:
+    """Удаляет давно не используемые воспоминания с низкой важностью"""
+    stale_before = datetime.utcnow() - timedelta(days=settings.MEMORY_PRUNE_AFTER_DAYS)
+    result = await db.execute(
+        delete(CloneMemory)
+        .where(
+            CloneMemory.clone_id.in_(clone_ids),
+            CloneMemory.importance_score < settings.MEMORY_PRUNE_MAX_IMPORTANCE,
+            func.coalesce(CloneMemory.usage_count, 0) <= settings.MEMORY_PRUNE_MAX_USAGE,
+            func.coalesce(CloneMemory.last_used_at, CloneMemory.created_at) < stale_before
+        )
+        .returning(CloneMemory.clone_id)
+    )
+    pruned = list(result.scalars())
+    metrics.incr("memories.pruned", len(pruned))
+    return set(pruned)
+
+
+async def _merge_duplicates(db, clone_id: int) -> bool:
+    """Склеивает дубликаты воспоминаний одного клона; True - если что-то изменилось"""
+    result = await db.execute(
+        select(
+            CloneMemory.id,
+            CloneMemory.clone_id,
+            CloneMemory.memory_type,
+            CloneMemory.importance_score,
+            CloneMemory.confidence_score,
+            CloneMemory.usage_count,
+            CloneMemory.last_used_at,
+            CloneMemory.created_at,
+            CloneMemory.memory_embedding
+        )
+        .where(CloneMemory.clone_id == clone_id, CloneMemory.memory_embedding.is_not(None))
+        .order_by(CloneMemory.id)
+    )
+    rows, vectors = [], []
+    for row in result:
+        rows.append(MemoryRow(
+            id=row.id,
+            clone_id=row.clone_id,
+            memory_type=row.memory_type,
+            importance=float(row.importance_score or 0),
+            confidence=float(row.confidence_score or 0),
+            usage_count=row.usage_count or 0,
+            last_used_at=row.last_used_at,
+            created_at=row.created_at
+        ))
+        vectors.append(row.memory_embedding)
+    if not rows:
+        return False
+    
+    plans = plan_merges(
+        rows,
+        np.vstack(vectors),
+        settings.MEMORY_DUPLICATE_SIMILARITY,
+        settings.MEMORY_CONSOLIDATION_BLOCK_SIZE
+    )
+    if not plans:
+        return False
+    
+    await db.execute(update(CloneMemory), [
+        {
+            "id": plan.keep.id,
+            "importance_score": plan.importance,
+            "confidence_score": plan.confidence,
+            "usage_count": plan.usage_count,
+            "last_used_at": plan.last_used_at
+        }
+        for plan in plans
+    ])
+    duplicate_ids = [row.id for plan in plans for row in plan.duplicates]
+    await db.execute(delete(CloneMemory).where(CloneMemory.id.in_(duplicate_ids)))
+    metrics.incr("memories.merged", len(duplicate_ids))
+    return True
+
+
+async def _consolidate() -> dict:
+    started = time.perf_counter()
+    last_clone_id = 0
+    clones_processed = 0
+    clones_changed = 0
+    
+    while True:
+        async with WorkerSessionLocal() as db:
+            batch = (await db.execute(
+                select(Clone.id, Clone.user_id)
+                .where(Clone.id > last_clone_id)
+                .order_by(Clone.id)
+                .limit(settings.MEMORY_CONSOLIDATION_CLONES_PER_BATCH)
+            )).all()
+            if not batch:
+                break
+            clone_ids = [row.id for row in batch]
+            
+            changed = await _prune(db, clone_ids)
+            for clone_id in clone_ids:
+                if await _merge_duplicates(db, clone_id):
+                    changed.add(clone_id)
+            if changed:
+                # Память изменилась - кэш ответов этих клонов устарел
+                await db.execute(
+                    update(Clone)
+                    .where(Clone.id.in_(changed))
+                    .values(profile_version=Clone.profile_version + 1)
+                )
+            await db.commit()
+            
+            for row in batch:
+                if row.id in changed:
+                    await clone_cache.invalidate(row.user_id)
+        
+        last_clone_id = clone_ids[-1]
+        clones_processed += len(clone_ids)
+        clones_changed += len(changed)
+    
+    duration_ms = int((time.perf_counter() - started) * 1000)
+    metrics.observe("memories.consolidation_ms", duration_ms)
+    logger.info("Memory consolidation: %s clones, %s changed, %s ms", clones_processed, clones_changed, duration_ms)
+    return {"clones": clones_processed, "changed": clones_changed, "duration_ms": duration_ms}
+
+
+@celery_app.task(name="memories.consolidate")
+def consolidate_memories() -> dict:
+    return run_async(_consolidate())
@@ -0,0 +1,57 @@
+from celery import Celery
+from celery.schedules import crontab
+from app.core.config import settings
+
+# Точка входа воркера:
+#   celery -A app.worker worker -Q diaries,maintenance --loglevel=info
+# Периодические задачи (ровно один процесс на кластер):
+#   celery -A app.worker beat --loglevel=info
+celery_app = Celery(
+    "clone_platform",
+    broker=settings.CELERY_BROKER_URL or settings.REDIS_URL,
+    backend=settings.CELERY_RESULT_BACKEND or settings.REDIS_URL,
+    include=[
+        "app.tasks.diary_tasks",
+        "app.tasks.memory_tasks",
+        "app.tasks.matching_tasks",
+        "app.tasks.conversation_tasks"
+    ]
+)
+
+celery_app.conf.update(
+    task_serializer="json",
+    accept_content=["json"],
+    result_serializer="json",
+    timezone="UTC",
+    enable_utc=True,
+    # Задача подтверждается только после выполнения: при падении воркера
+    # брокер вернет ее в очередь, и дневник не застрянет в pending
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    task_default_queue="diaries",
+    result_expires=3600,
+    # Фоновое обслуживание не занимает очередь дневников
+    task_routes={
+        "memories.*": {"queue": "maintenance"},
+        "matching.*": {"queue": "maintenance"},
+        "conversations.*": {"queue": "maintenance"},
+    },
+    beat_schedule={
+        "consolidate-memories": {
+            "task": "memories.consolidate",
+            "schedule": crontab(hour=settings.MEMORY_CONSOLIDATION_HOUR, minute=0),
+        },
+        "refresh-candidates": {
+            "task": "matching.refresh_candidates",
+            "schedule": crontab(hour=settings.MATCHING_CANDIDATES_HOUR, minute=0),
+        },
+        "run-conversations": {
+            "task": "conversations.run",
+            "schedule": crontab(hour=settings.CONVERSATION_HOUR, minute=0),
+        },
+    },
+)
+
+# Позволяет запускать `celery -A app.worker worker`
+app = celery_app
@@ -1,7 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.middleware import MaxBodySizeMiddleware
 from app.api.v1.api import api_router
+from app.services.result_cache_service import saved_totals
+from redis.exceptions import RedisError
 
 app = FastAPI(
     title="Clone Platform API",
@@ -18,6 +22,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Ограничение размера тела запроса (запас на multipart-заголовки)
+app.add_middleware(MaxBodySizeMiddleware, max_size=settings.MAX_UPLOAD_SIZE + 64 * 1024)
+
 # Подключение роутеров
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 
@@ -29,6 +36,16 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def get_metrics():
+    snapshot = metrics.snapshot()
+    # Счетчики воркеров Celery: сколько транскрипций и анализов не понадобилось
+    try:
+        snapshot["dedup_saved"] = await saved_totals()
+    except RedisError:
+        snapshot["dedup_saved"] = None
+    return snapshot
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
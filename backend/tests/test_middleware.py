@@ -0,0 +1,57 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+from app.core.middleware import MaxBodySizeMiddleware
+
+MAX_SIZE = 1024
+BOUNDARY = "test-boundary"
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(MaxBodySizeMiddleware, max_size=MAX_SIZE)
+    
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+    
+    return app
+
+
+def _multipart_chunks(size: int, chunk_size: int = 256):
+    yield (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="audio.ogg"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode()
+    for start in range(0, size, chunk_size):
+        yield b"x" * min(chunk_size, size - start)
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def _post_chunked(client: TestClient, size: int):
+    # Генератор - тело без Content-Length (Transfer-Encoding: chunked)
+    return client.post(
+        "/upload",
+        content=_multipart_chunks(size),
+        headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"},
+    )
+
+
+def test_chunked_body_over_limit_is_rejected_with_413():
+    response = _post_chunked(TestClient(_app()), MAX_SIZE * 4)
+    
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Request body is too large"}
+
+
+def test_chunked_body_within_limit_passes():
+    response = _post_chunked(TestClient(_app()), MAX_SIZE // 2)
+    
+    assert response.status_code == 200
+    assert response.json() == {"size": MAX_SIZE // 2}
+
+
+def test_content_length_over_limit_is_rejected_with_413():
+    response = TestClient(_app()).post("/upload", files={"file": ("audio.ogg", b"x" * MAX_SIZE * 2)})
+    
+    assert response.status_code == 413
@@ -58,8 +58,16 @@ export const apiClient = {
     return response.data
   },
 
-  async getDiaries(initData: string) {
+  async getDiaries(initData: string, cursor?: string, limit = 20) {
     const response = await api.get('/diaries', {
+      params: { cursor, limit },
+      headers: { 'X-Telegram-Init-Data': initData },
+    })
+    return response.data
+  },
+
+  async getDiary(initData: string, diaryId: number) {
+    const response = await api.get(`/diaries/${diaryId}`, {
       headers: { 'X-Telegram-Init-Data': initData },
     })
     return response.data